@@ -5,20 +5,37 @@ from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne, ReturnDocument, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
+import threading
+from contextvars import ContextVar
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, constr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Union, Tuple
 import uuid
 from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 import io
 import csv
+import html
+import string
+import re
+import json
+import hashlib
+import secrets
+import gzip
+import base64
+import asyncio
+import random
+import time
 import resend
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
+from sentry_sdk.integrations.pymongo import PyMongoIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 
 ROOT_DIR = Path(__file__).parent
@@ -32,8 +49,10 @@ if SENTRY_DSN:
         integrations=[
             StarletteIntegration(transaction_style="endpoint"),
             FastApiIntegration(auto_enabling_integrations=True),
+            PyMongoIntegration(),  # a span per Mongo command under the request's transaction
         ],
-        traces_sample_rate=0.1,  # Capture 10% of transactions for performance monitoring
+        # share of transactions traced for performance monitoring
+        traces_sample_rate=float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', '0.1')),
         release=os.environ.get('APP_VERSION', 'development'),
         environment=os.environ.get('ENVIRONMENT', 'production'),
     )
@@ -41,9 +60,77 @@ if SENTRY_DSN:
 else:
     logging.info("Sentry DSN not configured, monitoring disabled")
 
+# ===== Database Timing =====
+# Mongo commands are attributed to the HTTP request that sent them. Motor runs each operation on an
+# executor thread inside a copy of the caller's context, so the listener finds the request's stats
+# in a contextvar; DbTimingMiddleware reports them in Server-Timing and keeps per-route totals.
+DB_TIMING_ENABLED = os.environ.get('DB_TIMING_ENABLED', '1') == '1'
+
+class RequestDbStats:
+    def __init__(self):
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.documents = 0
+        self._lock = threading.Lock()  # commands of one request can finish on several executor threads
+
+    def add(self, duration_ms: float, documents: int):
+        with self._lock:
+            self.commands += 1
+            self.duration_ms += duration_ms
+            self.documents += documents
+
+    def server_timing(self, app_ms: float) -> str:
+        # db is the sum of command durations, so it can exceed app when commands ran concurrently
+        desc = f"{self.commands} commands, {self.documents} docs"
+        return f'db;dur={self.duration_ms:.1f};desc="{desc}", app;dur={app_ms:.1f}'
+
+_request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+# "GET /api/registries/{registry_id}" -> totals since this process started
+_route_db_stats: Dict[str, Dict[str, float]] = {}
+
+def record_route_db_stats(route: str, stats: RequestDbStats):
+    totals = _route_db_stats.setdefault(
+        route, {"requests": 0, "commands": 0, "max_commands": 0, "duration_ms": 0.0, "documents": 0}
+    )
+    totals["requests"] += 1
+    totals["commands"] += stats.commands
+    totals["max_commands"] = max(totals["max_commands"], stats.commands)
+    totals["duration_ms"] += stats.duration_ms
+    totals["documents"] += stats.documents
+
+def reply_documents(reply: Dict[str, Any]) -> int:
+    """Documents a command returned (its cursor batch) or wrote (n), read off the already-decoded reply"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:  # findAndModify
+        return 0 if reply["value"] is None else 1
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+class DbTimingListener(monitoring.CommandListener):
+    """Adds each command's duration and document count to the current request's RequestDbStats.
+
+    Documents stand in for returned bytes: CommandSucceededEvent carries only the decoded reply, not
+    its wire size, and re-encoding every reply to BSON just to measure it cost more than the figure is worth.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.add(event.duration_micros / 1000, reply_documents(event.reply))
+
+    def failed(self, event):
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.add(event.duration_micros / 1000, 0)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[DbTimingListener()] if DB_TIMING_ENABLED else [])
 db = client[os.environ['DB_NAME']]
 
 # JWT settings
@@ -73,6 +160,52 @@ FROM_EMAIL = os.environ.get('FROM_EMAIL', 'noreply@yourdomain.com')
 if RESEND_API_KEY:
     resend.api_key = RESEND_API_KEY
 
+# Email delivery: messages are written to db.email_outbox and sent by a background worker.
+# EMAIL_PROVIDER is "resend" (default when a key is set), "fake" (in-memory, for tests/benchmarks) or empty (disabled).
+EMAIL_PROVIDER = os.environ.get('EMAIL_PROVIDER', 'resend' if RESEND_API_KEY else '').strip().lower()
+EMAIL_WORKER_ENABLED = os.environ.get('EMAIL_WORKER_ENABLED', '1') == '1'
+EMAIL_WORKER_CONCURRENCY = int(os.environ.get('EMAIL_WORKER_CONCURRENCY', '4'))
+EMAIL_RATE_PER_SEC = float(os.environ.get('EMAIL_RATE_PER_SEC', '2'))  # Resend default: 2 API requests/sec
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '100'))  # Resend batch API accepts up to 100 emails
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE_SEC = float(os.environ.get('EMAIL_RETRY_BASE_SEC', '30'))
+EMAIL_POLL_INTERVAL_SEC = float(os.environ.get('EMAIL_POLL_INTERVAL_SEC', '5'))
+EMAIL_LEASE_SEC = int(os.environ.get('EMAIL_LEASE_SEC', '300'))
+ADMIN_STATS_REFRESH_SEC = int(os.environ.get('ADMIN_STATS_REFRESH_SEC', '60'))
+ADMIN_STATS_IDLE_SEC = 600  # stop refreshing after 10 minutes without an admin request
+METRICS_RECONCILE_INTERVAL_SEC = int(os.environ.get('METRICS_RECONCILE_INTERVAL_SEC', '3600'))
+DIGEST_CHECK_INTERVAL_SEC = int(os.environ.get('DIGEST_CHECK_INTERVAL_SEC', '300'))
+THANK_YOU_BATCH_SIZE = int(os.environ.get('THANK_YOU_BATCH_SIZE', '500'))
+THANK_YOU_LEASE_SEC = int(os.environ.get('THANK_YOU_LEASE_SEC', '120'))
+FUND_RANK_REBALANCE_INTERVAL_SEC = int(os.environ.get('FUND_RANK_REBALANCE_INTERVAL_SEC', '300'))
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL_SEC = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SEC', '1.0'))
+# how long a request waits for room in the audit queue before writing directly
+AUDIT_ENQUEUE_TIMEOUT_SEC = float(os.environ.get('AUDIT_ENQUEUE_TIMEOUT_SEC', '0.5'))
+# password reset records are kept this long past expires_at
+PASSWORD_RESET_RETENTION_HOURS = int(os.environ.get('PASSWORD_RESET_RETENTION_HOURS', '24'))
+STATUS_CHECK_RETENTION_DAYS = int(os.environ.get('STATUS_CHECK_RETENTION_DAYS', '7'))  # 0 keeps them forever
+# chunks of uploads that never completed
+UPLOAD_TMP_RETENTION_HOURS = int(os.environ.get('UPLOAD_TMP_RETENTION_HOURS', '24'))
+UPLOAD_TMP_SWEEP_INTERVAL_SEC = int(os.environ.get('UPLOAD_TMP_SWEEP_INTERVAL_SEC', '3600'))
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '365'))  # 0 keeps entries in Mongo forever
+AUDIT_ARCHIVE_DIR = Path(os.environ.get('AUDIT_ARCHIVE_DIR', str(ROOT_DIR / "audit_archive")))
+AUDIT_ARCHIVE_INTERVAL_SEC = int(os.environ.get('AUDIT_ARCHIVE_INTERVAL_SEC', '3600'))
+AUDIT_ARCHIVE_BATCH_SIZE = int(os.environ.get('AUDIT_ARCHIVE_BATCH_SIZE', '5000'))
+AUDIT_ARCHIVE_LEASE_SEC = int(os.environ.get('AUDIT_ARCHIVE_LEASE_SEC', '600'))
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+# a retry takes over a claim whose request never finished after this long
+IDEMPOTENCY_CLAIM_TIMEOUT_SEC = int(os.environ.get('IDEMPOTENCY_CLAIM_TIMEOUT_SEC', '30'))
+CONTRIBUTION_CONTEXT_TTL_SEC = float(os.environ.get('CONTRIBUTION_CONTEXT_TTL_SEC', '30'))
+REGISTRY_PURGE_INTERVAL_SEC = int(os.environ.get('REGISTRY_PURGE_INTERVAL_SEC', '60'))
+REGISTRY_PURGE_BATCH_SIZE = int(os.environ.get('REGISTRY_PURGE_BATCH_SIZE', '1000'))
+# between purge batches, to leave room for live traffic
+REGISTRY_PURGE_PAUSE_SEC = float(os.environ.get('REGISTRY_PURGE_PAUSE_SEC', '0.05'))
+REGISTRY_PURGE_LEASE_SEC = 300
+# outbox backlog per campaign before the producer waits
+THANK_YOU_MAX_PENDING = int(os.environ.get('THANK_YOU_MAX_PENDING', '5000'))
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -82,19 +215,170 @@ api_router = APIRouter(prefix="/api")
 # Serve uploaded files under /api/files
 app.mount("/api/files", StaticFiles(directory=str(UPLOAD_DIR)), name="files")
 
-# ===== Utilities =====
-async def ensure_indexes():
-    await db.users.create_index('email', unique=True)
-    await db.registries.create_index('slug', unique=True)
-    await db.registries.create_index('owner_id')
-    await db.funds.create_index('registry_id')
-    await db.funds.create_index('updated_at')
-    await db.funds.create_index('order')
-    await db.contributions.create_index('fund_id')
-    await db.contributions.create_index('created_at')
-    await db.uploads.create_index('created_at')
-    await db.audit_logs.create_index([('registry_id', 1), ('created_at', -1)])
+# ===== Indexes =====
+# Every index the app relies on, declared once. At startup ensure_indexes builds the missing unique indexes
+# before the app serves requests (they enforce correctness: idempotency keys, outbox dedupe, reset tokens),
+# then the rest in the background while it does. index_drift compares the spec with what the database
+# has, for GET /api/admin/indexes and `python server.py indexes`. Retention windows are read when the spec
+# is built, so a changed env var shows up as divergent and is applied in place with collMod.
+class IndexSpec(BaseModel):
+    collection: str
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    sparse: bool = False
+    partial: Optional[Dict[str, Any]] = None
+    expire_after_sec: Optional[int] = None  # TTL; None or 0 for a plain index
+
+    def options(self) -> Dict[str, Any]:
+        opts: Dict[str, Any] = {}
+        if self.unique:
+            opts["unique"] = True
+        if self.sparse:
+            opts["sparse"] = True
+        if self.partial:
+            opts["partialFilterExpression"] = self.partial
+        if self.expire_after_sec:
+            opts["expireAfterSeconds"] = self.expire_after_sec
+        return opts
+
+def _ix(collection: str, *keys, **options) -> IndexSpec:
+    return IndexSpec(collection=collection, keys=[k if isinstance(k, tuple) else (k, 1) for k in keys], **options)
+
+def index_spec() -> List[IndexSpec]:
+    return [
+        _ix("users", "id", unique=True),
+        _ix("users", "email", unique=True),
+        _ix("users", "name_lower", "id"),  # search tiers and keyset pages sort on (field, id)
+        _ix("users", "search_grams"),
+        _ix("users", "created_at", "id"),
+        _ix("registries", "id", unique=True),
+        _ix("registries", "slug", unique=True),
+        _ix("registries", "owner_id", "created_at"),
+        _ix("registries", "collaborators", "created_at"),
+        _ix("registries", "created_at", "id"),
+        _ix("registries", "fund_ranks_dense", sparse=True),
+        _ix("registries", "deleted_at", sparse=True),
+        _ix("registries", "notification_mode", "digest_sent_through"),
+        _ix("registries", "digest_claim", sparse=True),
+        _ix("registries", "couple_names_lower", "id"),
+        _ix("registries", "search_grams"),
+        _ix("funds", "id", unique=True),
+        _ix("funds", "registry_id"),
+        _ix("funds", "updated_at"),
+        _ix("funds", "order"),
+        _ix("funds", "registry_id", "rank", "order"),  # FUND_SORT
+        _ix("funds", "registry_id", "visible", "rank", "order"),  # public registry page
+        _ix("funds", "registry_id", "updated_at"),
+        _ix("contributions", "id", unique=True),
+        _ix("contributions", "fund_id"),
+        _ix("contributions", "fund_id", "created_at"),
+        _ix("contributions", "created_at"),
+        _ix("contributions", "registry_id", "created_at", "id"),
+        _ix("contributions", "registry_id", "guest_email"),
+        _ix("contribution_rollups", "registry_id", "fund_id", "day", unique=True),
+        _ix("contribution_rollups", "registry_id", "day"),
+        _ix("audit_logs", "registry_id", ("created_at", -1), ("id", -1)),
+        _ix("audit_logs", "user_id", ("created_at", -1), ("id", -1)),
+        _ix("audit_logs", "created_at"),  # retention archives these to files instead of expiring them
+        _ix("uploads", "created_at"),  # records of live files; the registry purge removes them with the files
+        _ix("uploads", "user_id"),
+        _ix("email_outbox", "id", unique=True),
+        _ix("email_outbox", "status", "priority", "next_attempt_at"),
+        _ix("email_outbox", "campaign_id", "status", sparse=True),
+        _ix("email_outbox", "registry_id", sparse=True),
+        _ix("email_outbox", "dedupe_key", unique=True, partial={"dedupe_key": {"$type": "string"}}),
+        _ix("email_outbox", "status", "lease_until"),
+        _ix("email_outbox", "lease", sparse=True),
+        _ix("thank_you_campaigns", "id", unique=True),
+        _ix("thank_you_campaigns", "registry_id", unique=True, partial={"status": {"$in": ["queued", "running"]}}),
+        _ix("thank_you_campaigns", "registry_id", ("created_at", -1)),
+        _ix("thank_you_campaigns", "status", "lease_until"),
+        _ix("tombstones", "registry_id", "deleted_at"),
+        _ix("tombstones", "deleted_at", expire_after_sec=TOMBSTONE_TTL_DAYS * 86400),
+        _ix("idempotency_keys", "scope", "key", unique=True),
+        _ix("idempotency_keys", "created_at", expire_after_sec=IDEMPOTENCY_KEY_TTL_HOURS * 3600),
+        _ix("password_resets", "token_hash", unique=True, partial={"token_hash": {"$type": "string"}}),
+        _ix("password_resets", "expires_at", expire_after_sec=PASSWORD_RESET_RETENTION_HOURS * 3600),
+        _ix("status_checks", "timestamp", expire_after_sec=STATUS_CHECK_RETENTION_DAYS * 86400),
+    ]
+
+def _index_options(info: Dict[str, Any]) -> Dict[str, Any]:
+    options = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+    return {k: info[k] for k in options if info.get(k) not in (None, False)}
+
+def _find_index(existing: Dict[str, Dict[str, Any]],
+                keys: List[Tuple[str, int]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    return next(((name, info) for name, info in existing.items() if [tuple(k) for k in info["key"]] == keys), None)
+
+async def apply_index(spec: IndexSpec):
+    """Create the index, or bring a TTL window in line. Other option changes are only reported, since
+    rebuilding a unique index in place could let duplicates in while it is gone."""
+    coll = db[spec.collection]
+    want = spec.options()
+    found = _find_index(await coll.index_information(), spec.keys)
+    if found:
+        name, info = found
+        have = _index_options(info)
+        if have == want:
+            return
+        without_ttl = lambda o: {k: v for k, v in o.items() if k != "expireAfterSeconds"}
+        if without_ttl(have) != without_ttl(want):
+            logging.warning(f"Index {spec.collection}.{name} differs from the spec: {have} != {want}")
+            return
+        if "expireAfterSeconds" in have and "expireAfterSeconds" in want:
+            await db.command({"collMod": spec.collection,
+                              "index": {"name": name, "expireAfterSeconds": want["expireAfterSeconds"]}})
+            return
+        # TTL switched on or off: a plain index can't be converted in place
+        await coll.drop_index(name)
+    await coll.create_index(spec.keys, **want)
+
+async def ensure_indexes(unique: Optional[bool] = None):
+    """Build missing indexes; `unique` limits the run to unique (True) or non-unique (False) specs"""
+    for spec in index_spec():
+        if unique is not None and spec.unique != unique:
+            continue
+        try:
+            await apply_index(spec)
+        except Exception:
+            # e.g. duplicates blocking a unique index; the rest still get built and drift reports this one
+            logging.exception(f"Failed to build index {spec.collection} {spec.keys}")
+
+async def build_indexes():
+    """Startup index build, unique specs first so the writes relying on them are covered soonest.
+
+    Runs in the background so a long build never delays readiness; deploys run
+    `python server.py indexes --apply` first, which fails while any index is missing or divergent.
+    """
+    await ensure_indexes(unique=True)
+    await ensure_indexes(unique=False)
+
+async def index_drift() -> Dict[str, List[Dict[str, Any]]]:
+    """Missing, extra and divergent indexes compared with index_spec()"""
+    specs: Dict[str, List[IndexSpec]] = {}
+    for spec in index_spec():
+        specs.setdefault(spec.collection, []).append(spec)
+    report: Dict[str, List[Dict[str, Any]]] = {"missing": [], "extra": [], "divergent": []}
+    for collection in sorted(set(specs) | set(await db.list_collection_names())):
+        existing = await db[collection].index_information()
+        matched = set()
+        for spec in specs.get(collection, []):
+            entry = {"collection": collection, "keys": spec.keys, "options": spec.options()}
+            found = _find_index(existing, spec.keys)
+            if not found:
+                report["missing"].append(entry)
+                continue
+            name, info = found
+            matched.add(name)
+            if _index_options(info) != spec.options():
+                report["divergent"].append({**entry, "name": name, "actual": _index_options(info)})
+        for name, info in existing.items():
+            if name != "_id_" and name not in matched:
+                report["extra"].append({"collection": collection, "name": name, "keys": [tuple(k) for k in info["key"]],
+                                        "options": _index_options(info)})
+    return report
 
+# ===== Utilities =====
 _rate_store: Dict[str, List[float]] = {}
 
 async def rate_limit(req: Request, key: str, limit: int, window_sec: int = 60):
@@ -142,6 +426,7 @@ class TokenResponse(BaseModel):
 
 Slug = constr(pattern=r"^[a-z0-9-]+$", min_length=3, max_length=64)
 Currency = constr(pattern=r"^[A-Z]{3}$")
+NotificationMode = Literal["immediate", "hourly", "daily"]
 
 class RegistryCreate(BaseModel):
     couple_names: str
@@ -151,6 +436,7 @@ class RegistryCreate(BaseModel):
     hero_image: Optional[str] = None
     slug: Slug
     theme: Optional[str] = "modern"
+    notification_mode: NotificationMode = "immediate"
 
 class Registry(RegistryCreate):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -169,6 +455,7 @@ class RegistryUpdate(BaseModel):
     hero_image: Optional[str] = None
     slug: Optional[Slug] = None
     theme: Optional[str] = None
+    notification_mode: Optional[NotificationMode] = None
 
 class FundIn(BaseModel):
     id: Optional[str] = None
@@ -190,6 +477,7 @@ class Fund(BaseModel):
     category: Optional[str] = None
     visible: bool = True
     order: Optional[int] = None
+    rank: Optional[str] = None
     pinned: bool = False
     registry_id: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -206,6 +494,7 @@ class ContributionIn(BaseModel):
 
 class Contribution(ContributionIn):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    registry_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class PublicRegistryResponse(BaseModel):
@@ -221,13 +510,695 @@ class AuditLog(BaseModel):
     meta: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class AuditBuffer:
+    """Bounded in-process queue of audit entries, written with insert_many by size or time.
+
+    While the flush loop is not running (tests, scripts, after shutdown has drained it) entries are
+    written directly. A full queue makes callers wait up to AUDIT_ENQUEUE_TIMEOUT_SEC for room and
+    then fall back to a direct write, so a stalled database slows requests rather than dropping entries.
+    """
+
+    def __init__(self, max_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval_sec: float = AUDIT_FLUSH_INTERVAL_SEC):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_size))
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_sec = flush_interval_sec
+        self.running = False
+        self._wake = asyncio.Event()
+
+    async def add(self, doc: dict):
+        if self.running:
+            try:
+                self.queue.put_nowait(doc)
+                if self.queue.qsize() >= self.batch_size:
+                    self._wake.set()
+                return
+            except asyncio.QueueFull:
+                self._wake.set()
+                try:
+                    await asyncio.wait_for(self.queue.put(doc), timeout=AUDIT_ENQUEUE_TIMEOUT_SEC)
+                    return
+                except asyncio.TimeoutError:
+                    logging.warning("Audit queue full; writing entry directly")
+        await db.audit_logs.insert_one(doc)
+
+    async def run(self):
+        self.running = True
+        try:
+            while True:
+                if self.queue.qsize() < self.batch_size and not _shutdown_event.is_set():
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval_sec)
+                    except asyncio.TimeoutError:
+                        pass
+                await self.flush()
+                if _shutdown_event.is_set() and self.queue.empty():
+                    return
+        finally:
+            self.running = False
+
+    async def flush(self):
+        """Write everything queued so far, batch_size entries per insert_many"""
+        while not self.queue.empty():
+            batch = [self.queue.get_nowait() for _ in range(min(self.batch_size, self.queue.qsize()))]
+            await self._write(batch)
+
+    async def _write(self, batch: List[dict]):
+        for attempt in range(3):
+            try:
+                await db.audit_logs.insert_many(batch, ordered=False)
+                return
+            except BulkWriteError as e:
+                if all(err.get("code") == 11000 for err in e.details.get("writeErrors", [])):
+                    return  # the rest were written by an earlier attempt
+                logging.exception("Audit batch write failed")
+            except Exception:
+                logging.exception("Audit batch write failed")
+            await asyncio.sleep(0.5 * (attempt + 1))
+        logging.error(f"Dropped {len(batch)} audit log entries after repeated write failures")
+
+audit_buffer = AuditBuffer()
+
+def audit_filter(base: Dict[str, Any], action: Optional[str] = None, user_id: Optional[str] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Any]:
+    """Audit query for the paged endpoints; `action` takes a comma-separated list, the range is [start, end)"""
+    query = dict(base)
+    if action:
+        actions = [a.strip() for a in action.split(",") if a.strip()]
+        query["action"] = actions[0] if len(actions) == 1 else {"$in": actions}
+    if user_id:
+        query["user_id"] = user_id
+    if start or end:
+        query["created_at"] = {**({"$gte": start} if start else {}), **({"$lt": end} if end else {})}
+    return query
+
 async def log_audit(registry_id: str, user_id: Optional[str], action: str, meta: Dict[str, Any]):
     try:
         entry = AuditLog(registry_id=registry_id, user_id=user_id, action=action, meta=meta)
-        await db.audit_logs.insert_one(entry.model_dump())
+        await audit_buffer.add(entry.model_dump())
     except Exception:
         logging.exception("Failed to write audit log")
 
+# ===== Contribution Rollups =====
+def rollup_day(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d")
+
+async def record_contribution_rollup(contribution: "Contribution"):
+    """Fold one new contribution into its (registry, fund, day) rollup"""
+    await db.contribution_rollups.update_one(
+        {"registry_id": contribution.registry_id, "fund_id": contribution.fund_id,
+         "day": rollup_day(contribution.created_at)},
+        {"$inc": {"count": 1, "amount": contribution.amount}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+async def rebuild_contribution_rollups(registry_id: Optional[str] = None) -> int:
+    """Recompute rollups from raw contributions, for one registry or everything.
+
+    Fresh rows are merged in with a rebuild stamp; rows the rebuild did not touch (days whose
+    contributions were since deleted) are removed afterwards, unless a contribution upserted
+    them after the rebuild started.
+    """
+    stamp = str(uuid.uuid4())
+    started = datetime.utcnow()
+    match: Dict[str, Any] = {"registry_id": registry_id} if registry_id else {"registry_id": {"$ne": None}}
+    await db.contributions.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "registry_id": "$registry_id",
+                "fund_id": "$fund_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            },
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$amount"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "registry_id": "$_id.registry_id",
+            "fund_id": "$_id.fund_id",
+            "day": "$_id.day",
+            "count": 1,
+            "amount": 1,
+            "updated_at": "$$NOW",
+            "rebuild": stamp,
+        }},
+        {"$merge": {
+            "into": "contribution_rollups",
+            "on": ["registry_id", "fund_id", "day"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ], allowDiskUse=True).to_list(None)
+    scope: Dict[str, Any] = {"registry_id": registry_id} if registry_id else {}
+    await db.contribution_rollups.delete_many(
+        {**scope, "rebuild": {"$ne": stamp}, "updated_at": {"$not": {"$gte": started}}}
+    )
+    return await db.contribution_rollups.count_documents(scope)
+
+SERIES_FORMATS = {"hour": "%Y-%m-%dT%H:00", "day": "%Y-%m-%d", "week": "%G-W%V"}
+
+def _fund_breakdown_stages() -> List[Dict[str, Any]]:
+    return [
+        {"$group": {"_id": "$fund_id", "count": {"$sum": "$count"}, "amount": {"$sum": "$amount"}}},
+        {"$lookup": {"from": "funds", "localField": "_id", "foreignField": "id", "as": "fund"}},
+        {"$project": {"_id": 0, "fund_id": "$_id", "count": 1, "amount": 1,
+                      "title": {"$arrayElemAt": ["$fund.title", 0]}, "goal": {"$arrayElemAt": ["$fund.goal", 0]}}},
+        {"$sort": {"amount": -1}},
+    ]
+
+async def analytics_from_rollups(registry_id: str, start_key: str, end_key: str, granularity: str) -> Dict[str, Any]:
+    """Totals, per-fund breakdown and a day/week series in one $facet over the registry's rollups (UTC days)"""
+    bucket: Any = "$day"
+    if granularity == "week":
+        day = {"$dateFromString": {"dateString": "$day"}}
+        bucket = {"$dateToString": {"format": SERIES_FORMATS["week"], "date": day}}
+    result = await db.contribution_rollups.aggregate([
+        {"$match": {"registry_id": registry_id}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "count": {"$sum": "$count"}, "amount": {"$sum": "$amount"}}}],
+            "by_fund": _fund_breakdown_stages(),
+            "series": [
+                {"$match": {"day": {"$gte": start_key, "$lte": end_key}}},
+                {"$group": {"_id": bucket, "count": {"$sum": "$count"}, "amount": {"$sum": "$amount"}}},
+                {"$sort": {"_id": 1}},
+            ],
+        }},
+    ]).to_list(1)
+    return result[0] if result else {"totals": [], "by_fund": [], "series": []}
+
+async def analytics_from_contributions(
+    registry_id: str, start_day: datetime, end_day: datetime, granularity: str, tz: str, top: int
+) -> Dict[str, Any]:
+    """Everything in one $facet over the registry's contributions, read through the (registry_id, created_at) index"""
+    zone = ZoneInfo(tz)
+    range_start = start_day.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+    range_end = (end_day + timedelta(days=1)).replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+    facets: Dict[str, Any] = {
+        "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}],
+        "by_fund": [{"$set": {"count": 1}}] + _fund_breakdown_stages(),
+        "series": [
+            {"$match": {"created_at": {"$gte": range_start, "$lt": range_end}}},
+            {"$group": {
+                "_id": {"$dateToString": {"format": SERIES_FORMATS[granularity], "date": "$created_at",
+                                          "timezone": tz}},
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"},
+            }},
+            {"$sort": {"_id": 1}},
+        ],
+    }
+    if top:
+        facets["top_contributors"] = [
+            {"$group": {
+                "_id": {"$cond": [{"$gt": ["$guest_email", ""]}, {"$toLower": "$guest_email"},
+                                  {"$ifNull": ["$name", "Anonymous"]}]},
+                "name": {"$last": "$name"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"},
+            }},
+            {"$sort": {"amount": -1, "_id": 1}},
+            {"$limit": top},
+            {"$project": {"_id": 0, "name": {"$ifNull": ["$name", "Anonymous"]}, "count": 1, "amount": 1}},
+        ]
+    result = await db.contributions.aggregate([
+        {"$match": {"registry_id": registry_id}},
+        {"$sort": {"registry_id": 1, "created_at": 1}},
+        {"$project": {"fund_id": 1, "amount": 1, "created_at": 1, "name": 1, "guest_email": 1}},
+        {"$facet": facets},
+    ]).to_list(1)
+    return result[0] if result else {"totals": [], "by_fund": [], "series": [], "top_contributors": []}
+
+async def fund_totals(registry_id: str) -> Dict[str, Dict[str, Any]]:
+    """Raised amount and contribution count per fund of a registry, from the rollups"""
+    rows = await db.contribution_rollups.aggregate([
+        {"$match": {"registry_id": registry_id}},
+        {"$group": {"_id": "$fund_id", "amount": {"$sum": "$amount"}, "count": {"$sum": "$count"}}},
+    ]).to_list(None)
+    return {r["_id"]: {"amount": r["amount"], "count": r["count"]} for r in rows}
+
+async def ensure_contribution_rollups():
+    """Build rollups once for databases that predate them"""
+    if (await db.contribution_rollups.estimated_document_count() == 0
+            and await db.contributions.estimated_document_count() > 0):
+        await rebuild_contribution_rollups()
+
+# ===== Platform Metrics =====
+PLATFORM_METRICS_ID = "global"
+
+async def record_contribution_metrics(contribution: "Contribution", currency: str, ctx: Optional[dict] = None):
+    """Fold one new contribution into the platform metrics document.
+
+    A fund/registry counts as active from its first contribution; the has_contributions flag makes
+    that transition happen exactly once even with concurrent contributions. Flags the cached
+    contribution context already shows as set are not written again, so past the first gift this is
+    one command; the context is marked once a flag is written.
+    """
+    ctx = ctx if ctx is not None else {}
+
+    async def activate(collection, doc_id: str, flag: str) -> int:
+        if ctx.get(flag):
+            return 0
+        res = await collection.update_one({"id": doc_id, "has_contributions": {"$ne": True}},
+                                          {"$set": {"has_contributions": True}})
+        ctx[flag] = True
+        return res.modified_count
+
+    new_gift, new_event = await asyncio.gather(
+        activate(db.funds, contribution.fund_id, "fund_has_contributions"),
+        activate(db.registries, contribution.registry_id, "registry_has_contributions"),
+    )
+    await db.platform_metrics.update_one(
+        {"_id": PLATFORM_METRICS_ID},
+        {
+            "$inc": {
+                "active_gifts": new_gift,
+                "active_events": new_event,
+                f"currencies.{currency}.sum": contribution.amount,
+                f"currencies.{currency}.count": 1,
+            },
+            "$max": {f"currencies.{currency}.max": contribution.amount},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+async def record_contribution_effects(contribution: "Contribution", ctx: dict):
+    """Rollup, platform metrics and audit entry for a stored contribution, run after its response is sent.
+
+    The contribution itself is already durable; a worker that dies first loses only derived data, which
+    reconcile_platform_metrics and rebuild_contribution_rollups recompute from the contributions.
+    """
+    rollup, metrics = await asyncio.gather(
+        record_contribution_rollup(contribution),
+        record_contribution_metrics(contribution, ctx.get("currency") or "AED", ctx),
+        return_exceptions=True,
+    )
+    for name, result in (("rollup", rollup), ("metrics", metrics)):
+        if isinstance(result, Exception):
+            logging.error(f"Contribution {contribution.id} {name} update failed: {result}")
+    await log_audit(contribution.registry_id, None, "contribution.create", {
+        "fund_id": contribution.fund_id,
+        "amount": contribution.amount,
+        "guest_name": contribution.name or "Anonymous"
+    })
+
+async def retract_contribution_metrics(registry: dict, fund: Optional[dict] = None):
+    """Subtract a fund's (or a whole registry's) contributions before they are deleted.
+
+    Sums and counts come from the rollups; a per-currency max cannot be un-applied and is left
+    for reconcile_platform_metrics to correct.
+    """
+    match: Dict[str, Any] = {"registry_id": registry["id"]}
+    if fund:
+        match["fund_id"] = fund["id"]
+    agg = await db.contribution_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "count": {"$sum": "$count"}, "amount": {"$sum": "$amount"}}},
+    ]).to_list(1)
+    if fund:
+        gifts = 1 if fund.get("has_contributions") else 0
+        events = 0
+        if gifts and registry.get("has_contributions"):
+            others = await db.funds.find_one(
+                {"registry_id": registry["id"], "id": {"$ne": fund["id"]}, "has_contributions": True}, {"_id": 1}
+            )
+            if not others:
+                events = 1
+                await db.registries.update_one({"id": registry["id"]}, {"$set": {"has_contributions": False}})
+    else:
+        gifts = await db.funds.count_documents({"registry_id": registry["id"], "has_contributions": True})
+        events = 1 if registry.get("has_contributions") else 0
+    if not agg and not gifts and not events:
+        return
+    currency = registry.get("currency", "AED")
+    await db.platform_metrics.update_one(
+        {"_id": PLATFORM_METRICS_ID},
+        {
+            "$inc": {
+                "active_gifts": -gifts,
+                "active_events": -events,
+                f"currencies.{currency}.sum": -(agg[0]["amount"] if agg else 0),
+                f"currencies.{currency}.count": -(agg[0]["count"] if agg else 0),
+            },
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+async def reconcile_platform_metrics() -> dict:
+    """Recompute the metrics document from raw contributions (one grouped pass) and replace it"""
+    rows = await db.contributions.aggregate([
+        {"$match": {"registry_id": {"$ne": None}}},
+        {"$group": {"_id": {"registry_id": "$registry_id", "fund_id": "$fund_id"},
+                    "sum": {"$sum": "$amount"}, "count": {"$sum": 1}, "max": {"$max": "$amount"}}},
+        {"$group": {"_id": "$_id.registry_id", "sum": {"$sum": "$sum"}, "count": {"$sum": "$count"},
+                    "max": {"$max": "$max"}, "gifts": {"$sum": 1}}},
+        {"$lookup": {"from": "registries", "localField": "_id", "foreignField": "id", "as": "registry"}},
+        # Soft-deleted registries were retracted when deleted; their contributions wait for the purge job
+        {"$match": {"registry.deleted_at": None}},
+        {"$group": {"_id": {"$ifNull": [{"$arrayElemAt": ["$registry.currency", 0]}, "AED"]},
+                    "sum": {"$sum": "$sum"}, "count": {"$sum": "$count"}, "max": {"$max": "$max"},
+                    "gifts": {"$sum": "$gifts"}, "events": {"$sum": 1}}},
+    ], allowDiskUse=True).to_list(None)
+    now = datetime.utcnow()
+    doc = {
+        "active_gifts": sum(r["gifts"] for r in rows),
+        "active_events": sum(r["events"] for r in rows),
+        "currencies": {r["_id"]: {"sum": r["sum"], "count": r["count"], "max": r["max"]} for r in rows},
+        "updated_at": now,
+        "reconciled_at": now,
+    }
+    await db.platform_metrics.replace_one({"_id": PLATFORM_METRICS_ID}, doc, upsert=True)
+    return doc
+
+async def ensure_platform_metrics():
+    """First run: flag funds/registries that already have contributions, then build the document"""
+    if await db.platform_metrics.find_one({"_id": PLATFORM_METRICS_ID}, {"_id": 1}):
+        return
+    for field, coll in (("fund_id", db.funds), ("registry_id", db.registries)):
+        ids = [i for i in await db.contributions.distinct(field) if i]
+        for i in range(0, len(ids), 1000):
+            await coll.update_many({"id": {"$in": ids[i:i + 1000]}}, {"$set": {"has_contributions": True}})
+    await reconcile_platform_metrics()
+
+# ===== Admin Stats Snapshot =====
+_admin_stats_snapshot: Optional[Dict[str, Any]] = None
+_admin_stats_last_request = 0.0
+
+async def compute_admin_stats() -> Dict[str, Any]:
+    """Admin overview; independent queries run concurrently and counts use collection metadata"""
+    users_count, regs_count, funds_count, contribs_count, last_users, last_regs, top_funds = await asyncio.gather(
+        db.users.estimated_document_count(),
+        db.registries.estimated_document_count(),
+        db.funds.estimated_document_count(),
+        db.contributions.estimated_document_count(),
+        db.users.find({}, {"_id": 0, **USER_PUBLIC_PROJECTION}).sort("created_at", -1).to_list(10),
+        db.registries.aggregate([
+            {"$sort": {"created_at": -1}},
+            {"$limit": 10},
+            {"$lookup": {"from": "users", "localField": "owner_id", "foreignField": "id", "as": "owner"}},
+            {"$set": {"owner_email": {"$arrayElemAt": ["$owner.email", 0]}}},
+            {"$project": {"_id": 0, "owner": 0, **REGISTRY_PUBLIC_PROJECTION}},
+        ]).to_list(10),
+        # Leaderboard from the rollups (one row per fund-day) rather than every contribution
+        db.contribution_rollups.aggregate([
+            {"$group": {"_id": "$fund_id", "sum": {"$sum": "$amount"}, "count": {"$sum": "$count"},
+                        "registry_id": {"$first": "$registry_id"}}},
+            {"$sort": {"sum": -1}},
+            {"$limit": 10},
+            {"$lookup": {"from": "funds", "localField": "_id", "foreignField": "id", "as": "fund"}},
+            {"$lookup": {"from": "registries", "localField": "registry_id", "foreignField": "id", "as": "registry"}},
+            {"$set": {"title": {"$arrayElemAt": ["$fund.title", 0]},
+                      "registry_slug": {"$arrayElemAt": ["$registry.slug", 0]}}},
+            {"$project": {"fund": 0, "registry": 0}},
+        ]).to_list(10),
+    )
+    return {
+        "counts": {"users": users_count, "registries": regs_count, "funds": funds_count, "contributions": contribs_count},
+        "last_users": last_users,
+        "last_registries": last_regs,
+        "top_funds": top_funds,
+        "generated_at": datetime.utcnow(),
+    }
+
+async def refresh_admin_stats(force: bool = False) -> Optional[Dict[str, Any]]:
+    """Recompute the snapshot; the background refresher skips this while nobody is looking at the admin page"""
+    global _admin_stats_snapshot
+    if not force and time.monotonic() - _admin_stats_last_request > ADMIN_STATS_IDLE_SEC:
+        return _admin_stats_snapshot
+    _admin_stats_snapshot = {"data": await compute_admin_stats(), "computed_at": time.monotonic()}
+    return _admin_stats_snapshot
+
+# ===== Email Outbox =====
+class OutboxEmail(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str
+    to: List[str]
+    subject: str
+    html: str
+    text: str
+    from_email: str = Field(default_factory=lambda: FROM_EMAIL)
+    status: str = "pending"  # pending | sending | sent | failed
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    last_error: Optional[str] = None
+    provider_id: Optional[str] = None
+    priority: int = 0  # lower is sent first; bulk campaigns must not delay receipts and password resets
+    campaign_id: Optional[str] = None
+    registry_id: Optional[str] = None  # set on campaign and digest mail, so the registry purge removes it
+    dedupe_key: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    def provider_params(self) -> Dict[str, Any]:
+        return {"from": self.from_email, "to": self.to, "subject": self.subject, "html": self.html, "text": self.text}
+
+class EmailProviderError(Exception):
+    def __init__(self, message: str, retryable: bool = True, rate_limited: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.rate_limited = rate_limited
+
+class ResendEmailProvider:
+    """Blocking Resend client; the delivery worker calls it from a thread, never on the event loop."""
+    name = "resend"
+    max_batch = 100
+
+    def send(self, params: Dict[str, Any]) -> str:
+        try:
+            return resend.Emails.send(params).get("id", "")
+        except Exception as e:
+            raise self._wrap(e)
+
+    def send_batch(self, params_list: List[Dict[str, Any]]) -> List[str]:
+        try:
+            resp = resend.Batch.send(params_list)
+        except Exception as e:
+            raise self._wrap(e)
+        return [item.get("id", "") for item in (resp or {}).get("data", [])]
+
+    @staticmethod
+    def _wrap(e: Exception) -> EmailProviderError:
+        if isinstance(e, resend.exceptions.RateLimitError):
+            return EmailProviderError(str(e), rate_limited=True)
+        if isinstance(e, (resend.exceptions.ValidationError, resend.exceptions.MissingRequiredFieldsError)):
+            return EmailProviderError(str(e), retryable=False)
+        return EmailProviderError(str(e))
+
+class FakeEmailProvider:
+    """In-memory provider for tests and benchmarks. Records messages instead of sending them."""
+    name = "fake"
+    max_batch = 100
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.sent: List[Dict[str, Any]] = []
+        self.calls = 0
+
+    def send(self, params: Dict[str, Any]) -> str:
+        return self.send_batch([params])[0]
+
+    def send_batch(self, params_list: List[Dict[str, Any]]) -> List[str]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise EmailProviderError("fake provider failure")
+        ids = [str(uuid.uuid4()) for _ in params_list]
+        self.sent.extend(params_list)
+        return ids
+
+def build_email_provider(name: str):
+    if name == "resend" and RESEND_API_KEY:
+        return ResendEmailProvider()
+    if name == "fake":
+        return FakeEmailProvider()
+    return None
+
+email_provider = build_email_provider(EMAIL_PROVIDER)
+EMAIL_ENABLED = email_provider is not None
+
+class RateLimiter:
+    """Token bucket pacing provider API calls; a rate-limit response pauses it for everyone."""
+
+    def __init__(self, rate_per_sec: float, burst: int = 1):
+        self.rate = rate_per_sec
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def email_retry_delay(attempts: int) -> timedelta:
+    # Exponential backoff with jitter, capped at six hours
+    delay = min(EMAIL_RETRY_BASE_SEC * (2 ** max(0, attempts - 1)), 6 * 3600)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+class EmailDeliveryWorker:
+    """Claims due messages from db.email_outbox and sends them with bounded concurrency.
+
+    Claims are leases: a worker that dies mid-send leaves messages in "sending" and another
+    worker picks them up once lease_until has passed.
+    """
+
+    def __init__(self, provider, concurrency: int = EMAIL_WORKER_CONCURRENCY, rate_per_sec: float = EMAIL_RATE_PER_SEC,
+                 batch_size: int = EMAIL_BATCH_SIZE):
+        self.provider = provider
+        self.batch_size = max(1, min(batch_size, getattr(provider, "max_batch", 1)))
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rate_per_sec, burst=self.concurrency)
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                sent = await self.process_once()
+            except Exception:
+                logging.exception("Email delivery loop failed")
+                sent = 0
+            if sent == 0 and not self._stopping:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=EMAIL_POLL_INTERVAL_SEC)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self) -> int:
+        """Deliver until nothing is due. Used by tests and benchmarks."""
+        total = 0
+        while True:
+            n = await self.process_once()
+            if n == 0:
+                return total
+            total += n
+
+    async def process_once(self) -> int:
+        claimed = await self.claim(self.batch_size * self.concurrency)
+        if not claimed:
+            return 0
+        chunks = [claimed[i:i + self.batch_size] for i in range(0, len(claimed), self.batch_size)]
+        await asyncio.gather(*(self.deliver(chunk) for chunk in chunks))
+        return len(claimed)
+
+    async def claim(self, limit: int) -> List[dict]:
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "lease_until": {"$lt": now}},
+        ]}
+        candidates = await (db.email_outbox.find(due, {"id": 1}).sort([("priority", 1), ("next_attempt_at", 1)])
+                            .limit(limit).to_list(limit))
+        if not candidates:
+            return []
+        lease = str(uuid.uuid4())
+        await db.email_outbox.update_many(
+            {"id": {"$in": [c["id"] for c in candidates]}, **due},
+            {"$set": {"status": "sending", "lease": lease, "lease_until": now + timedelta(seconds=EMAIL_LEASE_SEC)}},
+        )
+        return await db.email_outbox.find({"lease": lease}).to_list(limit)
+
+    async def deliver(self, docs: List[dict]):
+        params = [OutboxEmail(**{k: v for k, v in d.items() if k in OutboxEmail.model_fields}).provider_params()
+                  for d in docs]
+        async with self._sem:
+            await self.limiter.acquire()
+            try:
+                if len(params) == 1:
+                    provider_ids = [await asyncio.to_thread(self.provider.send, params[0])]
+                else:
+                    provider_ids = await asyncio.to_thread(self.provider.send_batch, params)
+            except EmailProviderError as e:
+                if e.rate_limited:
+                    self.limiter.pause(1.0)
+                await self._mark_failed(docs, e)
+                return
+            except Exception as e:
+                await self._mark_failed(docs, EmailProviderError(str(e)))
+                return
+        await self._mark_sent(docs, provider_ids)
+
+    async def _mark_sent(self, docs: List[dict], provider_ids: List[str]):
+        now = datetime.utcnow()
+        ops = []
+        for i, d in enumerate(docs):
+            ops.append(UpdateOne(
+                {"id": d["id"], "lease": d.get("lease")},
+                {"$set": {"status": "sent", "provider_id": provider_ids[i] if i < len(provider_ids) else None,
+                          "sent_at": now, "updated_at": now, "last_error": None},
+                 "$unset": {"lease": "", "lease_until": ""},
+                 "$inc": {"attempts": 1}},
+            ))
+        await db.email_outbox.bulk_write(ops, ordered=False)
+
+    async def _mark_failed(self, docs: List[dict], error: EmailProviderError):
+        now = datetime.utcnow()
+        ops = []
+        for d in docs:
+            # Provider throttling is not the message's fault, so it does not use up an attempt
+            attempts = d.get("attempts", 0) + (0 if error.rate_limited else 1)
+            give_up = not error.retryable or attempts >= EMAIL_MAX_ATTEMPTS
+            next_at = now + (timedelta(seconds=1) if error.rate_limited else email_retry_delay(attempts))
+            ops.append(UpdateOne(
+                {"id": d["id"], "lease": d.get("lease")},
+                {"$set": {"status": "failed" if give_up else "pending", "attempts": attempts,
+                          "next_attempt_at": next_at, "last_error": str(error)[:500], "updated_at": now},
+                 "$unset": {"lease": "", "lease_until": ""}},
+            ))
+        await db.email_outbox.bulk_write(ops, ordered=False)
+        logging.warning(f"Email delivery failed for {len(docs)} message(s): {error}")
+
+email_worker: Optional[EmailDeliveryWorker] = None
+
+async def enqueue_emails(messages: List[OutboxEmail]) -> List[str]:
+    """Queue messages and return the ids queued; a message whose dedupe_key is already queued is skipped"""
+    if not messages:
+        return []
+    skipped = set()
+    try:
+        await db.email_outbox.insert_many([m.model_dump() for m in messages], ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        skipped = {err["index"] for err in e.details["writeErrors"]}
+    if email_worker:
+        email_worker.notify()
+    return [m.id for i, m in enumerate(messages) if i not in skipped]
+
+async def enqueue_email(kind: str, to: List[str], subject: str, html: str, text: str) -> str:
+    ids = await enqueue_emails([OutboxEmail(kind=kind, to=to, subject=subject, html=html, text=text)])
+    return ids[0]
+
 # ===== Email Service =====
 async def send_contribution_receipt(
     guest_email: str,
@@ -238,8 +1209,8 @@ async def send_contribution_receipt(
     fund_title: str
 ):
     """Send a receipt email to the guest who made a contribution"""
-    if not RESEND_API_KEY:
-        logging.warning("Resend API key not configured, skipping email sending")
+    if not EMAIL_ENABLED:
+        logging.warning("Email provider not configured, skipping email sending")
         return
     
     try:
@@ -304,20 +1275,12 @@ async def send_contribution_receipt(
         Thank you for using our wedding registry service.
         """
         
-        params = {
-            "from": FROM_EMAIL,
-            "to": [guest_email],
-            "subject": subject,
-            "html": html_content,
-            "text": text_content,
-        }
-        
-        email = resend.Emails.send(params)
-        logging.info(f"Receipt email sent to {guest_email}, email_id: {email.get('id', 'unknown')}")
-        return email
+        outbox_id = await enqueue_email("contribution_receipt", [guest_email], subject, html_content, text_content)
+        logging.info(f"Receipt email queued for {guest_email}, outbox_id: {outbox_id}")
+        return outbox_id
         
     except Exception as e:
-        logging.error(f"Failed to send receipt email to {guest_email}: {str(e)}")
+        logging.error(f"Failed to queue receipt email to {guest_email}: {str(e)}")
         return None
 
 async def send_owner_notification(
@@ -330,8 +1293,8 @@ async def send_owner_notification(
     message: Optional[str] = None
 ):
     """Send a notification email to the registry owner about a new contribution"""
-    if not RESEND_API_KEY:
-        logging.warning("Resend API key not configured, skipping email sending")
+    if not EMAIL_ENABLED:
+        logging.warning("Email provider not configured, skipping email sending")
         return
     
     try:
@@ -409,30 +1372,217 @@ async def send_owner_notification(
         Log in to your registry dashboard to see more details and track your progress.
         """
         
-        params = {
-            "from": FROM_EMAIL,
-            "to": [owner_email],
-            "subject": subject,
-            "html": html_content,
-            "text": text_content,
-        }
-        
-        email = resend.Emails.send(params)
-        logging.info(f"Owner notification email sent to {owner_email}, email_id: {email.get('id', 'unknown')}")
-        return email
+        outbox_id = await enqueue_email("owner_notification", [owner_email], subject, html_content, text_content)
+        logging.info(f"Owner notification email queued for {owner_email}, outbox_id: {outbox_id}")
+        return outbox_id
         
     except Exception as e:
-        logging.error(f"Failed to send owner notification email to {owner_email}: {str(e)}")
+        logging.error(f"Failed to queue owner notification email to {owner_email}: {str(e)}")
         return None
 
+DIGEST_PERIODS = {"hourly": timedelta(hours=1), "daily": timedelta(days=1)}
+DIGEST_MAX_MESSAGES = 10
+DIGEST_LEASE_SEC = 600
+
+def digest_boundary(mode: str, now: datetime) -> datetime:
+    """End of the most recently completed digest period (UTC-aligned)"""
+    if mode == "daily":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+def render_owner_digest(
+    owner_name: str,
+    couple_names: str,
+    currency: str,
+    period_label: str,
+    count: int,
+    amount: float,
+    funds: List[Dict[str, Any]],
+    messages: List[Dict[str, Any]],
+) -> OutboxEmail:
+    plural = 's' if count != 1 else ''
+    subject = f"Your {period_label} gift summary: {count} contribution{plural}, {currency} {amount:.2f}"
+    # Fund titles, names and messages come from couples and guests; escape them like render_thank_you does
+    fund_rows = "".join(
+        f"<tr><td>{html.escape(str(f['title']))}</td><td>{f['count']}</td><td>{currency} {f['amount']:.2f}</td></tr>"
+        for f in funds
+    )
+    message_rows = "".join(
+        '<p style="font-style: italic; background: #f8f9fa; padding: 10px; border-left: 4px solid #007bff;">'
+        f'"{html.escape(str(m["message"]))}" <br><small>— {html.escape(str(m.get("name") or "Anonymous"))}</small></p>'
+        for m in messages
+    )
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <title>Gift Summary</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: #007bff; color: white; padding: 20px; border-radius: 8px; margin-bottom: 20px; }}
+            .amount {{ font-size: 24px; font-weight: bold; color: #28a745; }}
+            table {{ width: 100%; border-collapse: collapse; }}
+            td, th {{ text-align: left; padding: 6px; border-bottom: 1px solid #eee; }}
+            .footer {{ text-align: center; color: #666; font-size: 14px; margin-top: 30px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🎉 Your {period_label} gift summary</h1>
+                <p>Hello {html.escape(owner_name)},</p>
+                <p>{html.escape(couple_names)} received {count} new contribution{'s' if count != 1 else ''}.</p>
+            </div>
+            <p>Total: <span class="amount">{currency} {amount:.2f}</span></p>
+            <table>
+                <tr><th>Fund</th><th>Gifts</th><th>Amount</th></tr>
+                {fund_rows}
+            </table>
+            {message_rows}
+            <div class="footer">
+                <p>Log in to your registry dashboard to see every contribution.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    fund_lines = "\n".join(f"  {f['title']}: {f['count']} gift(s), {currency} {f['amount']:.2f}" for f in funds)
+    message_lines = "\n".join(f'  "{m["message"]}" — {m.get("name") or "Anonymous"}' for m in messages)
+    text_content = f"""
+    Your {period_label} gift summary
+
+    Hello {owner_name},
+
+    {couple_names} received {count} new contribution(s), totalling {currency} {amount:.2f}.
+
+{fund_lines}
+
+{message_lines}
+
+    Log in to your registry dashboard to see every contribution.
+    """
+    return OutboxEmail(kind="owner_digest", to=[], subject=subject, html=html_content, text=text_content)
+
+async def send_owner_digests(now: Optional[datetime] = None) -> int:
+    """Queue one summary email per digest registry that received gifts in the last completed period.
+
+    Registries are claimed with a single update that leases them for DIGEST_LEASE_SEC, so concurrent
+    workers never send the same window at once. digest_sent_through only advances once the emails are
+    queued; if a worker dies first the lease runs out and the window is sent again, the outbox dedupe
+    key dropping anything already queued. Returns the number of digests queued.
+    """
+    if not EMAIL_ENABLED:
+        return 0
+    now = now or datetime.utcnow()
+    queued = 0
+    for mode, period in DIGEST_PERIODS.items():
+        boundary = digest_boundary(mode, now)
+        claim = str(uuid.uuid4())
+        await db.registries.update_many(
+            {"notification_mode": mode, "deleted_at": None, "$and": [
+                {"$or": [{"digest_sent_through": {"$lt": boundary}}, {"digest_sent_through": None}]},
+                {"$or": [{"digest_claim_until": {"$lt": now}}, {"digest_claim_until": None}]},
+            ]},
+            [{"$set": {
+                "digest_window_start": {"$ifNull": ["$digest_sent_through", boundary - period]},
+                "digest_claim": claim,
+                "digest_claim_until": now + timedelta(seconds=DIGEST_LEASE_SEC),
+            }}],
+        )
+        claimed = await db.registries.find(
+            {"digest_claim": claim},
+            {"id": 1, "owner_id": 1, "couple_names": 1, "currency": 1, "digest_window_start": 1},
+        ).to_list(None)
+        if not claimed:
+            continue
+        queued += await queue_owner_digests(mode, boundary, claimed)
+        # $max: a notification mode switch meanwhile may have moved it past this window already
+        await db.registries.update_many(
+            {"digest_claim": claim},
+            {"$max": {"digest_sent_through": boundary}, "$unset": {"digest_claim": "", "digest_claim_until": ""}},
+        )
+    if queued:
+        logging.info(f"Queued {queued} owner digest email(s)")
+    return queued
+
+async def queue_owner_digests(mode: str, boundary: datetime, claimed: List[dict]) -> int:
+    """Summarise each claimed registry's contributions from its digest_window_start to boundary and queue the emails"""
+    by_start: Dict[datetime, List[str]] = {}
+    for r in claimed:
+        by_start.setdefault(r["digest_window_start"], []).append(r["id"])
+    summaries: Dict[str, dict] = {}
+    for start, registry_ids in by_start.items():
+        rows = await db.contributions.aggregate([
+            {"$match": {"registry_id": {"$in": registry_ids}, "created_at": {"$gte": start, "$lt": boundary}}},
+            {"$sort": {"created_at": 1}},
+            {"$group": {
+                "_id": {"registry_id": "$registry_id", "fund_id": "$fund_id"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"},
+                "messages": {"$push": {"$cond": [
+                    {"$gt": ["$message", ""]},
+                    {"name": "$name", "message": "$message"},
+                    "$$REMOVE",
+                ]}},
+            }},
+            {"$group": {
+                "_id": "$_id.registry_id",
+                "count": {"$sum": "$count"},
+                "amount": {"$sum": "$amount"},
+                "funds": {"$push": {"fund_id": "$_id.fund_id", "count": "$count", "amount": "$amount"}},
+                "messages": {"$push": "$messages"},
+            }},
+        ]).to_list(None)
+        for row in rows:
+            summaries[row["_id"]] = row
+    if not summaries:
+        return 0
+    fund_ids = list({f["fund_id"] for row in summaries.values() for f in row["funds"]})
+    fund_docs = await db.funds.find({"id": {"$in": fund_ids}}, {"id": 1, "title": 1}).to_list(len(fund_ids))
+    titles = {f["id"]: f.get("title", "") for f in fund_docs}
+    regs = {r["id"]: r for r in claimed if r["id"] in summaries}
+    owner_ids = list({r["owner_id"] for r in regs.values()})
+    owner_docs = await (db.users.find({"id": {"$in": owner_ids}}, {"id": 1, "email": 1, "name": 1})
+                        .to_list(len(owner_ids)))
+    owners = {u["id"]: u for u in owner_docs}
+    emails = []
+    for registry_id, row in summaries.items():
+        reg = regs[registry_id]
+        owner = owners.get(reg["owner_id"])
+        if not owner:
+            continue
+        funds = sorted(
+            ({"title": titles.get(f["fund_id"], "Unknown Fund"), "count": f["count"], "amount": f["amount"]}
+             for f in row["funds"]),
+            key=lambda f: -f["amount"],
+        )
+        messages = [m for fund_messages in row["messages"] for m in fund_messages][:DIGEST_MAX_MESSAGES]
+        email = render_owner_digest(
+            owner_name=owner.get("name", ""),
+            couple_names=reg.get("couple_names", ""),
+            currency=reg.get("currency", "AED"),
+            period_label="hourly" if mode == "hourly" else "daily",
+            count=row["count"],
+            amount=row["amount"],
+            funds=funds,
+            messages=messages,
+        )
+        email.to = [owner["email"]]
+        email.registry_id = registry_id
+        email.dedupe_key = f"owner_digest:{registry_id}:{reg['digest_window_start'].isoformat()}:{boundary.isoformat()}"
+        emails.append(email)
+    return len(await enqueue_emails(emails))
+
 async def send_password_reset_email(
     user_email: str,
     user_name: str,
     reset_token: str
 ):
     """Send a password reset email with reset token"""
-    if not RESEND_API_KEY:
-        logging.warning("Resend API key not configured, skipping email sending")
+    if not EMAIL_ENABLED:
+        logging.warning("Email provider not configured, skipping email sending")
         return
     
     # For development: Log the reset URL instead of sending email
@@ -529,20 +1679,12 @@ async def send_password_reset_email(
         """
         
         params = {
-            "from": FROM_EMAIL,
             "to": [user_email],
             "subject": subject,
             "html": html_content,
             "text": text_content,
         }
         
-        # Debug the API key setup
-        if not RESEND_API_KEY or RESEND_API_KEY == "":
-            logging.error(f"RESEND_API_KEY is not set or empty")
-            return None
-            
-        logging.info(f"Attempting to send email with API key: {RESEND_API_KEY[:10]}...")
-        
         # For production, use the verified account owner email for testing
         # In test mode, Resend only allows sending to the account owner
         test_recipient = "kshadid@gmail.com"  # Account owner email from Resend error
@@ -560,22 +1702,637 @@ async def send_password_reset_email(
         {params['html']}
         """
         
-        # Call Resend API with test recipient
-        email = resend.Emails.send(test_params)
-        
-        # Debug the response
-        logging.info(f"Password reset email sent to test recipient {test_recipient} for user {user_email}")
-        logging.info(f"Resend API response: {email}")
+        # Queue for delivery to the test recipient
+        outbox_id = await enqueue_email(
+            "password_reset", test_params["to"], test_params["subject"], test_params["html"], test_params["text"]
+        )
+        logging.info(f"Password reset email queued for test recipient {test_recipient} for user {user_email}, "
+                     f"outbox_id: {outbox_id}")
         
-        return email
+        return outbox_id
         
     except Exception as e:
-        logging.error(f"Failed to send password reset email to {user_email}: {str(e)}")
+        logging.error(f"Failed to queue password reset email to {user_email}: {str(e)}")
         logging.error(f"Exception type: {type(e)}")
         import traceback
         logging.error(f"Full traceback: {traceback.format_exc()}")
         return None
 
+# ===== Thank-you Campaigns =====
+class MessageTemplate:
+    """A str.format-style template parsed once and rendered per recipient.
+
+    Only the placeholders in FIELDS are allowed, so a typo is rejected when the campaign is
+    created rather than failing halfway through thousands of recipients.
+    """
+    FIELDS = {"guest_name", "couple_names", "gift_count", "gift_total", "currency"}
+
+    def __init__(self, source: str):
+        self.parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if field is not None and field not in self.FIELDS:
+                raise ValueError(f"Unknown placeholder {{{field}}}; use one of {', '.join(sorted(self.FIELDS))}")
+            if conversion or spec:
+                raise ValueError(f"Placeholder {{{field}}} cannot have a format spec or conversion")
+            self.parts.append((literal, field))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+class ThankYouCampaignIn(BaseModel):
+    subject: constr(min_length=1, max_length=200)
+    message: constr(min_length=1, max_length=10000)
+
+class ThankYouCampaign(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    registry_id: str
+    created_by: str
+    subject: str
+    message: str
+    status: str = "queued"  # queued | running | completed | failed
+    cursor: Optional[str] = None  # last recipient email queued; the run resumes after it
+    queued: int = 0
+    lease_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+def render_thank_you(subject: MessageTemplate, body: MessageTemplate, values: Dict[str, Any]) -> Dict[str, str]:
+    text_content = body.render(values)
+    paragraphs = "".join(f"<p>{html.escape(p).replace(chr(10), '<br>')}</p>"
+                         for p in text_content.split("\n\n") if p.strip())
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <title>Thank you</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .footer {{ text-align: center; color: #666; font-size: 14px; margin-top: 30px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            {paragraphs}
+            <div class="footer">
+                <p>Sent on behalf of {html.escape(str(values["couple_names"]))} by The giftspace</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return {"subject": subject.render(values), "html": html_content, "text": text_content}
+
+def thank_you_recipients_pipeline(registry_id: str, after: Optional[str]) -> List[Dict[str, Any]]:
+    """Distinct guest emails (case-insensitive) in a stable order, starting after the resume cursor"""
+    pipeline: List[Dict[str, Any]] = [
+        {"$match": {"registry_id": registry_id, "guest_email": {"$gt": ""}}},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": {"$toLower": "$guest_email"},
+            "name": {"$last": "$name"},
+            "gift_count": {"$sum": 1},
+            "gift_total": {"$sum": "$amount"},
+        }},
+    ]
+    if after:
+        pipeline.append({"$match": {"_id": {"$gt": after}}})
+    pipeline.append({"$sort": {"_id": 1}})
+    return pipeline
+
+async def _queue_thank_you_batch(campaign: dict, registry: dict, subject: MessageTemplate, body: MessageTemplate,
+                                 rows: List[dict]) -> int:
+    messages = []
+    for row in rows:
+        values = {
+            "guest_name": row.get("name") or "friend",
+            "couple_names": registry.get("couple_names", ""),
+            "gift_count": row["gift_count"],
+            "gift_total": f"{row['gift_total']:.2f}",
+            "currency": registry.get("currency", "AED"),
+        }
+        rendered = render_thank_you(subject, body, values)
+        messages.append(OutboxEmail(
+            kind="thank_you", to=[row["_id"]], priority=1, campaign_id=campaign["id"],
+            registry_id=campaign["registry_id"], dedupe_key=f"thank_you:{campaign['id']}:{row['_id']}", **rendered,
+        ))
+    # Rows queued by a previous run that crashed before saving its cursor are skipped by their dedupe_key
+    return len(await enqueue_emails(messages))
+
+async def run_thank_you_campaign(campaign_id: str):
+    """Stream recipients and queue personalised emails in batches, checkpointing after each batch.
+
+    The campaign is held by a renewable lease, so a crashed run is picked up again by
+    resume_thank_you_campaigns and continues after the saved cursor.
+    """
+    now = datetime.utcnow()
+    lease = str(uuid.uuid4())
+    campaign = await db.thank_you_campaigns.find_one_and_update(
+        {"id": campaign_id, "status": {"$in": ["queued", "running"]},
+         "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        {"$set": {"status": "running", "lease": lease, "lease_until": now + timedelta(seconds=THANK_YOU_LEASE_SEC),
+                  "updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not campaign:
+        return
+    try:
+        registry = await db.registries.find_one({"id": campaign["registry_id"], "deleted_at": None})
+        if not registry:
+            raise ValueError("Registry no longer exists")
+        subject = MessageTemplate(campaign["subject"])
+        body = MessageTemplate(campaign["message"])
+        cursor = db.contributions.aggregate(
+            thank_you_recipients_pipeline(campaign["registry_id"], campaign.get("cursor")),
+            allowDiskUse=True, batchSize=THANK_YOU_BATCH_SIZE,
+        )
+        batch: List[dict] = []
+        async for row in cursor:
+            batch.append(row)
+            if len(batch) >= THANK_YOU_BATCH_SIZE:
+                await _checkpoint_thank_you(campaign, lease, registry, subject, body, batch)
+                batch = []
+        if batch:
+            await _checkpoint_thank_you(campaign, lease, registry, subject, body, batch)
+        await db.thank_you_campaigns.update_one(
+            {"id": campaign_id, "lease": lease},
+            {"$set": {"status": "completed", "completed_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+             "$unset": {"lease": "", "lease_until": ""}},
+        )
+    except Exception as e:
+        logging.exception(f"Thank-you campaign {campaign_id} failed")
+        await db.thank_you_campaigns.update_one(
+            {"id": campaign_id, "lease": lease},
+            {"$set": {"status": "failed", "last_error": str(e)[:500], "updated_at": datetime.utcnow()},
+             "$unset": {"lease": "", "lease_until": ""}},
+        )
+
+async def _checkpoint_thank_you(campaign: dict, lease: str, registry: dict, subject: MessageTemplate,
+                                body: MessageTemplate, batch: List[dict]):
+    # Backpressure: don't run more than THANK_YOU_MAX_PENDING emails ahead of the delivery worker
+    pending = {"campaign_id": campaign["id"], "status": "pending"}
+    while await db.email_outbox.count_documents(pending, limit=THANK_YOU_MAX_PENDING) >= THANK_YOU_MAX_PENDING:
+        await db.thank_you_campaigns.update_one(
+            {"id": campaign["id"], "lease": lease},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=THANK_YOU_LEASE_SEC)}},
+        )
+        await asyncio.sleep(EMAIL_POLL_INTERVAL_SEC)
+    inserted = await _queue_thank_you_batch(campaign, registry, subject, body, batch)
+    now = datetime.utcnow()
+    res = await db.thank_you_campaigns.update_one(
+        {"id": campaign["id"], "lease": lease},
+        {"$set": {"cursor": batch[-1]["_id"], "lease_until": now + timedelta(seconds=THANK_YOU_LEASE_SEC),
+                  "updated_at": now},
+         "$inc": {"queued": inserted}},
+    )
+    if res.matched_count == 0:
+        raise RuntimeError("Lost campaign lease")
+
+async def resume_thank_you_campaigns():
+    stale = await db.thank_you_campaigns.find(
+        {"status": {"$in": ["queued", "running"]},
+         "$or": [{"lease_until": None}, {"lease_until": {"$lt": datetime.utcnow()}}]},
+        {"id": 1},
+    ).to_list(100)
+    for c in stale:
+        await run_thank_you_campaign(c["id"])
+
+async def thank_you_progress_many(campaigns: List[dict]) -> List[Dict[str, Any]]:
+    """Progress for each campaign, with outbox counts for all of them from one aggregate"""
+    if not campaigns:
+        return []
+    by_status = await db.email_outbox.aggregate([
+        {"$match": {"campaign_id": {"$in": [c["id"] for c in campaigns]}}},
+        {"$group": {"_id": {"campaign_id": "$campaign_id", "status": "$status"}, "count": {"$sum": 1}}},
+    ]).to_list(None)
+    counts: Dict[str, Dict[str, int]] = {}
+    for row in by_status:
+        counts.setdefault(row["_id"]["campaign_id"], {})[row["_id"]["status"]] = row["count"]
+    out = []
+    for campaign in campaigns:
+        c = counts.get(campaign["id"], {})
+        out.append({
+            "id": campaign["id"],
+            "status": campaign["status"],
+            "subject": campaign["subject"],
+            "queued": campaign.get("queued", 0),
+            "sent": c.get("sent", 0),
+            "failed": c.get("failed", 0),
+            "pending": c.get("pending", 0) + c.get("sending", 0),
+            "last_error": campaign.get("last_error"),
+            "created_at": campaign["created_at"],
+            "completed_at": campaign.get("completed_at"),
+        })
+    return out
+
+async def thank_you_progress(campaign: dict) -> Dict[str, Any]:
+    return (await thank_you_progress_many([campaign]))[0]
+
+# ===== Admin Search =====
+# Users and registries carry lowercase copies of their searchable text plus a multikey array of
+# trigrams. Prefix queries use ordinary indexes with an anchored regex; substring queries use the
+# trigram index and then confirm the match on the normalized field.
+SEARCH_PAGE_MAX = 100
+USER_PUBLIC_PROJECTION = {"password_hash": 0, "name_lower": 0, "search_grams": 0}
+REGISTRY_PUBLIC_PROJECTION = {"couple_names_lower": 0, "search_grams": 0}
+
+def normalize_search_text(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+def search_trigrams(*texts: Optional[str]) -> List[str]:
+    grams = set()
+    for text in texts:
+        t = normalize_search_text(text)
+        grams.update(t[i:i + 3] for i in range(len(t) - 2))
+    return sorted(grams)
+
+def user_search_fields(name: str, email: str) -> Dict[str, Any]:
+    return {"name_lower": normalize_search_text(name), "search_grams": search_trigrams(email, name)}
+
+def registry_search_fields(slug: str, couple_names: str) -> Dict[str, Any]:
+    return {"couple_names_lower": normalize_search_text(couple_names),
+            "search_grams": search_trigrams(slug, couple_names)}
+
+class SearchTier(BaseModel):
+    filter: Dict[str, Any]
+    sort_field: str
+    unique: bool = False  # sort_field is unique, so pages need no id tie-break (and its single-field index suffices)
+    hint: Optional[str] = None
+
+def search_tiers(q: str, exact_field: str, name_field: str) -> List[SearchTier]:
+    """Ranked match tiers: exact key, key prefix, name prefix, then substring anywhere"""
+    prefix = {"$regex": "^" + re.escape(q)}
+    tiers = [
+        SearchTier(filter={exact_field: q}, sort_field=exact_field, unique=True),
+        SearchTier(filter={exact_field: prefix}, sort_field=exact_field, unique=True),
+        SearchTier(filter={name_field: prefix}, sort_field=name_field),
+    ]
+    grams = search_trigrams(q)
+    if grams:
+        contains = {"$regex": re.escape(q)}
+        tiers.append(SearchTier(
+            filter={"search_grams": {"$all": grams}, "$or": [{exact_field: contains}, {name_field: contains}]},
+            sort_field=exact_field,
+            unique=True,
+            hint="search_grams_1",
+        ))
+    return tiers
+
+def encode_search_cursor(tier: int, value: Any, doc_id: str) -> str:
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps({"t": tier, "v": value, "i": doc_id}).encode()).decode()
+
+def decode_search_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(data["v"], dict):
+            data["v"] = datetime.fromisoformat(data["v"]["$date"])
+        return data
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def keyset_page(coll, filter: Dict[str, Any], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """Newest-first page of a collection, for paginated subresources"""
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    tiers = [SearchTier(filter=filter, sort_field="created_at")]
+    return await tiered_search(coll, tiers, {}, limit, cursor, direction=-1)
+
+async def tiered_search(coll, tiers: List[SearchTier], projection: Dict[str, Any], limit: int, cursor: Optional[str],
+                        direction: int = 1) -> Dict[str, Any]:
+    """Keyset-paginate through tiers in rank order; each tier excludes documents matched by earlier ones"""
+    start = decode_search_cursor(cursor) if cursor else None
+    items: List[dict] = []
+    next_cursor = None
+    for index, tier in enumerate(tiers):
+        if start and index < start["t"]:
+            continue
+        clauses = [tier.filter]
+        if index:
+            clauses.append({"$nor": [t.filter for t in tiers[:index]]})
+        if start and index == start["t"] and start["v"] is not None:
+            op = "$gt" if direction == 1 else "$lt"
+            if tier.unique:
+                clauses.append({tier.sort_field: {op: start["v"]}})
+            else:
+                # The inclusive bound is implied by the $or but gives the planner an index range to seek to
+                clauses.append({tier.sort_field: {op + "e": start["v"]}})
+                clauses.append({"$or": [{tier.sort_field: {op: start["v"]}},
+                                        {tier.sort_field: start["v"], "id": {op: start["i"]}}]})
+        want = limit - len(items)
+        # The sort key is needed for the cursor even when the projection hides it
+        hidden_sort_key = tier.sort_field in projection
+        query = {"$and": clauses} if len(clauses) > 1 else clauses[0]
+        fields = {k: v for k, v in projection.items() if k != tier.sort_field}
+        sort = [(tier.sort_field, direction)] if tier.unique else [(tier.sort_field, direction), ("id", direction)]
+
+        def fetch(hint: Optional[str]):
+            find = coll.find(query, fields).sort(sort).limit(want + 1)
+            return (find.hint(hint) if hint else find).to_list(want + 1)
+
+        try:
+            batch = await fetch(tier.hint)
+        except OperationFailure:
+            if not tier.hint:
+                raise
+            # The hinted index is missing or still building in the background; let the planner choose
+            batch = await fetch(None)
+        if len(batch) > want:
+            last = batch[want - 1]
+            next_cursor = encode_search_cursor(index, last.get(tier.sort_field), last["id"])
+        for doc in batch[:want]:
+            doc.pop("_id", None)
+            if hidden_sort_key:
+                doc.pop(tier.sort_field, None)
+        items.extend(batch[:want])
+        if next_cursor:
+            break
+        if len(items) >= limit:
+            # Page filled up exactly at a tier boundary; the next page starts at the following tier
+            if index + 1 < len(tiers):
+                next_cursor = encode_search_cursor(index + 1, None, "")
+            break
+    return {"items": items, "next_cursor": next_cursor}
+
+# ===== Fund Ranking =====
+# Funds are ordered by `rank`, a base62 string compared lexicographically. Appending takes a fixed-width
+# rank from the registry's fund_seq counter (atomic, so concurrent creates never collide); moving a fund
+# gives it a rank between its new neighbours, touching only that fund. Generated ranks never end in "0",
+# so there is always room between two of them. Ranks that grow past FUND_RANK_MAX_LEN flag the registry
+# and the rebalance job rewrites its ranks evenly.
+RANK_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+FUND_RANK_MAX_LEN = 16
+FUND_SORT = [("rank", 1), ("order", 1)]
+
+def rank_for_seq(seq: int) -> str:
+    digits = ""
+    while seq:
+        seq, d = divmod(seq, len(RANK_ALPHABET))
+        digits = RANK_ALPHABET[d] + digits
+    return digits.rjust(6, "0") + "V"
+
+def seq_of_rank(rank: str) -> int:
+    seq = 0
+    for ch in rank[:6]:
+        seq = seq * len(RANK_ALPHABET) + RANK_ALPHABET.index(ch)
+    return seq
+
+def rank_between(lo: Optional[str], hi: Optional[str]) -> str:
+    """A rank strictly between lo and hi (None meaning no bound)"""
+    lo = lo or ""
+    base = len(RANK_ALPHABET)
+    result = ""
+    i = 0
+    while True:
+        d_lo = RANK_ALPHABET.index(lo[i]) if i < len(lo) else 0
+        d_hi = RANK_ALPHABET.index(hi[i]) if hi is not None and i < len(hi) else base
+        mid = (d_lo + d_hi) // 2
+        if mid > d_lo:
+            return result + RANK_ALPHABET[mid]
+        result += RANK_ALPHABET[d_lo]
+        if d_lo < d_hi:
+            # Already below hi; the remaining digits only need to stay above lo
+            hi = None
+        i += 1
+
+async def allocate_fund_seqs(registry_id: str, count: int) -> List[int]:
+    """Reserve `count` consecutive numbers from the registry's fund sequence"""
+    if count <= 0:
+        return []
+    reg = await db.registries.find_one_and_update(
+        {"id": registry_id}, {"$inc": {"fund_seq": count}}, projection={"fund_seq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    last = reg["fund_seq"]
+    return list(range(last - count + 1, last + 1))
+
+async def allocate_fund_ranks(registry_id: str, count: int) -> List[str]:
+    return [rank_for_seq(seq) for seq in await allocate_fund_seqs(registry_id, count)]
+
+async def rebalance_fund_ranks(registry_id: str):
+    """Rewrite a registry's ranks evenly in their current order"""
+    funds = await (db.funds.find({"registry_id": registry_id}, {"id": 1})
+                   .sort(FUND_SORT + [("created_at", 1)]).to_list(None))
+    ranks = await allocate_fund_ranks(registry_id, len(funds))
+    if funds:
+        await db.funds.bulk_write([UpdateOne({"_id": f["_id"]}, {"$set": {"rank": r}}) for f, r in zip(funds, ranks)],
+                                  ordered=False)
+
+async def rebalance_dense_rankings():
+    while True:
+        reg = await db.registries.find_one_and_update(
+            {"fund_ranks_dense": True}, {"$unset": {"fund_ranks_dense": ""}}, projection={"id": 1}
+        )
+        if not reg:
+            return
+        await rebalance_fund_ranks(reg["id"])
+
+async def backfill_fund_ranks():
+    """One-off migration: rank funds created before ranks existed, keeping their `order`"""
+    for registry_id in await db.funds.distinct("registry_id", {"rank": None}):
+        await rebalance_fund_ranks(registry_id)
+
+def _increasing_subsequence(ranks: List[Optional[str]]) -> set:
+    """Indexes of a longest strictly increasing run of ranks (None entries never qualify)"""
+    tails: List[int] = []
+    prev: Dict[int, Optional[int]] = {}
+    for i, r in enumerate(ranks):
+        if r is None:
+            continue
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            m = (lo + hi) // 2
+            if ranks[tails[m]] < r:
+                lo = m + 1
+            else:
+                hi = m
+        prev[i] = tails[lo - 1] if lo else None
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    keep = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+async def rank_sequence(registry_id: str, current: List[Optional[str]]) -> List[str]:
+    """Ranks for funds listed in their desired order, given their current ranks (None for new funds).
+
+    The longest already-ordered run keeps its ranks; the others are slotted between neighbours, or take
+    fresh append ranks when nothing kept follows them, so only out-of-place funds change.
+    """
+    keep = _increasing_subsequence(current)
+    ranks: List[Optional[str]] = [current[i] if i in keep else None for i in range(len(current))]
+    last_kept = max(keep) if keep else -1
+    appended = iter(await allocate_fund_ranks(registry_id, len(current) - 1 - last_kept))
+    for i in range(len(current)):
+        if ranks[i] is not None:
+            continue
+        if i > last_kept:
+            ranks[i] = next(appended)
+        else:
+            hi = next(ranks[j] for j in range(i + 1, len(current)) if j in keep)
+            ranks[i] = rank_between(ranks[i - 1] if i else None, hi)
+    return ranks
+
+# ===== Contribution Context Cache =====
+# Everything create_contribution needs about a fund's registry and owner, read with one $lookup pipeline
+# and kept per worker for CONTRIBUTION_CONTEXT_TTL_SEC, so a hit costs no reads at all. Writes on this worker
+# invalidate it directly; changes made through another worker (a renamed fund, a lock, a soft delete) take
+# effect within the TTL. Contributions that slip into a registry deleted meanwhile go with it when it is purged.
+_contribution_context_cache: Dict[str, Tuple[float, dict]] = {}
+CONTRIBUTION_CONTEXT_MAX_ENTRIES = 10000
+
+async def contribution_context(fund_id: str) -> Optional[dict]:
+    hit = _contribution_context_cache.get(fund_id)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    rows = await db.funds.aggregate([
+        {"$match": {"id": fund_id}},
+        {"$limit": 1},
+        {"$lookup": {"from": "registries", "localField": "registry_id", "foreignField": "id", "as": "registry"}},
+        {"$unwind": {"path": "$registry", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {"from": "users", "localField": "registry.owner_id", "foreignField": "id", "as": "owner"}},
+        {"$project": {
+            "_id": 0,
+            "fund_id": "$id",
+            "fund_title": "$title",
+            "fund_has_contributions": "$has_contributions",
+            "registry_id": "$registry.id",
+            "locked": "$registry.locked",
+            "deleted_at": "$registry.deleted_at",
+            "currency": "$registry.currency",
+            "couple_names": "$registry.couple_names",
+            "notification_mode": "$registry.notification_mode",
+            "registry_has_contributions": "$registry.has_contributions",
+            "owner_email": {"$arrayElemAt": ["$owner.email", 0]},
+            "owner_name": {"$arrayElemAt": ["$owner.name", 0]},
+        }},
+    ]).to_list(1)
+    if not rows:
+        return None
+    _contribution_context_cache.pop(fund_id, None)
+    while len(_contribution_context_cache) >= CONTRIBUTION_CONTEXT_MAX_ENTRIES:
+        # Dicts keep insertion order, so the first key is the oldest entry
+        _contribution_context_cache.pop(next(iter(_contribution_context_cache)))
+    _contribution_context_cache[fund_id] = (time.monotonic() + CONTRIBUTION_CONTEXT_TTL_SEC, rows[0])
+    return rows[0]
+
+def invalidate_contribution_context(registry_id: str):
+    for fund_id, (_, ctx) in list(_contribution_context_cache.items()):
+        if ctx.get("registry_id") == registry_id:
+            _contribution_context_cache.pop(fund_id, None)
+
+# ===== Idempotency Keys =====
+# Clients send an Idempotency-Key header so retries of a write can be replayed instead of repeated.
+# The first request claims the key with an insert (unique index), recording which resource it will
+# create; a retry finds the claim and returns that resource. A claim whose resource never appeared
+# (the worker died mid-request) can be taken over after IDEMPOTENCY_CLAIM_TIMEOUT_SEC.
+# Keys expire after IDEMPOTENCY_KEY_TTL_HOURS.
+IDEMPOTENCY_KEY_MAX_LEN = 255
+
+def request_fingerprint(body: BaseModel) -> str:
+    return hashlib.sha256(body.model_dump_json().encode()).hexdigest()
+
+async def find_idempotency_claim(scope: str, key: str, fingerprint: str) -> Optional[dict]:
+    """The existing claim on a key, if any; a claim made for a different request body is rejected"""
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LEN:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    claim = await db.idempotency_keys.find_one({"scope": scope, "key": key}, {"_id": 0})
+    if claim and claim["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return claim
+
+async def claim_idempotency_key(scope: str, key: str, fingerprint: str, resource_id: str) -> Optional[dict]:
+    """Claim the key for a new resource; returns the earlier claim instead if the key was already used"""
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LEN:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    now = datetime.utcnow()
+    try:
+        await db.idempotency_keys.insert_one({
+            "scope": scope, "key": key, "fingerprint": fingerprint,
+            "resource_id": resource_id, "created_at": now, "claimed_at": now,
+        })
+        return None
+    except DuplicateKeyError:
+        claim = await find_idempotency_claim(scope, key, fingerprint)
+    if not claim:
+        # Expired between the insert and the read; treat the request as new
+        return await claim_idempotency_key(scope, key, fingerprint, resource_id)
+    return claim
+
+async def take_over_idempotency_key(scope: str, key: str, claim: dict, resource_id: str) -> bool:
+    """Re-claim a key whose request has not created its resource within IDEMPOTENCY_CLAIM_TIMEOUT_SEC"""
+    now = datetime.utcnow()
+    if (claim.get("claimed_at") or claim["created_at"]) > now - timedelta(seconds=IDEMPOTENCY_CLAIM_TIMEOUT_SEC):
+        return False
+    # Conditional on the old resource id, so only one of several concurrent retries wins
+    taken = await db.idempotency_keys.update_one(
+        {"scope": scope, "key": key, "resource_id": claim["resource_id"]},
+        {"$set": {"resource_id": resource_id, "claimed_at": now}},
+    )
+    return taken.modified_count == 1
+
+async def release_idempotency_key(scope: str, key: str):
+    """Free a key whose request failed before creating anything, so the client can retry it"""
+    await db.idempotency_keys.delete_one({"scope": scope, "key": key})
+
+# ===== Delta Sync =====
+# Dashboards poll with ?since=<cursor>. The cursor is the server time when the previous response was
+# built; reads go back SYNC_OVERLAP_SEC further so writes that were in flight (or stamped by a server
+# with a slightly behind clock) are not missed. Clients apply changes by id, so overlap is harmless.
+# Deletions are kept as tombstones for TOMBSTONE_TTL_DAYS; older cursors get 410 and must refetch, as do
+# cursors with more than SYNC_MAX_CHANGES changes or deletions behind them.
+SYNC_OVERLAP_SEC = 5
+TOMBSTONE_TTL_DAYS = 30
+SYNC_MAX_CHANGES = 1000
+
+class Tombstone(BaseModel):
+    kind: Literal["fund", "contribution"]
+    id: str
+    registry_id: str
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
+
+def new_sync_cursor() -> str:
+    return datetime.utcnow().isoformat()
+
+def sync_window_start(since: str) -> datetime:
+    try:
+        t = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since cursor")
+    if t.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+    if t < datetime.utcnow() - timedelta(days=TOMBSTONE_TTL_DAYS):
+        raise HTTPException(status_code=410, detail="Cursor expired; refetch without since")
+    return t - timedelta(seconds=SYNC_OVERLAP_SEC)
+
+def check_sync_changes(*batches: list):
+    """410 when a delta read hit its cap: the changes past it would be lost if the cursor moved on"""
+    if any(len(batch) > SYNC_MAX_CHANGES for batch in batches):
+        raise HTTPException(status_code=410, detail="Too many changes since cursor; refetch without since")
+
+async def record_tombstones(registry_id: str, kind: str, ids: List[str]):
+    if ids:
+        await db.tombstones.insert_many([Tombstone(kind=kind, id=i, registry_id=registry_id).model_dump() for i in ids])
+
+async def tombstones_since(registry_id: str, t: datetime) -> List[Tombstone]:
+    docs = await (db.tombstones.find({"registry_id": registry_id, "deleted_at": {"$gte": t}}, {"_id": 0})
+                  .limit(SYNC_MAX_CHANGES + 1).to_list(SYNC_MAX_CHANGES + 1))
+    return [Tombstone(**d) for d in docs]
+
 # ===== Auth helpers =====
 async def find_user_by_email(email: str) -> Optional[dict]:
     return await db.users.find_one({"email": email.lower()})
@@ -623,6 +2380,16 @@ async def is_admin_user(user: UserPublic) -> bool:
 def is_owner_or_collab(reg: dict, user_id: str) -> bool:
     return reg.get("owner_id") == user_id or user_id in (reg.get("collaborators") or [])
 
+def editable_registry_filter(registry_id: str, user_id: str) -> Dict[str, Any]:
+    """Query-side equivalent of is_owner_or_collab, for writes that check access in the same round trip"""
+    return {"id": registry_id, "deleted_at": None, "$or": [{"owner_id": user_id}, {"collaborators": user_id}]}
+
+async def raise_registry_access_error(registry_id: str):
+    """After a guarded write matched nothing: 404 if the registry is missing, otherwise 403"""
+    if not await db.registries.find_one({"id": registry_id, "deleted_at": None}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Registry not found")
+    raise HTTPException(status_code=403, detail="Access denied")
+
 # ===== Routes =====
 @api_router.get("/")
 async def root():
@@ -633,11 +2400,11 @@ async def root():
 async def register(body: UserCreate, request: Request):
     await rate_limit(request, key="register", limit=10, window_sec=60)
     email = body.email.lower()
-    existing = await find_user_by_email(email)
-    if existing:
-        raise HTTPException(status_code=409, detail="Email already registered")
     user = User(name=body.name, email=email, password_hash=hash_password(body.password), is_admin=(email in ADMIN_EMAILS))
-    await db.users.insert_one(user.model_dump())
+    try:
+        await db.users.insert_one({**user.model_dump(), **user_search_fields(user.name, user.email)})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Email already registered")
     token = create_access_token(user.id)
     return TokenResponse(access_token=token, user=UserPublic(id=user.id, name=user.name, email=user.email))
 
@@ -653,7 +2420,7 @@ async def login(body: LoginBody, request: Request):
     # If admin allowlisted email does not exist yet, bootstrap account on first login
     if not user and email in ADMIN_EMAILS:
         user_obj = User(name=email.split('@')[0], email=email, password_hash=hash_password(body.password), is_admin=True)
-        await db.users.insert_one(user_obj.model_dump())
+        await db.users.insert_one({**user_obj.model_dump(), **user_search_fields(user_obj.name, user_obj.email)})
         user = user_obj.model_dump()
     if not user or not verify_password(body.password, user.get("password_hash", "")):
         # If it's an allowlisted admin email, reset password on failed login (dev convenience)
@@ -678,6 +2445,9 @@ class PasswordResetConfirm(BaseModel):
     token: str
     new_password: constr(min_length=8)
 
+def password_reset_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 @api_router.post("/auth/password-reset/request")
 async def request_password_reset(body: PasswordResetRequest, request: Request, background_tasks: BackgroundTasks):
     """Request a password reset - sends email with reset token"""
@@ -690,13 +2460,13 @@ async def request_password_reset(body: PasswordResetRequest, request: Request, b
     if not user:
         return {"message": "If an account with this email exists, you will receive a password reset link."}
     
-    # Create reset token (valid for 1 hour)
-    reset_token = create_access_token(user["id"], expires_delta=timedelta(hours=1))
+    # Create reset token (valid for 1 hour); only its digest is stored
+    reset_token = secrets.token_urlsafe(32)
     
     # Store reset token in database with expiration
     await db.password_resets.insert_one({
         "user_id": user["id"],
-        "token": reset_token,
+        "token_hash": password_reset_digest(reset_token),
         "created_at": datetime.now(timezone.utc),
         "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
         "used": False
@@ -712,36 +2482,28 @@ async def confirm_password_reset(body: PasswordResetConfirm, request: Request):
     """Confirm password reset with token and set new password"""
     await rate_limit(request, key="password_reset_confirm", limit=5, window_sec=60)
     
-    # Find and validate reset token
-    reset_record = await db.password_resets.find_one({
-        "token": body.token,
-        "used": False,
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    })
+    # Validate and consume the token in one step, so it can only ever be redeemed once
+    now = datetime.now(timezone.utc)
+    reset_record = await db.password_resets.find_one_and_update(
+        {"token_hash": password_reset_digest(body.token), "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True, "used_at": now}},
+        projection={"user_id": 1},
+    )
     
     if not reset_record:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
-    # Get user
-    user = await db.users.find_one({"id": reset_record["user_id"]})
-    if not user:
-        raise HTTPException(status_code=400, detail="User not found")
-    
     # Update password
     new_password_hash = hash_password(body.new_password)
-    await db.users.update_one(
-        {"id": user["id"]},
+    updated = await db.users.update_one(
+        {"id": reset_record["user_id"]},
         {"$set": {"password_hash": new_password_hash}}
     )
-    
-    # Mark reset token as used
-    await db.password_resets.update_one(
-        {"_id": reset_record["_id"]},
-        {"$set": {"used": True}}
-    )
+    if not updated.matched_count:
+        raise HTTPException(status_code=400, detail="User not found")
     
     # Log password reset for security
-    logging.info(f"Password reset completed for user {user['email']}")
+    logging.info(f"Password reset completed for user {reset_record['user_id']}")
     
     return {"message": "Password reset successful. You can now login with your new password."}
 
@@ -754,114 +2516,142 @@ class AdminMe(BaseModel):
 async def admin_me(current: UserPublic = Depends(get_user_from_token)):
     return AdminMe(email=current.email, is_admin=await is_admin_user(current))
 
+@api_router.get("/admin/indexes")
+async def admin_indexes(current: UserPublic = Depends(get_user_from_token)):
+    """Index drift against the spec; `building` is true while the startup build is still running"""
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    return {"building": "ensure_indexes" in _background_tasks, **await index_drift()}
+
 @api_router.get("/admin/stats")
-async def admin_stats(current: UserPublic = Depends(get_user_from_token)):
+async def admin_stats(refresh: bool = False, current: UserPublic = Depends(get_user_from_token)):
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    users_count = await db.users.count_documents({})
-    regs_count = await db.registries.count_documents({})
-    funds_count = await db.funds.count_documents({})
-    contribs_count = await db.contributions.count_documents({})
-    last_users = await db.users.find({}, {"password_hash": 0}).sort("created_at", -1).to_list(10)
-    for u in last_users:
-        u.pop("_id", None)
-    last_regs = await db.registries.find({}).sort("created_at", -1).to_list(10)
-    owner_ids = list({r['owner_id'] for r in last_regs if 'owner_id' in r})
-    owners = {u['id']: u for u in await db.users.find({"id": {"$in": owner_ids}}).to_list(len(owner_ids))}
-    out_regs = []
-    for r in last_regs:
-        r.pop("_id", None)
-        out_regs.append({**r, "owner_email": owners.get(r.get('owner_id',''), {}).get('email')})
-    top_funds_raw = await db.contributions.aggregate([
-        {"$group": {"_id": "$fund_id", "sum": {"$sum": "$amount"}, "count": {"$sum": 1}}},
-        {"$sort": {"sum": -1}},
-        {"$limit": 10},
-    ]).to_list(10)
-    return {
-        "counts": {"users": users_count, "registries": regs_count, "funds": funds_count, "contributions": contribs_count},
-        "last_users": last_users,
-        "last_registries": out_regs,
-        "top_funds": top_funds_raw,
-    }
+    global _admin_stats_last_request
+    _admin_stats_last_request = time.monotonic()
+    snapshot = _admin_stats_snapshot
+    if refresh or not snapshot or time.monotonic() - snapshot["computed_at"] > 2 * ADMIN_STATS_REFRESH_SEC:
+        snapshot = await refresh_admin_stats(force=True)
+    return snapshot["data"]
 
 @api_router.get("/admin/metrics")
 async def admin_metrics(current: UserPublic = Depends(get_user_from_token)):
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    distinct_fund_ids = await db.contributions.distinct('fund_id')
-    active_gifts = len(distinct_fund_ids)
-    active_event_ids: set[str] = set()
-    if distinct_fund_ids:
-        funds = await db.funds.find({"id": {"$in": distinct_fund_ids}}).to_list(len(distinct_fund_ids))
-        active_event_ids = {f.get('registry_id') for f in funds if f.get('registry_id')}
-    active_events = len(active_event_ids)
-
-    agg = await db.contributions.aggregate([
-        {"$group": {"_id": None, "avg": {"$avg": "$amount"}, "max": {"$max": "$amount"}}}
-    ]).to_list(1)
-    avg_amount = float(agg[0]['avg']) if agg else 0.0
-    max_amount = float(agg[0]['max']) if agg else 0.0
-    return {"active_events": active_events, "active_gifts": active_gifts, "average_amount": avg_amount, "max_amount": max_amount}
+    doc = await db.platform_metrics.find_one({"_id": PLATFORM_METRICS_ID})
+    if not doc:
+        doc = await reconcile_platform_metrics()
+    currencies = doc.get("currencies") or {}
+    total_sum = sum(c.get("sum", 0) for c in currencies.values())
+    total_count = sum(c.get("count", 0) for c in currencies.values())
+    return {
+        "active_events": doc.get("active_events", 0),
+        "active_gifts": doc.get("active_gifts", 0),
+        "average_amount": float(total_sum / total_count) if total_count else 0.0,
+        "max_amount": float(max((c.get("max", 0) for c in currencies.values()), default=0.0)),
+        "by_currency": {
+            cur: {**c, "average": (c["sum"] / c["count"]) if c.get("count") else 0.0}
+            for cur, c in sorted(currencies.items()) if c.get("count")
+        },
+        "updated_at": doc.get("updated_at"),
+        "reconciled_at": doc.get("reconciled_at"),
+    }
+
+@api_router.get("/admin/db-stats")
+async def admin_db_stats(current: UserPublic = Depends(get_user_from_token)):
+    """Mongo commands, time and documents returned per route for this worker process, costliest routes first"""
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    rows = [
+        {
+            "route": route,
+            "requests": t["requests"],
+            "commands_per_request": t["commands"] / t["requests"],
+            "max_commands": t["max_commands"],
+            "db_ms_per_request": t["duration_ms"] / t["requests"],
+            "documents_per_request": t["documents"] / t["requests"],
+            "db_ms_total": t["duration_ms"],
+        }
+        for route, t in list(_route_db_stats.items())
+    ]
+    return sorted(rows, key=lambda r: r["db_ms_total"], reverse=True)
 
 @api_router.get("/admin/users")
-async def admin_users(query: Optional[str] = None, current: UserPublic = Depends(get_user_from_token)):
+async def admin_users(
+    query: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current: UserPublic = Depends(get_user_from_token)
+):
+    """Ranked search (exact email, email prefix, name prefix, substring) or newest users when query is empty"""
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    q = {}
-    if query:
-        q = {"email": {"$regex": query, "$options": "i"}}
-    items = await db.users.find(q, {"password_hash": 0}).sort("created_at", -1).to_list(50)
-    for it in items:
-        it.pop("_id", None)
-    return items
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    q = normalize_search_text(query)
+    if q:
+        return await tiered_search(db.users, search_tiers(q, "email", "name_lower"), USER_PUBLIC_PROJECTION, limit,
+                                   cursor)
+    newest = [SearchTier(filter={}, sort_field="created_at")]
+    return await tiered_search(db.users, newest, USER_PUBLIC_PROJECTION, limit, cursor, direction=-1)
 
 @api_router.get("/admin/users/lookup")
 async def admin_users_lookup(ids: str, current: UserPublic = Depends(get_user_from_token)):
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
     arr = [i.strip() for i in ids.split(',') if i.strip()]
-    items = await db.users.find({"id": {"$in": arr}}, {"password_hash": 0}).to_list(len(arr))
+    items = await db.users.find({"id": {"$in": arr}}, USER_PUBLIC_PROJECTION).to_list(len(arr))
     for it in items:
         it.pop("_id", None)
     return items
 
 @api_router.get("/admin/users/{user_id}/detail")
 async def admin_user_detail(user_id: str, current: UserPublic = Depends(get_user_from_token)):
+    """User with their owned and collaborated registries; audit entries are paged via /admin/users/{id}/audit"""
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    usr = await db.users.find_one({"id": user_id}, {"password_hash": 0})
+    usr, owned, collab = await asyncio.gather(
+        db.users.find_one({"id": user_id}, {"_id": 0, **USER_PUBLIC_PROJECTION}),
+        db.registries.find({"owner_id": user_id, "deleted_at": None}, {"_id": 0, **REGISTRY_PUBLIC_PROJECTION})
+        .sort("created_at", -1).to_list(100),
+        db.registries.find({"collaborators": user_id, "deleted_at": None}, {"_id": 0, **REGISTRY_PUBLIC_PROJECTION})
+        .sort("created_at", -1).to_list(100),
+    )
     if not usr:
         raise HTTPException(status_code=404, detail="User not found")
-    usr.pop("_id", None)
-    owned = await db.registries.find({"owner_id": user_id}).sort("created_at", -1).to_list(100)
-    for r in owned:
-        r.pop("_id", None)
-    collab = await db.registries.find({"collaborators": {"$in": [user_id]}}).sort("created_at", -1).to_list(100)
-    for r in collab:
-        r.pop("_id", None)
-    recent_audit = await db.audit_logs.find({"user_id": user_id}).sort("created_at", -1).to_list(20)
-    for a in recent_audit:
-        a.pop("_id", None)
-    return {"user": usr, "registries_owned": owned, "registries_collab": collab, "recent_audit": recent_audit}
+    return {"user": usr, "registries_owned": owned, "registries_collab": collab}
+
+@api_router.get("/admin/users/{user_id}/audit")
+async def admin_user_audit(user_id: str, cursor: Optional[str] = None, limit: int = 20, action: Optional[str] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           current: UserPublic = Depends(get_user_from_token)):
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    return await keyset_page(db.audit_logs, audit_filter({"user_id": user_id}, action, None, start, end), limit, cursor)
 
 @api_router.get("/admin/registries")
-async def admin_registries(query: Optional[str] = None, current: UserPublic = Depends(get_user_from_token)):
+async def admin_registries(
+    query: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current: UserPublic = Depends(get_user_from_token)
+):
+    """Ranked search (exact slug, slug prefix, couple names prefix, substring) or newest registries when query
+    is empty"""
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    q = {}
-    if query:
-        q = {"$or": [
-            {"slug": {"$regex": query, "$options": "i"}},
-            {"couple_names": {"$regex": query, "$options": "i"}},
-        ]}
-    regs = await db.registries.find(q).sort("created_at", -1).to_list(100)
-    owner_ids = list({r['owner_id'] for r in regs if 'owner_id' in r})
-    owners = {u['id']: u for u in await db.users.find({"id": {"$in": owner_ids}}).to_list(len(owner_ids))}
-    out = []
-    for r in regs:
-        r.pop("_id", None)
-        out.append({**r, "owner_email": owners.get(r.get('owner_id',''), {}).get('email')})
-    return out
+    limit = max(1, min(limit, SEARCH_PAGE_MAX))
+    q = normalize_search_text(query)
+    if q:
+        page = await tiered_search(db.registries, search_tiers(q, "slug", "couple_names_lower"),
+                                   REGISTRY_PUBLIC_PROJECTION, limit, cursor)
+    else:
+        newest = [SearchTier(filter={}, sort_field="created_at")]
+        page = await tiered_search(db.registries, newest, REGISTRY_PUBLIC_PROJECTION, limit, cursor, direction=-1)
+    owner_ids = list({r['owner_id'] for r in page["items"] if 'owner_id' in r})
+    owner_docs = await db.users.find({"id": {"$in": owner_ids}}, {"id": 1, "email": 1}).to_list(len(owner_ids))
+    owners = {u['id']: u for u in owner_docs}
+    page["items"] = [{**r, "owner_email": owners.get(r.get('owner_id',''), {}).get('email')} for r in page["items"]]
+    return page
 
 class LockBody(BaseModel):
     locked: bool
@@ -872,6 +2662,7 @@ async def admin_lock_registry(registry_id: str, body: LockBody, current: UserPub
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
     await db.registries.update_one({"id": registry_id}, {"$set": {"locked": bool(body.locked), "lock_reason": body.reason or None, "updated_at": datetime.utcnow()}})
+    invalidate_contribution_context(registry_id)
     await log_audit(registry_id, current.id, "registry.lock", {"locked": bool(body.locked)})
     return {"ok": True}
 
@@ -879,9 +2670,18 @@ async def admin_lock_registry(registry_id: str, body: LockBody, current: UserPub
 async def admin_registry_funds(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
-    items = await db.funds.find({"registry_id": registry_id}).sort("order", 1).to_list(1000)
+    items = await db.funds.find({"registry_id": registry_id}).sort(FUND_SORT).to_list(1000)
     return [Fund(**{k: v for k, v in it.items() if k != "_id"}) for it in items]
 
+@api_router.post("/admin/rollups/rebuild")
+async def admin_rebuild_rollups(registry_id: Optional[str] = None, current: UserPublic = Depends(get_user_from_token)):
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    if not registry_id:
+        await backfill_contribution_registry_ids()
+    rows = await rebuild_contribution_rollups(registry_id)
+    return {"ok": True, "rollups": rows}
+
 # --- Status ---
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
@@ -891,33 +2691,36 @@ async def create_status_check(input: StatusCheckCreate):
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+    status_checks = await db.status_checks.find().sort("timestamp", -1).limit(1000).to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # --- Registries ---
 @api_router.post("/registries", response_model=Registry, status_code=201)
 async def create_registry(body: RegistryCreate, current: UserPublic = Depends(get_user_from_token)):
-    slug_conflict = await db.registries.find_one({"slug": body.slug})
-    if slug_conflict:
-        raise HTTPException(status_code=409, detail="Slug already taken")
     registry = Registry(**body.model_dump(), owner_id=current.id)
-    await db.registries.insert_one(registry.model_dump())
+    try:
+        await db.registries.insert_one({**registry.model_dump(),
+                                        **registry_search_fields(registry.slug, registry.couple_names)})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Slug already taken")
     await log_audit(registry.id, current.id, "registry.create", {"slug": body.slug})
     return registry
 
 @api_router.get("/registries", response_model=List[Registry])
 async def my_registries(current: UserPublic = Depends(get_user_from_token)):
-    items = await db.registries.find({"$or": [{"owner_id": current.id}, {"collaborators": {"$in": [current.id]}}]}).sort("created_at", -1).to_list(1000)
+    mine = {"deleted_at": None, "$or": [{"owner_id": current.id}, {"collaborators": {"$in": [current.id]}}]}
+    items = await db.registries.find(mine).sort("created_at", -1).to_list(1000)
     return [Registry(**{k: v for k, v in it.items() if k != "_id"}) for it in items]
 
 @api_router.get("/registries/mine", response_model=List[Registry])
 async def get_my_registries(current: UserPublic = Depends(get_user_from_token)):
-    items = await db.registries.find({"$or": [{"owner_id": current.id}, {"collaborators": {"$in": [current.id]}}]}).sort("created_at", -1).to_list(1000)
+    mine = {"deleted_at": None, "$or": [{"owner_id": current.id}, {"collaborators": {"$in": [current.id]}}]}
+    items = await db.registries.find(mine).sort("created_at", -1).to_list(1000)
     return [Registry(**{k: v for k, v in it.items() if k != "_id"}) for it in items]
 
 @api_router.get("/registries/{registry_id}", response_model=Registry)
 async def get_registry(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
@@ -927,71 +2730,89 @@ async def get_registry(registry_id: str, current: UserPublic = Depends(get_user_
 
 @api_router.put("/registries/{registry_id}", response_model=Registry)
 async def update_registry(registry_id: str, body: RegistryUpdate, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
-    if not reg:
-        raise HTTPException(status_code=404, detail="Registry not found")
-    if not is_owner_or_collab(reg, current.id):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    if body.slug and body.slug != reg.get("slug"):
-        slug_conflict = await db.registries.find_one({"slug": body.slug, "id": {"$ne": registry_id}})
-        if slug_conflict:
-            raise HTTPException(status_code=409, detail="Slug already taken")
-    
     update_data = {k: v for k, v in body.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
-    
-    await db.registries.update_one({"id": registry_id}, {"$set": update_data})
-    await log_audit(registry_id, current.id, "registry.update", update_data)
-    
-    updated_reg = await db.registries.find_one({"id": registry_id})
-    updated_reg.pop("_id", None)
+    if "slug" in update_data and "couple_names" in update_data:
+        update_data.update(registry_search_fields(update_data["slug"], update_data["couple_names"]))
+    
+    # One guarded write: access check, slug uniqueness (unique index) and the updated document together.
+    # Pipeline form so a notification mode switch can compare against the stored mode; values are
+    # $literal so user text starting with "$" is not read as a field path.
+    stage = {k: {"$literal": v} for k, v in update_data.items()}
+    if body.notification_mode:
+        # Contributions before the switch were already notified (or digested) under the old mode
+        stage["digest_sent_through"] = {"$cond": [
+            {"$ne": [{"$ifNull": ["$notification_mode", "immediate"]}, body.notification_mode]},
+            {"$literal": update_data["updated_at"]},
+            "$digest_sent_through",
+        ]}
+    try:
+        updated_reg = await db.registries.find_one_and_update(
+            editable_registry_filter(registry_id, current.id), [{"$set": stage}],
+            projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Slug already taken")
+    if not updated_reg:
+        await raise_registry_access_error(registry_id)
+    if ("slug" in update_data) != ("couple_names" in update_data):
+        # Only one searchable field was sent; the other comes from the stored document
+        search_fields = registry_search_fields(updated_reg["slug"], updated_reg["couple_names"])
+        await db.registries.update_one({"id": registry_id}, {"$set": search_fields})
+    
+    invalidate_contribution_context(registry_id)
+    await log_audit(registry_id, current.id, "registry.update",
+                    {k: v for k, v in update_data.items() if k not in ("couple_names_lower", "search_grams")})
     return Registry(**updated_reg)
 
 @api_router.delete("/registries/{registry_id}")
 async def delete_registry(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if reg.get("owner_id") != current.id:
         raise HTTPException(status_code=403, detail="Only owners can delete registries")
     
-    await db.registries.delete_one({"id": registry_id})
-    await db.funds.delete_many({"registry_id": registry_id})
-    await db.contributions.delete_many({"fund_id": {"$in": await db.funds.distinct("id", {"registry_id": registry_id})}})
-    await log_audit(registry_id, current.id, "registry.delete", {"slug": reg.get("slug")})
+    # Hide it now and free the slug; the purge job removes its data in the background
+    deleted = await db.registries.update_one(
+        {"id": registry_id, "deleted_at": None},
+        {"$set": {"deleted_at": datetime.utcnow(), "deleted_slug": reg["slug"],
+                  "slug": f"{reg['slug']}--deleted-{registry_id}"}},
+    )
+    invalidate_contribution_context(registry_id)
+    if deleted.modified_count:
+        await retract_contribution_metrics(reg)
+        await log_audit(registry_id, current.id, "registry.delete", {"slug": reg.get("slug")})
     
     return {"ok": True}
 
 # --- Public Registry ---
 @api_router.get("/public/registries/{slug}", response_model=PublicRegistryResponse)
 async def get_public_registry(slug: str):
-    reg = await db.registries.find_one({"slug": slug})
+    reg = await db.registries.find_one({"slug": slug, "deleted_at": None})
     if not reg or reg.get("locked"):
         raise HTTPException(status_code=404, detail="Registry not found")
     
     reg.pop("_id", None)
     registry = Registry(**reg)
     
-    funds = await db.funds.find({"registry_id": registry.id, "visible": True}).sort("order", 1).to_list(1000)
+    funds, totals = await asyncio.gather(
+        db.funds.find({"registry_id": registry.id, "visible": True}, {"_id": 0}).sort(FUND_SORT).to_list(1000),
+        fund_totals(registry.id),
+    )
     funds_with_totals = []
     total_raised = 0.0
     total_goal = 0.0
     
     for fund in funds:
-        fund.pop("_id", None)
-        fund_total = 0.0
-        contributions = await db.contributions.find({"fund_id": fund["id"]}).to_list(1000)
-        for contrib in contributions:
-            fund_total += contrib.get("amount", 0)
-        
-        total_raised += fund_total
+        fund_total = totals.get(fund["id"], {"amount": 0.0, "count": 0})
+        total_raised += fund_total["amount"]
         total_goal += fund.get("goal", 0)
         
         funds_with_totals.append({
             **fund,
-            "raised": fund_total,
-            "contributions_count": len(contributions)
+            "raised": fund_total["amount"],
+            "contributions_count": fund_total["count"]
         })
     
     return PublicRegistryResponse(
@@ -1001,63 +2822,124 @@ async def get_public_registry(slug: str):
     )
 
 # --- Funds ---
-@api_router.get("/registries/{registry_id}/funds", response_model=List[Fund])
-async def get_funds(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+class FundChanges(BaseModel):
+    items: List[Fund]
+    deleted: List[Tombstone]
+    cursor: str
+
+@api_router.get("/registries/{registry_id}/funds", response_model=Union[List[Fund], FundChanges])
+async def get_funds(registry_id: str, since: Optional[str] = None, current: UserPublic = Depends(get_user_from_token)):
+    """All funds, or with ?since=<cursor> only funds changed or deleted after it plus the next cursor"""
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    items = await db.funds.find({"registry_id": registry_id}).sort("order", 1).to_list(1000)
+    if since:
+        t = sync_window_start(since)
+        cursor = new_sync_cursor()
+        changed, deleted = await asyncio.gather(
+            db.funds.find({"registry_id": registry_id, "updated_at": {"$gte": t}}, {"_id": 0})
+            .sort(FUND_SORT).limit(SYNC_MAX_CHANGES + 1).to_list(SYNC_MAX_CHANGES + 1),
+            tombstones_since(registry_id, t),
+        )
+        check_sync_changes(changed, deleted)
+        return FundChanges(items=[Fund(**f) for f in changed], deleted=[d for d in deleted if d.kind == "fund"],
+                           cursor=cursor)
+    
+    items = await db.funds.find({"registry_id": registry_id}).sort(FUND_SORT).to_list(1000)
     return [Fund(**{k: v for k, v in it.items() if k != "_id"}) for it in items]
 
 @api_router.post("/registries/{registry_id}/funds", response_model=Fund, status_code=201)
 async def create_fund(registry_id: str, body: FundIn, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
+    # New funds go last; the sequence makes concurrent creates land in distinct slots
+    seq = (await allocate_fund_seqs(registry_id, 1))[0]
     if body.order is None:
-        max_order = await db.funds.find({"registry_id": registry_id}).sort("order", -1).limit(1).to_list(1)
-        body.order = (max_order[0].get("order", 0) + 1) if max_order else 1
+        body.order = seq
     
     # Create fund data excluding the id field from FundIn
     fund_data = body.model_dump(exclude={'id'})
-    fund = Fund(**fund_data, registry_id=registry_id)
+    fund = Fund(**fund_data, registry_id=registry_id, rank=rank_for_seq(seq))
     await db.funds.insert_one(fund.model_dump())
     await log_audit(registry_id, current.id, "fund.create", {"fund_id": fund.id, "title": body.title})
     return fund
 
 @api_router.put("/registries/{registry_id}/funds/{fund_id}", response_model=Fund)
 async def update_fund(registry_id: str, fund_id: str, body: FundIn, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None}, {"owner_id": 1, "collaborators": 1})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    fund = await db.funds.find_one({"id": fund_id, "registry_id": registry_id})
-    if not fund:
-        raise HTTPException(status_code=404, detail="Fund not found")
-    
     update_data = body.model_dump(exclude={'id'})  # Exclude id from update
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.funds.update_one({"id": fund_id}, {"$set": update_data})
-    await log_audit(registry_id, current.id, "fund.update", {"fund_id": fund_id, "title": body.title})
-    
-    updated_fund = await db.funds.find_one({"id": fund_id})
+    updated_fund = await db.funds.find_one_and_update(
+        {"id": fund_id, "registry_id": registry_id}, {"$set": update_data},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+    )
     if not updated_fund:
-        raise HTTPException(status_code=404, detail="Fund not found after update")
-    updated_fund.pop("_id", None)
+        raise HTTPException(status_code=404, detail="Fund not found")
+    invalidate_contribution_context(registry_id)
+    await log_audit(registry_id, current.id, "fund.update", {"fund_id": fund_id, "title": body.title})
     return Fund(**updated_fund)
 
+class FundMove(BaseModel):
+    after_id: Optional[str] = None
+    before_id: Optional[str] = None
+
+@api_router.post("/registries/{registry_id}/funds/{fund_id}/move", response_model=Fund)
+async def move_fund(registry_id: str, fund_id: str, body: FundMove, current: UserPublic = Depends(get_user_from_token)):
+    """Place a fund directly after `after_id` or directly before `before_id`; only the moved fund is written"""
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    anchor_id = body.after_id or body.before_id
+    if not anchor_id or anchor_id == fund_id:
+        raise HTTPException(status_code=400, detail="Give after_id or before_id of another fund")
+    
+    fund, anchor = await asyncio.gather(
+        db.funds.find_one({"id": fund_id, "registry_id": registry_id}, {"id": 1}),
+        db.funds.find_one({"id": anchor_id, "registry_id": registry_id}, {"rank": 1}),
+    )
+    if not fund or not anchor:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    if not anchor.get("rank"):
+        raise HTTPException(status_code=409, detail="Fund ranks are being migrated; try again shortly")
+    
+    others = {"registry_id": registry_id, "id": {"$ne": fund_id}}
+    if body.after_id:
+        lo = anchor["rank"]
+        nxt = await db.funds.find({**others, "rank": {"$gt": lo}}, {"rank": 1}).sort("rank", 1).limit(1).to_list(1)
+        rank = rank_between(lo, nxt[0]["rank"]) if nxt else (await allocate_fund_ranks(registry_id, 1))[0]
+    else:
+        hi = anchor["rank"]
+        prv = await db.funds.find({**others, "rank": {"$lt": hi}}, {"rank": 1}).sort("rank", -1).limit(1).to_list(1)
+        rank = rank_between(prv[0]["rank"] if prv else None, hi)
+    
+    updated = await db.funds.find_one_and_update(
+        {"id": fund_id}, {"$set": {"rank": rank, "updated_at": datetime.utcnow()}},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+    )
+    if len(rank) > FUND_RANK_MAX_LEN:
+        await db.registries.update_one({"id": registry_id}, {"$set": {"fund_ranks_dense": True}})
+    await log_audit(registry_id, current.id, "fund.move",
+                    {"fund_id": fund_id, "after_id": body.after_id, "before_id": body.before_id})
+    return Fund(**updated)
+
 @api_router.delete("/registries/{registry_id}/funds/{fund_id}")
 async def delete_fund(registry_id: str, fund_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
@@ -1067,16 +2949,40 @@ async def delete_fund(registry_id: str, fund_id: str, current: UserPublic = Depe
     if not fund:
         raise HTTPException(status_code=404, detail="Fund not found")
     
+    await retract_contribution_metrics(reg, fund)
     await db.funds.delete_one({"id": fund_id})
     await db.contributions.delete_many({"fund_id": fund_id})
+    # A fund tombstone also tells clients to drop that fund's contributions
+    await record_tombstones(registry_id, "fund", [fund_id])
+    await db.contribution_rollups.delete_many({"registry_id": registry_id, "fund_id": fund_id})
+    invalidate_contribution_context(registry_id)
     await log_audit(registry_id, current.id, "fund.delete", {"fund_id": fund_id, "title": fund.get("title")})
     
     return {"ok": True}
 
 # Add bulk upsert endpoint for frontend compatibility
+def _bulk_fund_fields(fund_item: Dict[str, Any]) -> Dict[str, Any]:
+    """Map the flexible frontend field names onto Fund fields"""
+    return {
+        "id": fund_item.get("id") or fund_item.get("fund_id"),
+        "title": fund_item.get("title", ""),
+        "description": fund_item.get("description", ""),
+        "goal": float(fund_item.get("goal", 0)),
+        "cover_url": fund_item.get("cover_url") or fund_item.get("coverUrl"),
+        "category": fund_item.get("category", ""),
+        "visible": bool(fund_item.get("visible", True)),
+        "order": fund_item.get("order"),
+        "pinned": bool(fund_item.get("pinned", False)),
+    }
+
 @api_router.post("/registries/{registry_id}/funds/bulk_upsert")
 async def bulk_upsert_funds(registry_id: str, request: Request, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    """Create or update a batch of funds in a constant number of round trips.
+
+    Items with an id update that fund if it belongs to the registry (unknown ids are skipped); items
+    without one are created. Items carrying an order are ranked in that order; new funds without one go last.
+    """
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
@@ -1086,55 +2992,67 @@ async def bulk_upsert_funds(registry_id: str, request: Request, current: UserPub
     try:
         raw_data = await request.json()
         
-        # Handle both array and single object formats
-        if isinstance(raw_data, list):
+        # Handle {"funds": [...]} (what the frontend sends), a bare array and a single fund object
+        if isinstance(raw_data, dict) and isinstance(raw_data.get("funds"), list):
+            funds_data = raw_data["funds"]
+        elif isinstance(raw_data, list):
             funds_data = raw_data
         elif isinstance(raw_data, dict):
             funds_data = [raw_data]  # Single fund object
         else:
             raise HTTPException(status_code=400, detail="Invalid data format")
         
-        results = []
-        for fund_item in funds_data:
-            # Extract fund data and handle flexible field names
-            fund_data = {}
-            
-            # Map common field variations
-            fund_data["id"] = fund_item.get("id") or fund_item.get("fund_id")
-            fund_data["title"] = fund_item.get("title", "")
-            fund_data["description"] = fund_item.get("description", "")
-            fund_data["goal"] = float(fund_item.get("goal", 0))
-            fund_data["cover_url"] = fund_item.get("cover_url") or fund_item.get("coverUrl")
-            fund_data["category"] = fund_item.get("category", "")
-            fund_data["visible"] = bool(fund_item.get("visible", True))
-            fund_data["order"] = fund_item.get("order")
-            fund_data["pinned"] = bool(fund_item.get("pinned", False))
-            
-            if fund_data["id"]:
-                # Update existing fund
-                existing_fund = await db.funds.find_one({"id": fund_data["id"], "registry_id": registry_id})
-                if existing_fund:
-                    update_data = {k: v for k, v in fund_data.items() if k != "id" and v is not None}
-                    update_data["updated_at"] = datetime.utcnow()
-                    await db.funds.update_one({"id": fund_data["id"]}, {"$set": update_data})
-                    updated_fund = await db.funds.find_one({"id": fund_data["id"]})
-                    if updated_fund:
-                        updated_fund.pop("_id", None)
-                        results.append(Fund(**updated_fund))
+        # Validate the whole batch before writing anything
+        items = [_bulk_fund_fields(fund_item) for fund_item in funds_data]
+        new_funds = [Fund(**{k: v for k, v in f.items() if k != "id" and v is not None}, registry_id=registry_id)
+                     for f in items if not f["id"]]
+        
+        ids = [f["id"] for f in items if f["id"]]
+        existing_docs = await (db.funds.find({"id": {"$in": ids}, "registry_id": registry_id}, {"id": 1, "rank": 1})
+                               .to_list(len(ids))) if ids else []
+        existing = {d["id"]: d.get("rank") for d in existing_docs}
+        
+        # Funds that carry an order are re-ranked into that order; a drag in the editor moves one fund, so
+        # usually only that one gets a new rank. Other funds keep theirs and new ones are appended.
+        created = iter(new_funds)
+        rows = [(f, next(created) if not f["id"] else None) for f in items if not f["id"] or f["id"] in existing]
+        sequence = sorted((i for i, (f, _) in enumerate(rows) if f["order"] is not None),
+                          key=lambda i: rows[i][0]["order"])
+        sequence += [i for i, (f, new) in enumerate(rows) if new and f["order"] is None]
+        ranks = await rank_sequence(registry_id,
+                                    [existing[rows[i][0]["id"]] if rows[i][0]["id"] else None for i in sequence])
+        new_ranks = dict(zip(sequence, ranks))
+        
+        now = datetime.utcnow()
+        ops: List[Any] = []
+        for i, (f, new) in enumerate(rows):
+            if new:
+                new.rank = new_ranks[i]
+                if new.order is None:
+                    new.order = seq_of_rank(new.rank)
+                ops.append(InsertOne(new.model_dump()))
             else:
-                # Create new fund
-                if fund_data["order"] is None:
-                    max_order = await db.funds.find({"registry_id": registry_id}).sort("order", -1).limit(1).to_list(1)
-                    fund_data["order"] = (max_order[0].get("order", 0) + 1) if max_order else 1
-                
-                # Create Fund object excluding None values
-                fund_dict = {k: v for k, v in fund_data.items() if k != "id" and v is not None}
-                fund = Fund(**fund_dict, registry_id=registry_id)
-                await db.funds.insert_one(fund.model_dump())
-                results.append(fund)
+                update_data = {k: v for k, v in f.items() if k != "id" and v is not None}
+                update_data["updated_at"] = now
+                if i in new_ranks and new_ranks[i] != existing[f["id"]]:
+                    update_data["rank"] = new_ranks[i]
+                ops.append(UpdateOne({"id": f["id"], "registry_id": registry_id}, {"$set": update_data}))
+        if ops:
+            await db.funds.bulk_write(ops, ordered=False)
+            invalidate_contribution_context(registry_id)
+        if any(len(r) > FUND_RANK_MAX_LEN for r in ranks):
+            await db.registries.update_one({"id": registry_id}, {"$set": {"fund_ranks_dense": True}})
         
-        return results
+        # Return funds in payload order, created ones included
+        created = iter(new_funds)
+        result_ids = [f["id"] if f["id"] else next(created).id for f in items if not f["id"] or f["id"] in existing]
+        saved_docs = (await db.funds.find({"id": {"$in": result_ids}}, {"_id": 0}).to_list(len(result_ids))
+                      if result_ids else [])
+        saved = {d["id"]: d for d in saved_docs}
+        return [Fund(**saved[i]) for i in result_ids if i in saved]
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"bulk_upsert error: {str(e)}")
         # Return a more helpful error message
@@ -1145,28 +3063,50 @@ async def bulk_upsert_funds(registry_id: str, request: Request, current: UserPub
 async def create_contribution(
     body: ContributionIn, 
     request: Request,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None)
 ):
+    contribution_id = str(uuid.uuid4())
+    claim = None
+    if idempotency_key is not None:
+        fingerprint = request_fingerprint(body)
+        claim = await find_idempotency_claim("contribution", idempotency_key, fingerprint)
+        if claim:
+            # A retry: answer with the original contribution, without inserting, auditing or emailing again.
+            # Replays do not count against the rate limit.
+            original = await db.contributions.find_one({"id": claim["resource_id"]}, {"_id": 0})
+            if original:
+                return Contribution(**original)
+    
     await rate_limit(request, key="contribution", limit=5, window_sec=60)
+    if idempotency_key is not None:
+        if claim:
+            taken = await take_over_idempotency_key("contribution", idempotency_key, claim, contribution_id)
+        else:
+            taken = not await claim_idempotency_key("contribution", idempotency_key, fingerprint, contribution_id)
+        if not taken:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
     
-    fund = await db.funds.find_one({"id": body.fund_id})
-    if not fund:
-        raise HTTPException(status_code=404, detail="Fund not found")
+    try:
+        ctx = await contribution_context(body.fund_id)
+        if not ctx:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        if not ctx.get("registry_id") or ctx.get("deleted_at") or ctx.get("locked"):
+            raise HTTPException(status_code=404, detail="Registry not found or locked")
+        currency = ctx.get("currency") or "AED"
+        
+        contribution = Contribution(**body.model_dump(), id=contribution_id, registry_id=ctx["registry_id"])
+        await db.contributions.insert_one(contribution.model_dump())
+    except Exception:
+        if idempotency_key is not None:
+            await release_idempotency_key("contribution", idempotency_key)
+        raise
     
-    registry = await db.registries.find_one({"id": fund["registry_id"]})
-    if not registry or registry.get("locked"):
-        raise HTTPException(status_code=404, detail="Registry not found or locked")
+    # The response only waits for the insert above; counters and the audit entry follow it
+    background_tasks.add_task(record_contribution_effects, contribution, ctx)
     
-    contribution = Contribution(**body.model_dump())
-    await db.contributions.insert_one(contribution.model_dump())
-    await log_audit(registry["id"], None, "contribution.create", {
-        "fund_id": body.fund_id,
-        "amount": body.amount,
-        "guest_name": body.name or "Anonymous"
-    })
-    
-    # Send emails in background if configured
-    if RESEND_API_KEY:
+    # Queue emails in background if configured
+    if EMAIL_ENABLED:
         guest_name = body.name or "Anonymous"
         
         # Send receipt to guest if email provided
@@ -1176,95 +3116,200 @@ async def create_contribution(
                 guest_email=body.guest_email,
                 guest_name=guest_name,
                 amount=body.amount,
-                currency=registry.get("currency", "AED"),
-                registry_couple_names=registry.get("couple_names", ""),
-                fund_title=fund.get("title", "")
+                currency=currency,
+                registry_couple_names=ctx.get("couple_names", ""),
+                fund_title=ctx.get("fund_title", "")
             )
         
-        # Send notification to registry owner
-        owner = await db.users.find_one({"id": registry["owner_id"]})
-        if owner:
+        # Notify the owner right away unless the registry gets hourly/daily digests instead
+        if (ctx.get("notification_mode") or "immediate") == "immediate" and ctx.get("owner_email"):
             background_tasks.add_task(
                 send_owner_notification,
-                owner_email=owner["email"],
-                owner_name=owner.get("name", ""),
+                owner_email=ctx["owner_email"],
+                owner_name=ctx.get("owner_name") or "",
                 guest_name=guest_name,
                 amount=body.amount,
-                currency=registry.get("currency", "AED"),
-                fund_title=fund.get("title", ""),
+                currency=currency,
+                fund_title=ctx.get("fund_title", ""),
                 message=body.message
             )
     
     return contribution
 
 @api_router.get("/registries/{registry_id}/contributions")
-async def get_contributions(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+async def get_contributions(registry_id: str, since: Optional[str] = None,
+                            current: UserPublic = Depends(get_user_from_token)):
+    """Latest contributions, or with ?since=<cursor> only those created after it, tombstones for deleted funds
+    (whose contributions went with them) and the next cursor"""
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    fund_ids = [f["id"] for f in await db.funds.find({"registry_id": registry_id}).to_list(1000)]
-    contributions = await db.contributions.find({"fund_id": {"$in": fund_ids}}).sort("created_at", -1).to_list(1000)
-    
-    for contrib in contributions:
-        contrib.pop("_id", None)
-    
+    if since:
+        t = sync_window_start(since)
+        cursor = new_sync_cursor()
+        created, deleted = await asyncio.gather(
+            db.contributions.find({"registry_id": registry_id, "created_at": {"$gte": t}}, {"_id": 0})
+            .sort("created_at", -1).limit(SYNC_MAX_CHANGES + 1).to_list(SYNC_MAX_CHANGES + 1),
+            tombstones_since(registry_id, t),
+        )
+        check_sync_changes(created, deleted)
+        return {"items": created, "deleted": deleted, "cursor": cursor}
+    
+    contributions = await (db.contributions.find({"registry_id": registry_id}, {"_id": 0})
+                           .sort("created_at", -1).to_list(1000))
     return contributions
 
 @api_router.get("/registries/{registry_id}/analytics")
-async def get_analytics(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+async def get_analytics(
+    registry_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: Literal["hour", "day", "week"] = "day",
+    tz: str = "UTC",
+    top: int = 0,
+    since: Optional[str] = None,
+    current: UserPublic = Depends(get_user_from_token)
+):
+    """Registry totals, per-fund breakdown and a time series over [start, end] (inclusive YYYY-MM-DD days in tz,
+    default the last 30 days).
+
+    With ?since=<cursor> the response is just {"changed": false, "cursor"} unless a contribution arrived or a
+    fund was deleted after the cursor.
+
+    Day/week series in UTC without top contributors are answered from contribution_rollups; hourly series,
+    other timezones and top > 0 need the raw contributions and use a single $facet scan instead.
+    """
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    fund_ids = [f["id"] for f in await db.funds.find({"registry_id": registry_id}).to_list(1000)]
-    
-    total_contributions = await db.contributions.count_documents({"fund_id": {"$in": fund_ids}})
-    
-    agg_result = await db.contributions.aggregate([
-        {"$match": {"fund_id": {"$in": fund_ids}}},
-        {"$group": {"_id": None, "total_amount": {"$sum": "$amount"}, "avg_amount": {"$avg": "$amount"}}}
-    ]).to_list(1)
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+    try:
+        end_day = datetime.strptime(end, "%Y-%m-%d") if end else datetime.now(zone).replace(tzinfo=None)
+        start_day = datetime.strptime(start, "%Y-%m-%d") if start else end_day - timedelta(days=30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    top = max(0, min(top, 50))
+    
+    cursor = new_sync_cursor()
+    if since:
+        t = sync_window_start(since)
+        new_gift, deleted = await asyncio.gather(
+            db.contributions.find_one({"registry_id": registry_id, "created_at": {"$gte": t}}, {"_id": 1}),
+            db.tombstones.find_one({"registry_id": registry_id, "deleted_at": {"$gte": t}}, {"_id": 1}),
+        )
+        if not new_gift and not deleted:
+            return {"changed": False, "cursor": cursor}
+    
+    if granularity != "hour" and tz == "UTC" and not top:
+        result = await analytics_from_rollups(registry_id, rollup_day(start_day), rollup_day(end_day), granularity)
+        source = "rollups"
+    else:
+        result = await analytics_from_contributions(registry_id, start_day, end_day, granularity, tz, top)
+        source = "contributions"
+    totals = result["totals"][0] if result["totals"] else {"count": 0, "amount": 0}
+    series = result["series"]
     
-    total_amount = agg_result[0]["total_amount"] if agg_result else 0
-    avg_amount = agg_result[0]["avg_amount"] if agg_result else 0
+    return {
+        "total_contributions": totals["count"],
+        "total_amount": totals["amount"],
+        "average_amount": (totals["amount"] / totals["count"]) if totals["count"] else 0,
+        "daily_stats": series if granularity == "day" else [],
+        "series": series,
+        "by_fund": result["by_fund"],
+        "top_contributors": result.get("top_contributors", []),
+        "range": {
+            "start": rollup_day(start_day),
+            "end": rollup_day(end_day),
+            "count": sum(d["count"] for d in series),
+            "amount": sum(d["amount"] for d in series),
+        },
+        "granularity": granularity,
+        "tz": tz,
+        "source": source,
+        "changed": True,
+        "cursor": cursor,
+    }
+
+@api_router.get("/registries/{registry_id}/dashboard")
+async def get_dashboard(registry_id: str, recent: int = 10, current: UserPublic = Depends(get_user_from_token)):
+    """Everything the owner dashboard renders in one round trip: the registry, its funds with raised totals,
+    the latest contributions and a 30-day analytics summary, with a single authorization check"""
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None}, {"_id": 0})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
     
-    # Daily breakdown for last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    daily_stats = await db.contributions.aggregate([
-        {"$match": {"fund_id": {"$in": fund_ids}, "created_at": {"$gte": thirty_days_ago}}},
-        {"$group": {
-            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-            "count": {"$sum": 1},
-            "amount": {"$sum": "$amount"}
-        }},
-        {"$sort": {"_id": 1}}
-    ]).to_list(30)
+    cursor = new_sync_cursor()
+    end_day = datetime.utcnow()
+    start_day = end_day - timedelta(days=30)
+    recent = max(1, min(recent, 50))
+    funds, contributions, result = await asyncio.gather(
+        db.funds.find({"registry_id": registry_id}, {"_id": 0}).sort(FUND_SORT).to_list(1000),
+        db.contributions.find({"registry_id": registry_id}, {"_id": 0}).sort("created_at", -1).to_list(recent),
+        analytics_from_rollups(registry_id, rollup_day(start_day), rollup_day(end_day), "day"),
+    )
+    by_fund = {f["fund_id"]: f for f in result["by_fund"]}
+    fund_rows = []
+    for f in funds:
+        t = by_fund.get(f["id"], {})
+        fund_rows.append({**Fund(**f).model_dump(), "raised": t.get("amount", 0),
+                          "contribution_count": t.get("count", 0)})
+    totals = result["totals"][0] if result["totals"] else {"count": 0, "amount": 0}
     
     return {
-        "total_contributions": total_contributions,
-        "total_amount": total_amount,
-        "average_amount": avg_amount,
-        "daily_stats": daily_stats
+        "registry": Registry(**reg),
+        "funds": fund_rows,
+        "recent_contributions": [Contribution(**c) for c in contributions],
+        "analytics": {
+            "total_contributions": totals["count"],
+            "total_amount": totals["amount"],
+            "average_amount": (totals["amount"] / totals["count"]) if totals["count"] else 0,
+            "daily_stats": result["series"],
+            "range": {"start": rollup_day(start_day), "end": rollup_day(end_day)},
+        },
+        "cursor": cursor,
     }
 
+@api_router.get("/registries/{registry_id}/audit")
+async def get_registry_audit(registry_id: str, cursor: Optional[str] = None, limit: int = 20,
+                             action: Optional[str] = None, user_id: Optional[str] = None,
+                             start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             current: UserPublic = Depends(get_user_from_token)):
+    """Activity on a registry, newest first; entries older than AUDIT_RETENTION_DAYS are in the archive only"""
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None}, {"owner_id": 1, "collaborators": 1})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    query = audit_filter({"registry_id": registry_id}, action, user_id, start, end)
+    return await keyset_page(db.audit_logs, query, limit, cursor)
+
 @api_router.get("/registries/{registry_id}/export/csv")
 async def export_csv(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     if not is_owner_or_collab(reg, current.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    fund_ids = [f["id"] for f in await db.funds.find({"registry_id": registry_id}).to_list(1000)]
-    contributions = await db.contributions.find({"fund_id": {"$in": fund_ids}}).sort("created_at", -1).to_list(10000)
-    
-    # Get fund titles for reference
-    funds = {f["id"]: f for f in await db.funds.find({"registry_id": registry_id}).to_list(1000)}
+    # Fund titles for reference; contributions newest first straight off the (registry_id, created_at) index
+    funds, contributions = await asyncio.gather(
+        db.funds.find({"registry_id": registry_id}, {"id": 1, "title": 1}).to_list(1000),
+        db.contributions.find({"registry_id": registry_id}).sort("created_at", -1).limit(10000).to_list(10000),
+    )
+    funds = {f["id"]: f for f in funds}
     
     output = io.StringIO()
     writer = csv.writer(output)
@@ -1294,6 +3339,64 @@ async def export_csv(registry_id: str, current: UserPublic = Depends(get_user_fr
         headers=headers
     )
 
+# --- Thank-you campaigns ---
+@api_router.post("/registries/{registry_id}/thank-you", status_code=202)
+async def create_thank_you_campaign(registry_id: str, body: ThankYouCampaignIn,
+                                    current: UserPublic = Depends(get_user_from_token)):
+    """Email every distinct guest_email contributor a personalised thank-you.
+
+    Placeholders: {guest_name}, {couple_names}, {gift_count}, {gift_total}, {currency}.
+    Returns immediately; poll GET /registries/{registry_id}/thank-you/{campaign_id} for progress.
+    """
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not EMAIL_ENABLED:
+        raise HTTPException(status_code=503, detail="Email delivery is not configured")
+    try:
+        MessageTemplate(body.subject)
+        MessageTemplate(body.message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    campaign = ThankYouCampaign(registry_id=registry_id, created_by=current.id, subject=body.subject,
+                                message=body.message)
+    try:
+        # At most one queued/running campaign per registry, enforced by a partial unique index
+        await db.thank_you_campaigns.insert_one(campaign.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A thank-you campaign is already in progress")
+    await log_audit(registry_id, current.id, "thank_you.create", {"campaign_id": campaign.id})
+    start_background_task(f"thank_you:{campaign.id}", run_thank_you_campaign(campaign.id))
+    return await thank_you_progress(campaign.model_dump())
+
+@api_router.get("/registries/{registry_id}/thank-you")
+async def list_thank_you_campaigns(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    campaigns = await db.thank_you_campaigns.find({"registry_id": registry_id}).sort("created_at", -1).to_list(20)
+    return await thank_you_progress_many(campaigns)
+
+@api_router.get("/registries/{registry_id}/thank-you/{campaign_id}")
+async def get_thank_you_campaign(registry_id: str, campaign_id: str,
+                                 current: UserPublic = Depends(get_user_from_token)):
+    reg = await db.registries.find_one({"id": registry_id, "deleted_at": None})
+    if not reg:
+        raise HTTPException(status_code=404, detail="Registry not found")
+    if not is_owner_or_collab(reg, current.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    campaign = await db.thank_you_campaigns.find_one({"id": campaign_id, "registry_id": registry_id})
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return await thank_you_progress(campaign)
+
 # --- File Upload ---
 class ChunkUpload(BaseModel):
     filename: str
@@ -1349,50 +3452,85 @@ async def upload_chunk(
     
     return {"chunk_received": chunk_index}
 
+def _sweep_upload_tmp(max_age_sec: float) -> int:
+    cutoff = time.time() - max_age_sec
+    removed = 0
+    for user_dir in UPLOAD_TMP.iterdir():
+        try:
+            if not user_dir.is_dir():
+                continue
+            # Read before removing parts (which touches it): a recent mtime means an upload is using the
+            # directory, possibly one that has created it but not yet written its first chunk
+            idle = user_dir.stat().st_mtime < cutoff
+            for part in user_dir.iterdir():
+                try:
+                    if part.stat().st_mtime < cutoff:
+                        part.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # assembled and deleted by its upload meanwhile
+            if idle:
+                user_dir.rmdir()
+        except FileNotFoundError:
+            continue
+        except OSError:
+            pass  # still has recent chunks
+    return removed
+
+async def sweep_upload_tmp() -> int:
+    """Delete chunks of uploads that were abandoned before their last chunk arrived"""
+    removed = await asyncio.to_thread(_sweep_upload_tmp, UPLOAD_TMP_RETENTION_HOURS * 3600)
+    if removed:
+        logging.info(f"Removed {removed} abandoned upload chunks")
+    return removed
+
 # --- Admin Registry Detail ---
 @api_router.get("/admin/registries/{registry_id}/detail")
 async def admin_registry_detail(registry_id: str, current: UserPublic = Depends(get_user_from_token)):
+    """Registry, owner and funds with per-fund totals; contributions and audit entries are paged via
+    /admin/registries/{id}/contributions and /admin/registries/{id}/audit"""
     if not await is_admin_user(current):
         raise HTTPException(status_code=403, detail="Admin only")
     
-    reg = await db.registries.find_one({"id": registry_id})
+    reg = await db.registries.find_one({"id": registry_id}, {"_id": 0, **REGISTRY_PUBLIC_PROJECTION})
     if not reg:
         raise HTTPException(status_code=404, detail="Registry not found")
     
-    reg.pop("_id", None)
-    
-    # Get owner info
-    owner = await db.users.find_one({"id": reg["owner_id"]}, {"password_hash": 0})
-    if owner:
-        owner.pop("_id", None)
-    
-    # Get funds
-    funds = await db.funds.find({"registry_id": registry_id}).sort("order", 1).to_list(1000)
+    owner, funds, totals = await asyncio.gather(
+        db.users.find_one({"id": reg["owner_id"]}, {"_id": 0, **USER_PUBLIC_PROJECTION}),
+        db.funds.find({"registry_id": registry_id}, {"_id": 0}).sort(FUND_SORT).to_list(1000),
+        fund_totals(registry_id),
+    )
     for f in funds:
-        f.pop("_id", None)
-    
-    # Get contributions with totals
-    fund_ids = [f["id"] for f in funds]
-    contributions = await db.contributions.find({"fund_id": {"$in": fund_ids}}).sort("created_at", -1).to_list(1000)
-    for c in contributions:
-        c.pop("_id", None)
-    
-    total_amount = sum(c.get("amount", 0) for c in contributions)
-    
-    # Get audit logs
-    audit_logs = await db.audit_logs.find({"registry_id": registry_id}).sort("created_at", -1).to_list(50)
-    for a in audit_logs:
-        a.pop("_id", None)
+        t = totals.get(f["id"], {})
+        f["raised"] = t.get("amount", 0)
+        f["contribution_count"] = t.get("count", 0)
     
     return {
         "registry": reg,
         "owner": owner,
         "funds": funds,
-        "contributions": contributions,
-        "total_amount": total_amount,
-        "audit_logs": audit_logs
+        "total_amount": sum(t["amount"] for t in totals.values()),
+        "contribution_count": sum(t["count"] for t in totals.values()),
     }
 
+@api_router.get("/admin/registries/{registry_id}/contributions")
+async def admin_registry_contributions(registry_id: str, cursor: Optional[str] = None, limit: int = 20,
+                                       current: UserPublic = Depends(get_user_from_token)):
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    return await keyset_page(db.contributions, {"registry_id": registry_id}, limit, cursor)
+
+@api_router.get("/admin/registries/{registry_id}/audit")
+async def admin_registry_audit(registry_id: str, cursor: Optional[str] = None, limit: int = 20,
+                               action: Optional[str] = None, user_id: Optional[str] = None,
+                               start: Optional[datetime] = None, end: Optional[datetime] = None,
+                               current: UserPublic = Depends(get_user_from_token)):
+    if not await is_admin_user(current):
+        raise HTTPException(status_code=403, detail="Admin only")
+    query = audit_filter({"registry_id": registry_id}, action, user_id, start, end)
+    return await keyset_page(db.audit_logs, query, limit, cursor)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -1419,16 +3557,316 @@ class CacheHeaderMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(CacheHeaderMiddleware)
 
+class DbTimingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stats = RequestDbStats()
+        token = _request_db_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _request_db_stats.reset(token)
+        # call_next returns once the response has started, so this covers the handler but not the body stream
+        app_ms = (time.perf_counter() - started) * 1000
+        response.headers.append("Server-Timing", stats.server_timing(app_ms))
+        route = request.scope.get("route")
+        if route is not None:
+            record_route_db_stats(f"{request.method} {route.path}", stats)
+        span = sentry_sdk.get_current_span()
+        transaction = span.containing_transaction if span else None
+        if transaction is not None:
+            transaction.set_data("db.commands", stats.commands)
+            transaction.set_data("db.duration_ms", round(stats.duration_ms, 1))
+            transaction.set_data("db.documents", stats.documents)
+        return response
+
+if DB_TIMING_ENABLED:
+    app.add_middleware(DbTimingMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# ===== Audit Retention =====
+# Entries older than AUDIT_RETENTION_DAYS move from audit_logs to gzipped JSON-lines files in AUDIT_ARCHIVE_DIR,
+# oldest first. Each batch is written and fsynced before it is deleted, so a crash in between can only
+# archive a batch twice (entries keep their id), never lose it. One worker at a time holds the job lease.
+async def acquire_job_lease(name: str, seconds: int) -> Optional[str]:
+    """Take the named cluster-wide job lease if it is free or lapsed; returns the lease token"""
+    lease = str(uuid.uuid4())
+    now = datetime.utcnow()
+    try:
+        await db.job_leases.update_one(
+            {"_id": name, "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"lease": lease, "lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None  # held by another worker
+    return lease
+
+async def renew_job_lease(name: str, lease: str, seconds: int) -> bool:
+    result = await db.job_leases.update_one(
+        {"_id": name, "lease": lease}, {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=seconds)}}
+    )
+    return result.matched_count == 1
+
+async def release_job_lease(name: str, lease: str):
+    await db.job_leases.update_one({"_id": name, "lease": lease}, {"$set": {"lease_until": None}})
+
+def _write_audit_archive(entries: List[dict]) -> Path:
+    AUDIT_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    first, last = entries[0]["created_at"], entries[-1]["created_at"]
+    path = AUDIT_ARCHIVE_DIR / f"audit-{first:%Y%m%dT%H%M%S}-{last:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    tmp = path.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps({k: v for k, v in entry.items() if k != "_id"}, default=str) + "\n")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+async def archive_audit_logs() -> int:
+    """Move audit entries past the retention window into archive files; returns how many moved"""
+    if AUDIT_RETENTION_DAYS <= 0:
+        return 0
+    lease = await acquire_job_lease("audit_archive", AUDIT_ARCHIVE_LEASE_SEC)
+    if not lease:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=AUDIT_RETENTION_DAYS)
+    moved = 0
+    try:
+        while not _shutdown_event.is_set():
+            batch = await (db.audit_logs.find({"created_at": {"$lt": cutoff}}).sort("created_at", 1)
+                           .limit(AUDIT_ARCHIVE_BATCH_SIZE).to_list(AUDIT_ARCHIVE_BATCH_SIZE))
+            if not batch:
+                break
+            path = await asyncio.to_thread(_write_audit_archive, batch)
+            await db.audit_logs.delete_many({"_id": {"$in": [e["_id"] for e in batch]}})
+            moved += len(batch)
+            logging.info(f"Archived {len(batch)} audit log entries to {path.name}")
+            if not await renew_job_lease("audit_archive", lease, AUDIT_ARCHIVE_LEASE_SEC):
+                break
+    finally:
+        await release_job_lease("audit_archive", lease)
+    return moved
+
+# ===== Registry Purge =====
+# Deleted registries are only flagged (deleted_at) by the API. This job claims one at a time under a lease
+# and deletes its data in small _id batches, pausing between them. Every step is idempotent, so a crash or
+# shutdown just leaves the registry to be claimed again once the lease lapses; the registry document
+# itself goes last.
+class PurgeInterrupted(Exception):
+    pass
+
+async def _delete_in_batches(coll, query: Dict[str, Any], keep_lease) -> int:
+    deleted = 0
+    while True:
+        docs = await coll.find(query, {"_id": 1}).limit(REGISTRY_PURGE_BATCH_SIZE).to_list(REGISTRY_PURGE_BATCH_SIZE)
+        ids = [d["_id"] for d in docs]
+        if not ids:
+            return deleted
+        deleted += (await coll.delete_many({"_id": {"$in": ids}})).deleted_count
+        await keep_lease()
+        await asyncio.sleep(REGISTRY_PURGE_PAUSE_SEC)
+
+def _uploaded_filename(url: Optional[str]) -> Optional[str]:
+    if url and "/api/files/" in url:
+        return url.rsplit("/api/files/", 1)[1] or None
+    return None
+
+async def _purge_registry_uploads(reg: dict):
+    """Remove files this registry used unless another of the owner's registries still uses them"""
+    names = {_uploaded_filename(reg.get("hero_image"))}
+    async for f in db.funds.find({"registry_id": reg["id"], "cover_url": {"$ne": None}}, {"cover_url": 1}):
+        names.add(_uploaded_filename(f["cover_url"]))
+    names.discard(None)
+    if not names:
+        return
+    others = await db.registries.find({"owner_id": reg["owner_id"], "id": {"$ne": reg["id"]}},
+                                      {"id": 1, "hero_image": 1}).to_list(None)
+    still_used = {_uploaded_filename(r.get("hero_image")) for r in others}
+    if others:
+        other_funds = {"registry_id": {"$in": [r["id"] for r in others]}, "cover_url": {"$ne": None}}
+        async for f in db.funds.find(other_funds, {"cover_url": 1}):
+            still_used.add(_uploaded_filename(f["cover_url"]))
+    names -= still_used
+    unused = await db.uploads.find({"user_id": reg["owner_id"], "stored_filename": {"$in": list(names)}}).to_list(None)
+    for upload in unused:
+        (UPLOAD_DIR / upload["stored_filename"]).unlink(missing_ok=True)
+        await db.uploads.delete_one({"_id": upload["_id"]})
+
+async def purge_registry(reg: dict, lease: str):
+    registry_id = reg["id"]
+
+    async def keep_lease():
+        if _shutdown_event.is_set():
+            raise PurgeInterrupted("shutting down")
+        renewed = await db.registries.update_one(
+            {"id": registry_id, "purge_lease": lease},
+            {"$set": {"purge_lease_until": datetime.utcnow() + timedelta(seconds=REGISTRY_PURGE_LEASE_SEC)}},
+        )
+        if not renewed.matched_count:
+            raise PurgeInterrupted(registry_id)
+
+    await _purge_registry_uploads(reg)
+    by_registry = {"registry_id": registry_id}
+    # Campaign mail queued before outbox rows carried registry_id is found through its campaign
+    campaign_ids = await db.thank_you_campaigns.distinct("id", by_registry)
+    await _delete_in_batches(db.email_outbox, {"$or": [by_registry, {"campaign_id": {"$in": campaign_ids}}]},
+                             keep_lease)
+    for coll in (db.contributions, db.contribution_rollups, db.audit_logs, db.thank_you_campaigns, db.tombstones,
+                 db.funds):
+        await _delete_in_batches(coll, by_registry, keep_lease)
+    await db.registries.delete_one({"id": registry_id, "purge_lease": lease})
+
+async def purge_deleted_registries():
+    while not _shutdown_event.is_set():
+        now = datetime.utcnow()
+        lease = str(uuid.uuid4())
+        reg = await db.registries.find_one_and_update(
+            {"deleted_at": {"$exists": True},
+             "$or": [{"purge_lease_until": None}, {"purge_lease_until": {"$lt": now}}]},
+            {"$set": {"purge_lease": lease, "purge_lease_until": now + timedelta(seconds=REGISTRY_PURGE_LEASE_SEC)}},
+            projection={"_id": 0, "id": 1, "owner_id": 1, "hero_image": 1},
+        )
+        if not reg:
+            return
+        try:
+            await purge_registry(reg, lease)
+        except PurgeInterrupted:
+            return
+
+# ===== Background jobs =====
+async def backfill_contribution_registry_ids():
+    """One-off migration: contributions created before registry_id was stored on them"""
+    fund_ids = await db.contributions.distinct("fund_id", {"registry_id": None})
+    for i in range(0, len(fund_ids), 500):
+        chunk = fund_ids[i:i + 500]
+        for f in await db.funds.find({"id": {"$in": chunk}}, {"id": 1, "registry_id": 1}).to_list(len(chunk)):
+            await db.contributions.update_many({"fund_id": f["id"], "registry_id": None},
+                                               {"$set": {"registry_id": f["registry_id"]}})
+
+async def backfill_search_fields():
+    """One-off migration: users and registries created before the normalized search fields existed"""
+    for coll, fields, build in (
+        (db.users, {"id": 1, "name": 1, "email": 1}, lambda d: user_search_fields(d.get("name"), d.get("email"))),
+        (db.registries, {"id": 1, "slug": 1, "couple_names": 1},
+         lambda d: registry_search_fields(d.get("slug"), d.get("couple_names"))),
+    ):
+        while True:
+            docs = await coll.find({"search_grams": {"$exists": False}}, fields).limit(500).to_list(500)
+            if not docs:
+                break
+            await coll.bulk_write([UpdateOne({"_id": d["_id"]}, {"$set": build(d)}) for d in docs], ordered=False)
+
+async def purge_orphaned_contributions():
+    """One-off cleanup: contributions whose fund was removed by the old cascading delete, which ran after
+    the funds were already gone and so never matched anything"""
+    fund_ids = await db.contributions.distinct("fund_id", {"registry_id": None})
+    for i in range(0, len(fund_ids), 500):
+        chunk = fund_ids[i:i + 500]
+        live = set(await db.funds.distinct("id", {"id": {"$in": chunk}}))
+        gone = [f for f in chunk if f not in live]
+        if gone:
+            await db.contributions.delete_many({"fund_id": {"$in": gone}, "registry_id": None})
+
+async def run_startup_migrations():
+    await backfill_contribution_registry_ids()
+    await purge_orphaned_contributions()
+    await backfill_search_fields()
+    await backfill_fund_ranks()
+    await ensure_contribution_rollups()
+    await ensure_platform_metrics()
+
+_background_tasks: Dict[str, asyncio.Task] = {}
+_shutdown_event = asyncio.Event()
+
+async def run_periodically(name: str, interval_sec: float, fn, run_immediately: bool = True):
+    if not run_immediately and await _sleep_until_shutdown(interval_sec):
+        return
+    while not _shutdown_event.is_set():
+        try:
+            await fn()
+        except Exception:
+            logging.exception(f"Background job {name} failed")
+        if await _sleep_until_shutdown(interval_sec):
+            return
+
+async def _sleep_until_shutdown(seconds: float) -> bool:
+    """Sleep for up to `seconds`; True if the app is shutting down"""
+    try:
+        await asyncio.wait_for(_shutdown_event.wait(), timeout=seconds)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+def start_background_task(name: str, coro):
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks[name] = task
+    task.add_done_callback(lambda t: _background_tasks.pop(name, None) if _background_tasks.get(name) is t else None)
+    return task
+
+def start_periodic_task(name: str, interval_sec: float, fn, run_immediately: bool = True):
+    return start_background_task(name, run_periodically(name, interval_sec, fn, run_immediately=run_immediately))
+
+async def stop_background_tasks(grace_sec: float = 10.0):
+    # Give loops that were asked to stop a chance to finish in-flight work before cancelling them
+    _shutdown_event.set()
+    tasks = list(_background_tasks.values())
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=grace_sec)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    _background_tasks.clear()
+
 @app.on_event("startup")
 async def on_startup():
-    await ensure_indexes()
+    global email_worker
+    start_background_task("ensure_indexes", build_indexes())
+    if email_provider and EMAIL_WORKER_ENABLED:
+        email_worker = EmailDeliveryWorker(email_provider)
+        start_background_task("email_delivery", email_worker.run())
+    start_background_task("audit_flush", audit_buffer.run())
+    start_background_task("startup_migrations", run_startup_migrations())
+    start_periodic_task("platform_metrics", METRICS_RECONCILE_INTERVAL_SEC, reconcile_platform_metrics,
+                        run_immediately=False)
+    start_periodic_task("admin_stats", ADMIN_STATS_REFRESH_SEC, refresh_admin_stats, run_immediately=False)
+    start_periodic_task("owner_digests", DIGEST_CHECK_INTERVAL_SEC, send_owner_digests)
+    start_periodic_task("registry_purge", REGISTRY_PURGE_INTERVAL_SEC, purge_deleted_registries, run_immediately=False)
+    start_periodic_task("upload_tmp_sweep", UPLOAD_TMP_SWEEP_INTERVAL_SEC, sweep_upload_tmp)
+    start_periodic_task("audit_archive", AUDIT_ARCHIVE_INTERVAL_SEC, archive_audit_logs, run_immediately=False)
+    start_periodic_task("fund_rank_rebalance", FUND_RANK_REBALANCE_INTERVAL_SEC, rebalance_dense_rankings,
+                        run_immediately=False)
+    if EMAIL_ENABLED:
+        start_periodic_task("thank_you_resume", THANK_YOU_LEASE_SEC, resume_thank_you_campaigns)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if email_worker:
+        email_worker.stop()
+    await stop_background_tasks()
+    client.close()
+
+if __name__ == "__main__":
+    # python server.py indexes [--apply]: print index drift as JSON, optionally building missing indexes first.
+    # Exits 1 while an index is missing or divergent, so a deploy step can stop before serving traffic.
+    import argparse
+    parser = argparse.ArgumentParser(description="giftspace backend maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    indexes_cmd = sub.add_parser("indexes", help="report missing, extra and divergent indexes")
+    indexes_cmd.add_argument("--apply", action="store_true", help="build missing indexes and apply TTL changes first")
+    args = parser.parse_args()
+
+    async def _indexes(apply: bool):
+        if apply:
+            await ensure_indexes()
+        report = await index_drift()
+        print(json.dumps(report, indent=2, default=str))
+        return 1 if report["missing"] or report["divergent"] else 0
+
+    raise SystemExit(asyncio.run(_indexes(args.apply)))
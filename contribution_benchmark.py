@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Contribution Write Path Benchmark
+
+Measures sustained contributions/sec and latency for POST /api/contributions.
+Run it against a single uvicorn worker so numbers are comparable between builds:
+
+    uvicorn server:app --workers 1 --port 8001
+    BENCH_DURATION=30 BENCH_CONCURRENCY=16 python contribution_benchmark.py
+"""
+
+import requests
+import uuid
+import time
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Load environment variables to get the backend URL
+def load_env_file(file_path):
+    env_vars = {}
+    if os.path.exists(file_path):
+        with open(file_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    env_vars[key] = value.strip('"')
+    return env_vars
+
+# Get backend URL from the environment or the frontend .env
+frontend_env = load_env_file('/app/frontend/.env')
+BACKEND_URL = os.environ.get('BACKEND_URL') or frontend_env.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+API_BASE = f"{BACKEND_URL}/api"
+
+DURATION = float(os.environ.get('BENCH_DURATION', '20'))
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', '8'))
+
+print(f"Benchmarking contributions at: {API_BASE} ({CONCURRENCY} threads, {DURATION:.0f}s)")
+
+def setup_fund():
+    """Register a user and create a registry with one fund to contribute to"""
+    unique_id = str(uuid.uuid4())[:8]
+    session = requests.Session()
+    response = session.post(f"{API_BASE}/auth/register", json={
+        "name": "Benchmark User",
+        "email": f"bench{unique_id}@example.com",
+        "password": "testpassword123"
+    }, timeout=10)
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = session.post(f"{API_BASE}/registries", json={
+        "couple_names": "Bench & Mark",
+        "event_date": "2030-06-01",
+        "location": "Dubai",
+        "currency": "AED",
+        "slug": f"bench-{unique_id}"
+    }, headers=headers, timeout=10)
+    response.raise_for_status()
+    registry_id = response.json()["id"]
+
+    response = session.post(f"{API_BASE}/registries/{registry_id}/funds", json={
+        "title": "Honeymoon",
+        "goal": 100000,
+        "category": "travel"
+    }, headers=headers, timeout=10)
+    response.raise_for_status()
+    return response.json()["id"]
+
+def worker(fund_id, deadline):
+    """Post contributions until the deadline; returns (latencies, errors)"""
+    session = requests.Session()
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        # A fresh forwarded address per request keeps the per-IP rate limit out of the measurement
+        headers = {"X-Forwarded-For": f"bench-{uuid.uuid4()}"}
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{API_BASE}/contributions", json={
+                "fund_id": fund_id,
+                "name": "Bench Guest",
+                "amount": 10,
+                "method": "bank_transfer"
+            }, headers=headers, timeout=10)
+            ok = response.status_code == 201
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    return latencies, errors
+
+def run_benchmark():
+    fund_id = setup_fund()
+    deadline = time.perf_counter() + DURATION
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(lambda _: worker(fund_id, deadline), range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for lats, _ in results for l in lats)
+    errors = sum(e for _, e in results)
+    if not latencies:
+        print(f"❌ No successful contributions ({errors} errors)")
+        return False
+
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"✅ {len(latencies)} contributions in {elapsed:.1f}s: {len(latencies) / elapsed:.1f} contributions/sec")
+    print(f"   latency p50 {statistics.median(latencies) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms, errors {errors}")
+    return errors == 0
+
+if __name__ == "__main__":
+    run_benchmark()
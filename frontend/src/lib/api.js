@@ -71,14 +71,24 @@ export async function getPublicRegistry(slug) {
 }
 
 // Contributions
-export async function createContribution(contrib) {
-  const { data } = await api.post(`/contributions`, contrib);
+export async function createContribution(contrib, idempotencyKey = null) {
+  const headers = idempotencyKey ? { "Idempotency-Key": idempotencyKey } : undefined;
+  const { data } = await api.post(`/contributions`, contrib, { headers });
   return data;
 }
 
 // Analytics & Exports
-export async function getRegistryAnalytics(registryId) {
-  const { data } = await api.get(`/registries/${registryId}/analytics`);
+export async function getRegistryAnalytics(registryId, params = {}) {
+  const { data } = await api.get(`/registries/${registryId}/analytics`, { params });
+  return data;
+}
+export async function getRegistryDashboard(registryId) {
+  const { data } = await api.get(`/registries/${registryId}/dashboard`);
+  return data;
+}
+// filters: { action, user_id, start, end } (ISO datetimes, end exclusive)
+export async function getRegistryAudit(registryId, cursor = null, filters = {}) {
+  const { data } = await api.get(`/registries/${registryId}/audit`, { params: { ...filters, cursor: cursor || undefined } });
   return data;
 }
 export async function exportRegistryCSV(registryId) {
@@ -86,6 +96,16 @@ export async function exportRegistryCSV(registryId) {
   return response.data;
 }
 
+// Thank-you campaigns
+export async function sendThankYouCampaign(registryId, { subject, message }) {
+  const { data } = await api.post(`/registries/${registryId}/thank-you`, { subject, message });
+  return data;
+}
+export async function getThankYouCampaign(registryId, campaignId) {
+  const { data } = await api.get(`/registries/${registryId}/thank-you/${campaignId}`);
+  return data;
+}
+
 // Collaborators
 export async function addCollaborator(registryId, email) {
   const { data } = await api.post(`/registries/${registryId}/collaborators`, { email });
@@ -109,16 +129,16 @@ export async function adminMetrics() {
   const { data } = await api.get(`/admin/metrics`);
   return data;
 }
-export async function adminUsers(query = "") {
-  const { data } = await api.get(`/admin/users`, { params: { query } });
+export async function adminUsers(query = "", cursor = null) {
+  const { data } = await api.get(`/admin/users`, { params: { query, cursor: cursor || undefined } });
   return data;
 }
 export async function adminUsersLookup(idsCsv) {
   const { data } = await api.get(`/admin/users/lookup`, { params: { ids: idsCsv } });
   return data;
 }
-export async function adminRegistries(query = "") {
-  const { data } = await api.get(`/admin/registries`, { params: { query } });
+export async function adminRegistries(query = "", cursor = null) {
+  const { data } = await api.get(`/admin/registries`, { params: { query, cursor: cursor || undefined } });
   return data;
 }
 export async function adminRegistryFunds(registryId) {
@@ -133,5 +153,21 @@ export async function adminUserDetail(userId) {
   const { data } = await api.get(`/admin/users/${userId}/detail`);
   return data;
 }
+export async function adminUserAudit(userId, cursor = null, filters = {}) {
+  const { data } = await api.get(`/admin/users/${userId}/audit`, { params: { ...filters, cursor: cursor || undefined } });
+  return data;
+}
+export async function adminRegistryDetail(registryId) {
+  const { data } = await api.get(`/admin/registries/${registryId}/detail`);
+  return data;
+}
+export async function adminRegistryContributions(registryId, cursor = null) {
+  const { data } = await api.get(`/admin/registries/${registryId}/contributions`, { params: { cursor: cursor || undefined } });
+  return data;
+}
+export async function adminRegistryAudit(registryId, cursor = null, filters = {}) {
+  const { data } = await api.get(`/admin/registries/${registryId}/audit`, { params: { ...filters, cursor: cursor || undefined } });
+  return data;
+}
 
 export default api;
\ No newline at end of file
@@ -15,6 +15,8 @@ export default function AdminPage() {
   const [rq, setRq] = React.useState("");
   const [users, setUsers] = React.useState([]);
   const [regs, setRegs] = React.useState([]);
+  const [usersCursor, setUsersCursor] = React.useState(null);
+  const [regsCursor, setRegsCursor] = React.useState(null);
   const [lockOpen, setLockOpen] = React.useState(false);
   const [lockReg, setLockReg] = React.useState(null);
   const [lockReason, setLockReason] = React.useState("");
@@ -28,8 +30,16 @@ export default function AdminPage() {
     adminMetrics().then(setMetrics).catch(() => setMetrics(null));
   }, [authorized]);
 
-  const searchUsers = async () => { setUsers(await adminUsers(uq)); };
-  const searchRegs = async () => { setRegs(await adminRegistries(rq)); };
+  const searchUsers = async (more = false) => {
+    const page = await adminUsers(uq, more ? usersCursor : null);
+    setUsers(more ? [...users, ...page.items] : page.items);
+    setUsersCursor(page.next_cursor);
+  };
+  const searchRegs = async (more = false) => {
+    const page = await adminRegistries(rq, more ? regsCursor : null);
+    setRegs(more ? [...regs, ...page.items] : page.items);
+    setRegsCursor(page.next_cursor);
+  };
 
   if (!authorized) {
     return (
@@ -111,8 +121,8 @@ export default function AdminPage() {
             <CardHeader><CardTitle>Search users</CardTitle></CardHeader>
             <CardContent>
               <div className="flex gap-2">
-                <Input value={uq} onChange={(e) => setUq(e.target.value)} placeholder="Email contains…" />
-                <Button onClick={searchUsers}>Search</Button>
+                <Input value={uq} onChange={(e) => setUq(e.target.value)} placeholder="Email or name…" />
+                <Button onClick={() => searchUsers()}>Search</Button>
               </div>
               <ul className="text-sm space-y-2 mt-3">
                 {users.map((u) => (
@@ -125,6 +135,7 @@ export default function AdminPage() {
                   </li>
                 ))}
               </ul>
+              {usersCursor && <Button variant="secondary" className="mt-3" onClick={() => searchUsers(true)}>Load more</Button>}
             </CardContent>
           </Card>
           <Card>
@@ -132,7 +143,7 @@ export default function AdminPage() {
             <CardContent>
               <div className="flex gap-2">
                 <Input value={rq} onChange={(e) => setRq(e.target.value)} placeholder="Slug or names contain…" />
-                <Button onClick={searchRegs}>Search</Button>
+                <Button onClick={() => searchRegs()}>Search</Button>
               </div>
               <ul className="text-sm space-y-2 mt-3">
                 {regs.map((r) => (
@@ -151,6 +162,7 @@ export default function AdminPage() {
                   </li>
                 ))}
               </ul>
+              {regsCursor && <Button variant="secondary" className="mt-3" onClick={() => searchRegs(true)}>Load more</Button>}
             </CardContent>
           </Card>
         </div>
@@ -5,16 +5,16 @@ import { Button } from "../components/ui/button";
 import { Label } from "../components/ui/label";
 import { Input } from "../components/ui/input";
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "../components/ui/dialog";
-import { adminMe, getRegistryById, adminRegistryFunds, adminSetRegistryLock } from "../lib/api";
-import api from "../lib/api";
+import { adminMe, adminRegistryDetail, adminRegistryContributions, adminRegistryAudit, adminSetRegistryLock } from "../lib/api";
 
 export default function AdminRegistryDetail() {
   const { id } = useParams();
   const [authorized, setAuthorized] = React.useState(false);
   const [registry, setRegistry] = React.useState(null);
   const [funds, setFunds] = React.useState([]);
-  const [contribs, setContribs] = React.useState([]);
-  const [audit, setAudit] = React.useState([]);
+  const [totals, setTotals] = React.useState({ amount: 0, count: 0 });
+  const [contribs, setContribs] = React.useState({ items: [], next_cursor: null });
+  const [audit, setAudit] = React.useState({ items: [], next_cursor: null });
   const [lockOpen, setLockOpen] = React.useState(false);
   const [reason, setReason] = React.useState("");
 
@@ -26,16 +26,16 @@ export default function AdminRegistryDetail() {
     if (!authorized) return;
     const load = async () => {
       try {
-        const [r, f] = await Promise.all([
-          getRegistryById(id),
-          adminRegistryFunds(id)
+        const [d, c, a] = await Promise.all([
+          adminRegistryDetail(id),
+          adminRegistryContributions(id),
+          adminRegistryAudit(id)
         ]);
-        setRegistry(r);
-        setFunds(f);
-        const contribResp = await api.get(`/registries/${id}/contributions`);
-        setContribs(contribResp.data || []);
-        const auditResp = await api.get(`/registries/${id}/audit`);
-        setAudit(auditResp.data || []);
+        setRegistry(d.registry);
+        setFunds(d.funds);
+        setTotals({ amount: d.total_amount, count: d.contribution_count });
+        setContribs(c);
+        setAudit(a);
       } catch (e) {
         // ignore
       }
@@ -43,6 +43,15 @@ export default function AdminRegistryDetail() {
     load();
   }, [authorized, id]);
 
+  const loadMoreContribs = async () => {
+    const page = await adminRegistryContributions(id, contribs.next_cursor);
+    setContribs({ items: [...contribs.items, ...page.items], next_cursor: page.next_cursor });
+  };
+  const loadMoreAudit = async () => {
+    const page = await adminRegistryAudit(id, audit.next_cursor);
+    setAudit({ items: [...audit.items, ...page.items], next_cursor: page.next_cursor });
+  };
+
   if (!authorized) {
     return (
       <div className="max-w-3xl mx-auto px-4 py-24 text-center">
@@ -69,6 +78,7 @@ export default function AdminRegistryDetail() {
               <div>Owner ID: {registry.owner_id}</div>
               <div>Collaborators: {(registry.collaborators || []).length}</div>
               <div>Status: {registry.locked ? "Locked" : "Active"}</div>
+              <div>Raised: {formatCurrency(totals.amount, registry.currency)} from {totals.count} contributions</div>
               {registry.lock_reason ? <div className="text-xs text-muted-foreground">Reason: {registry.lock_reason}</div> : null}
               <div className="pt-2 flex gap-2">
                 <Button onClick={() => { setLockOpen(true); setReason(registry.lock_reason || ""); }}>Lock / Unlock</Button>
@@ -83,7 +93,7 @@ export default function AdminRegistryDetail() {
                 {funds.map((f) => (
                   <li key={f.id} className="rounded border p-2">
                     <div className="font-medium">{f.title}</div>
-                    <div className="text-xs text-muted-foreground">{f.category} • Goal {formatCurrency(f.goal, registry.currency)} • {f.visible !== false ? 'Visible' : 'Hidden'}</div>
+                    <div className="text-xs text-muted-foreground">{f.category} • {formatCurrency(f.raised, registry.currency)} of {formatCurrency(f.goal, registry.currency)} • {f.visible !== false ? 'Visible' : 'Hidden'}</div>
                   </li>
                 ))}
               </ul>
@@ -96,20 +106,21 @@ export default function AdminRegistryDetail() {
             <CardHeader><CardTitle>Latest contributions</CardTitle></CardHeader>
             <CardContent>
               <ul className="text-sm space-y-2">
-                {(contribs || []).slice(0, 20).map((c) => (
+                {contribs.items.map((c) => (
                   <li key={c.id} className="rounded border p-2 flex items-center justify-between">
                     <span>{c.name || 'Guest'} — {formatCurrency(c.amount, registry.currency)}</span>
                     <span className="text-xs text-muted-foreground">{new Date(c.created_at).toLocaleString()}</span>
                   </li>
                 ))}
               </ul>
+              {contribs.next_cursor && <Button variant="secondary" className="mt-3" onClick={loadMoreContribs}>Load more</Button>}
             </CardContent>
           </Card>
           <Card>
             <CardHeader><CardTitle>Audit log</CardTitle></CardHeader>
             <CardContent>
               <ul className="text-sm space-y-2 max-h-80 overflow-auto">
-                {(audit || []).map((a) => (
+                {audit.items.map((a) => (
                   <li key={a.id} className="rounded border p-2">
                     <div className="flex items-center justify-between">
                       <div className="font-medium text-xs">{a.action}</div>
@@ -119,6 +130,7 @@ export default function AdminRegistryDetail() {
                   </li>
                 ))}
               </ul>
+              {audit.next_cursor && <Button variant="secondary" className="mt-3" onClick={loadMoreAudit}>Load more</Button>}
             </CardContent>
           </Card>
         </div>
@@ -1,12 +1,14 @@
 import React from "react";
 import { useParams, Link } from "react-router-dom";
-import { adminMe, adminUserDetail } from "../lib/api";
+import { adminMe, adminUserDetail, adminUserAudit } from "../lib/api";
 import { Card, CardContent, CardHeader, CardTitle } from "../components/ui/card";
+import { Button } from "../components/ui/button";
 
 export default function AdminUserDetail() {
   const { id } = useParams();
   const [authorized, setAuthorized] = React.useState(false);
   const [data, setData] = React.useState(null);
+  const [audit, setAudit] = React.useState({ items: [], next_cursor: null });
 
   React.useEffect(() => {
     adminMe().then((m) => setAuthorized(!!m.is_admin)).catch(() => setAuthorized(false));
@@ -14,8 +16,14 @@ export default function AdminUserDetail() {
   React.useEffect(() => {
     if (!authorized) return;
     adminUserDetail(id).then(setData).catch(() => setData(null));
+    adminUserAudit(id).then(setAudit).catch(() => setAudit({ items: [], next_cursor: null }));
   }, [authorized, id]);
 
+  const loadMoreAudit = async () => {
+    const page = await adminUserAudit(id, audit.next_cursor);
+    setAudit({ items: [...audit.items, ...page.items], next_cursor: page.next_cursor });
+  };
+
   if (!authorized) {
     return (
       <div className="max-w-3xl mx-auto px-4 py-24 text-center">
@@ -26,7 +34,8 @@ export default function AdminUserDetail() {
   }
 
   if (!data) return <div className="p-10 text-center">Loading…</div>;
-  const { user, registries_owned = [], registries_collab = [], recent_audit = [] } = data;
+  const { user, registries_owned = [], registries_collab = [] } = data;
+  const recent_audit = audit.items;
 
   return (
     <div className="min-h-screen">
@@ -97,6 +106,7 @@ export default function AdminUserDetail() {
                   </li>
                 ))}
               </ul>
+              {audit.next_cursor && <Button variant="secondary" className="mt-3" onClick={loadMoreAudit}>Load more</Button>}
             </CardContent>
           </Card>
         </div>
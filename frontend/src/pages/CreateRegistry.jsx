@@ -19,7 +19,7 @@ import {
 } from "../mock/mock";
 import { getAccessToken } from "../lib/api";
 import { Plus, Trash2, Eye, EyeOff, ArrowDownToLine, GripVertical, UserPlus, X, Upload as UploadIcon, Copy, Pin, ChevronUp, ChevronDown, Cog } from "lucide-react";
-import { createRegistry as apiCreateRegistry, updateRegistry as apiUpdateRegistry, bulkUpsertFunds, getRegistryAnalytics, exportRegistryCSV, getRegistryById, addCollaborator, removeCollaborator } from "../lib/api";
+import { createRegistry as apiCreateRegistry, updateRegistry as apiUpdateRegistry, bulkUpsertFunds, getRegistryDashboard, getRegistryAnalytics, exportRegistryCSV, addCollaborator, removeCollaborator } from "../lib/api";
 import { uploadFileChunked } from "../lib/uploads";
 import { PROFESSIONAL_COPY, getRandomFundSuggestion } from "../utils/copyContent";
 import { DEFAULT_REGISTRY_IMAGES, getRandomImageByCategory, getRandomRegistryImage } from "../utils/defaultImages";
@@ -88,13 +88,32 @@ export default function CreateRegistry() {
   React.useEffect(() => {
     const regId = getRegId();
     if (!regId) return;
-    getRegistryAnalytics(regId).then(setAnalytics).catch(() => setAnalytics(null));
-    getRegistryById(regId)
-      .then((r) => {
+    const toAnalytics = (a) => ({ total: a.total_amount, count: a.total_contributions, average: a.average_amount, daily: a.daily_stats.map((d) => ({ day: d._id, sum: d.amount })) });
+    let cursor = null;
+    getRegistryDashboard(regId)
+      .then(({ registry: r, analytics: a, cursor: c }) => {
         setRegistry((cur) => ({ ...cur, theme: r.theme || cur.theme, coupleNames: r.couple_names, eventDate: r.event_date, location: r.location, currency: r.currency, slug: r.slug, heroImage: r.hero_image }));
         setCollaborators(r.collaborators || []);
+        setAnalytics(toAnalytics(a));
+        cursor = c;
       })
-      .catch(() => setCollaborators([]));
+      .catch(() => { setAnalytics(null); setCollaborators([]); });
+    // Poll for new gifts; unchanged polls return only a fresh cursor
+    const timer = setInterval(async () => {
+      if (!cursor || document.hidden) return;
+      try {
+        const a = await getRegistryAnalytics(regId, { since: cursor });
+        cursor = a.cursor;
+        if (a.changed) setAnalytics(toAnalytics(a));
+      } catch (e) {
+        // Cursor too old for the kept tombstones: start over from a full read
+        if (e?.response?.status === 410) {
+          const a = await getRegistryAnalytics(regId).catch(() => null);
+          if (a) { cursor = a.cursor; setAnalytics(toAnalytics(a)); }
+        }
+      }
+    }, 30000);
+    return () => clearInterval(timer);
   }, []);
 
   const saveAllLocal = () => { saveRegistry(registry); saveFunds(funds); };
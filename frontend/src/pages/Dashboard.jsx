@@ -5,7 +5,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "../components/ui/card"
 import { Input } from "../components/ui/input";
 import { Label } from "../components/ui/label";
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from "../components/ui/dialog";
-import { listMyRegistries, createRegistry, getRegistryAnalytics, listFunds } from "../lib/api";
+import { listMyRegistries, createRegistry, getRegistryDashboard } from "../lib/api";
 import { Plus, ExternalLink, TrendingUp } from "lucide-react";
 import { useAuth } from "../context/AuthContext";
 
@@ -40,11 +40,9 @@ export default function Dashboard() {
         
         // User has multiple registries - show dashboard for selection
         const results = await Promise.all(items.map(async (r) => {
-          const [a, f] = await Promise.all([
-            getRegistryAnalytics(r.id).catch(() => ({ total: 0, count: 0 })),
-            listFunds(r.id).catch(() => []),
-          ]);
-          return { id: r.id, analytics: a, fundsCount: f.length };
+          const d = await getRegistryDashboard(r.id).catch(() => null);
+          const a = d ? { total: d.analytics.total_amount, count: d.analytics.total_contributions } : { total: 0, count: 0 };
+          return { id: r.id, analytics: a, fundsCount: d ? d.funds.length : 0 };
         }));
         const map = {};
         let totalRaised = 0, totalContribs = 0;
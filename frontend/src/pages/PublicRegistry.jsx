@@ -35,6 +35,8 @@ export default function PublicRegistry() {
   const [contributionMessage, setContributionMessage] = React.useState("");
   const [isAnonymous, setIsAnonymous] = React.useState(false);
   const [submitting, setSubmitting] = React.useState(false);
+  // Resubmitting the same details reuses the key, so a retried tap can't record the gift twice
+  const lastAttempt = React.useRef(null);
 
   React.useEffect(() => {
     loadRegistry();
@@ -60,7 +62,7 @@ export default function PublicRegistry() {
 
     try {
       setSubmitting(true);
-      await createContribution({
+      const contrib = {
         fund_id: selectedFund.id,
         amount: parseFloat(contributionAmount),
         name: isAnonymous ? null : contributorName,
@@ -68,7 +70,13 @@ export default function PublicRegistry() {
         message: contributionMessage || null,
         public: !isAnonymous,
         method: "manual"
-      });
+      };
+      const body = JSON.stringify(contrib);
+      if (lastAttempt.current?.body !== body) {
+        lastAttempt.current = { body, key: window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}` };
+      }
+      await createContribution(contrib, lastAttempt.current.key);
+      lastAttempt.current = null;
 
       toast({ 
         title: MARKETING_COPY.contribute.thankYou,
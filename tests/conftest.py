@@ -0,0 +1,235 @@
+"""Shared fixtures for the in-process backend tests.
+
+These tests import backend/server.py directly and talk to a real local mongod
+(MONGO_URL, default mongodb://localhost:27017) using a throwaway database.
+They are skipped when no mongod is reachable.
+"""
+import asyncio
+import copy
+import os
+import sys
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import motor.frameworks.asyncio as motor_framework
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+SERVER_PY = str(BACKEND_DIR / "server.py")
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("TEST_DB_NAME", "giftspace_test")
+os.environ["EMAIL_PROVIDER"] = "fake"
+os.environ["EMAIL_WORKER_ENABLED"] = "0"
+
+
+# Motor runs each operation on an executor thread inside a copy of the caller's context, so values set
+# here when an operation is dispatched are what the listener sees when its command starts.
+_dispatch_site: ContextVar[Optional[str]] = ContextVar("dispatch_site", default=None)
+_request_commands: ContextVar[Optional["RequestCommands"]] = ContextVar("request_commands", default=None)
+_run_on_executor = motor_framework.run_on_executor
+
+
+def _server_call_site(depth: int = 3) -> str:
+    """The innermost backend/server.py frames on the stack, e.g. 'server.py:630 in fund_totals <- server.py:2518 in get_public_registry'"""
+    sites = []
+    frame = sys._getframe(2)
+    while frame is not None and len(sites) < depth:
+        if frame.f_code.co_filename == SERVER_PY:
+            sites.append(f"server.py:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " <- ".join(sites) or "outside server.py"
+
+
+def _in_background_task() -> bool:
+    server_module = sys.modules.get("server")
+    task = asyncio.current_task()
+    return server_module is not None and task is not None and server_module._background_tasks.get(task.get_name()) is task
+
+
+def _traced_run_on_executor(loop, fn, *args, **kwargs):
+    site = _dispatch_site.set(_server_call_site())
+    # Work spawned with start_background_task outlives the request that started it and is not charged to it
+    request = _request_commands.set(None) if _in_background_task() else None
+    try:
+        return _run_on_executor(loop, fn, *args, **kwargs)
+    finally:
+        if request is not None:
+            _request_commands.reset(request)
+        _dispatch_site.reset(site)
+
+
+motor_framework.run_on_executor = _traced_run_on_executor
+
+
+class RequestCommands:
+    """Commands one HTTP request sent before its response started, with the server.py line that sent each"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.commands: List[Tuple[str, str]] = []
+        self.open = True
+
+    def __len__(self):
+        return len(self.commands)
+
+    def report(self) -> str:
+        lines = [f"{self.method} {self.path}: {len(self)} commands"]
+        lines += [f"  {name:<14} {site}" for name, site in self.commands]
+        return "\n".join(lines)
+
+
+class CountingApp:
+    """ASGI wrapper that opens a RequestCommands for each HTTP request and closes it when the response starts.
+
+    Starlette background tasks run after that point, so they are not counted against the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.last: Optional[RequestCommands] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        record = self.last = RequestCommands(scope["method"], scope["path"])
+
+        async def send_and_close(message):
+            if message["type"] == "http.response.start":
+                record.open = False
+            await send(message)
+
+        token = _request_commands.set(record)
+        try:
+            await self.app(scope, receive, send_and_close)
+        finally:
+            _request_commands.reset(token)
+
+
+class CountingClient(TestClient):
+    """TestClient whose .commands is the RequestCommands of the last request it sent."""
+
+    def __init__(self, app):
+        self.counter = CountingApp(app)
+        super().__init__(self.counter)
+
+    @property
+    def commands(self) -> Optional[RequestCommands]:
+        return self.counter.last
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Records the commands sent to the test database, for round-trip budgets and query-plan checks."""
+
+    def __init__(self):
+        self.commands = []
+        self.documents = []
+        self.sites = []
+
+    def clear(self):
+        self.commands.clear()
+        self.documents.clear()
+        self.sites.clear()
+
+    def started(self, event):
+        if event.database_name == os.environ["DB_NAME"]:
+            site = _dispatch_site.get() or "outside server.py"
+            self.commands.append(event.command_name)
+            self.documents.append(copy.deepcopy(dict(event.command)))
+            self.sites.append(site)
+            request = _request_commands.get()
+            if request is not None and request.open:
+                request.commands.append((event.command_name, site))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Registered globally before server.py creates its client
+COMMANDS = CommandRecorder()
+monitoring.register(COMMANDS)
+
+
+def _mongo_available() -> bool:
+    try:
+        MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+MONGO_AVAILABLE = _mongo_available()
+
+
+def run(coro):
+    """Run a server coroutine to completion from a synchronous test (`from .conftest import run`)."""
+    return asyncio.run(coro)
+
+
+def pytest_collection_modifyitems(config, items):
+    if MONGO_AVAILABLE:
+        return
+    skip = pytest.mark.skip(reason="local mongod not available")
+    for item in items:
+        item.add_marker(skip)
+
+
+@pytest.fixture
+def server():
+    import server as server_module
+    run(server_module.client.drop_database(os.environ["DB_NAME"]))
+    return server_module
+
+
+@pytest.fixture
+def api(server):
+    """TestClient for the app (startup hooks are not run)."""
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def counted_api(server):
+    """Like api, but counts the database commands each request sends."""
+    return CountingClient(server.app)
+
+
+@pytest.fixture
+def make_user(server):
+    """Insert a user and return (user, auth headers)."""
+    def _make_user(email: str = "owner@example.com", name: str = "Owner"):
+        user = server.User(name=name, email=email, password_hash=server.hash_password("password123"))
+        run(server.db.users.insert_one({**user.model_dump(), **server.user_search_fields(user.name, user.email)}))
+        return user, {"Authorization": f"Bearer {server.create_access_token(user.id)}"}
+    return _make_user
+
+
+@pytest.fixture
+def registry_with_funds(server):
+    """Insert a registry with one fund per title and return (registry, funds); keywords set Registry fields."""
+    def _registry_with_funds(owner_id: str, titles: Tuple[str, ...] = ("Honeymoon", "Home"), slug: str = "a-b", **fields):
+        reg = server.Registry(couple_names="A & B", slug=slug, owner_id=owner_id, **fields)
+        funds = [server.Fund(title=title, registry_id=reg.id, order=i) for i, title in enumerate(titles)]
+
+        async def insert():
+            await server.db.registries.insert_one(reg.model_dump())
+            if funds:
+                await server.db.funds.insert_many([f.model_dump() for f in funds])
+        run(insert())
+        return reg, funds
+    return _registry_with_funds
+
+
+@pytest.fixture
+def db_commands(server):
+    """Command names sent to the test database since the fixture (or .clear()) was last called."""
+    COMMANDS.clear()
+    return COMMANDS
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from .conftest import run
+
+
+def test_admin_registry_detail_summarizes_and_pages_contributions(server, api, make_user, registry_with_funds, monkeypatch):
+    admin, headers = make_user(email="admin@example.com")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+
+    reg, (fund,) = registry_with_funds(admin.id, titles=("Trip",))
+
+    async def seed():
+        for minute, amount in enumerate((10, 20, 30)):
+            c = server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=amount,
+                                    created_at=datetime(2026, 5, 1, 12, minute))
+            await server.db.contributions.insert_one(c.model_dump())
+            await server.record_contribution_rollup(c)
+
+    run(seed())
+    detail = api.get(f"/api/admin/registries/{reg.id}/detail", headers=headers).json()
+    assert (detail["total_amount"], detail["contribution_count"]) == (60, 3)
+    assert detail["funds"][0]["raised"] == 60
+    assert "contributions" not in detail and "password_hash" not in detail["owner"]
+
+    first = api.get(f"/api/admin/registries/{reg.id}/contributions", params={"limit": 2}, headers=headers).json()
+    rest = api.get(f"/api/admin/registries/{reg.id}/contributions", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert [c["amount"] for c in first["items"] + rest["items"]] == [30, 20, 10]
+    assert rest["next_cursor"] is None
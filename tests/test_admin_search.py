@@ -0,0 +1,68 @@
+from .conftest import run
+
+
+def test_admin_user_search_ranks_and_paginates(server, api, make_user, monkeypatch):
+    run(server.ensure_indexes())
+    admin, headers = make_user(email="admin@example.com", name="Admin")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    for email, name in [
+        ("ann@example.com", "Zed"),
+        ("anna@example.com", "Anna Smith"),
+        ("bob@example.com", "Annabel Jones"),
+        ("carol@example.com", "Joanne Ann"),
+        ("dave@example.com", "Dave"),
+    ]:
+        make_user(email=email, name=name)
+
+    res = api.get("/api/admin/users", params={"query": "ann@example.com"}, headers=headers).json()
+    assert [u["email"] for u in res["items"]][:1] == ["ann@example.com"]
+    assert "password_hash" not in res["items"][0] and "search_grams" not in res["items"][0]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"query": "ann", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = api.get("/api/admin/users", params=params, headers=headers).json()
+        seen.extend(u["email"] for u in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    # Email prefix matches first, then name prefix, then substring
+    assert seen == ["ann@example.com", "anna@example.com", "bob@example.com", "carol@example.com"]
+
+
+def test_admin_registry_search_and_backfill(server, api, make_user, monkeypatch):
+    run(server.ensure_indexes())
+    admin, headers = make_user(email="admin@example.com")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+
+    async def seed_legacy():
+        reg = server.Registry(couple_names="Maya & Omar", slug="maya-omar", owner_id=admin.id)
+        await server.db.registries.insert_one(reg.model_dump())
+        await server.backfill_search_fields()
+        return reg
+
+    reg = run(seed_legacy())
+    api.post("/api/registries", json={"couple_names": "Lina & Sam", "event_date": "2026-06-01", "slug": "lina-sam"}, headers=headers)
+
+    res = api.get("/api/admin/registries", params={"query": "omar"}, headers=headers).json()
+    assert [r["id"] for r in res["items"]] == [reg.id]
+    assert res["items"][0]["owner_email"] == "admin@example.com"
+
+    newest = api.get("/api/admin/registries", params={"limit": 1}, headers=headers).json()
+    assert newest["items"][0]["slug"] == "lina-sam" and newest["next_cursor"]
+    rest = api.get("/api/admin/registries", params={"limit": 1, "cursor": newest["next_cursor"]}, headers=headers).json()
+    assert rest["items"][0]["slug"] == "maya-omar"
+
+
+def test_admin_search_works_before_indexes_are_built(server, api, make_user, monkeypatch):
+    # Indexes build in the background at startup, so the substring tier's hint may name a missing index
+    admin, headers = make_user(email="admin@example.com", name="Admin")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    make_user(email="carol@example.com", name="Joanne Ann")
+
+    res = api.get("/api/admin/users", params={"query": "oanne"}, headers=headers)
+    assert res.status_code == 200
+    assert [u["email"] for u in res.json()["items"]] == ["carol@example.com"]
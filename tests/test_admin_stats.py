@@ -0,0 +1,25 @@
+from .conftest import run
+
+
+def test_admin_stats_served_from_snapshot(server, api, make_user, registry_with_funds, monkeypatch):
+    admin, headers = make_user(email="admin@example.com")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(server, "_admin_stats_snapshot", None)
+
+    reg, (fund,) = registry_with_funds(admin.id, titles=("Honeymoon",))
+    for amount in (10, 30):
+        run(server.record_contribution_rollup(server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=amount)))
+    first = api.get("/api/admin/stats", headers=headers).json()
+    assert first["counts"]["registries"] == 1
+    assert first["last_registries"][0]["owner_email"] == "admin@example.com"
+    assert first["top_funds"][0]["_id"] == fund.id
+    assert (first["top_funds"][0]["sum"], first["top_funds"][0]["count"]) == (40, 2)
+    assert (first["top_funds"][0]["title"], first["top_funds"][0]["registry_slug"]) == ("Honeymoon", "a-b")
+
+    run(server.db.users.insert_one(server.User(name="New", email="new@example.com", password_hash="x").model_dump()))
+    second = api.get("/api/admin/stats", headers=headers).json()
+    assert second["generated_at"] == first["generated_at"]
+    assert second["counts"]["users"] == 1
+
+    forced = api.get("/api/admin/stats", params={"refresh": "true"}, headers=headers).json()
+    assert forced["counts"]["users"] == 2
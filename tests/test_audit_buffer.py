@@ -0,0 +1,35 @@
+import asyncio
+
+from .conftest import run
+
+
+def test_audit_entries_are_batched_and_flushed_on_shutdown(server, monkeypatch):
+    buffer = server.AuditBuffer(max_size=4, batch_size=3, flush_interval_sec=60)
+    monkeypatch.setattr(server, "audit_buffer", buffer)
+
+    async def scenario():
+        flusher = asyncio.create_task(buffer.run())
+        await asyncio.sleep(0)
+        try:
+            for i in range(2):
+                await server.log_audit("r1", None, "fund.update", {"i": i})
+            # Below the batch size and well inside the flush interval: nothing written yet
+            assert await server.db.audit_logs.count_documents({}) == 0
+            for i in range(2, 8):
+                await server.log_audit("r1", None, "fund.update", {"i": i})
+            server._shutdown_event.set()
+            await flusher
+        finally:
+            server._shutdown_event.clear()
+        assert not buffer.running
+        # After the loop stops, entries are written directly
+        await server.log_audit("r1", None, "fund.delete", {})
+
+    run(scenario())
+    docs = run(server.db.audit_logs.find({"registry_id": "r1"}).to_list(None))
+    assert sorted(d["meta"].get("i", -1) for d in docs) == [-1, 0, 1, 2, 3, 4, 5, 6, 7]
+
+
+def test_log_audit_writes_directly_when_buffer_not_running(server):
+    run(server.log_audit("r2", "u1", "registry.update", {"slug": "a"}))
+    assert run(server.db.audit_logs.count_documents({"registry_id": "r2"})) == 1
@@ -0,0 +1,57 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from .conftest import run
+
+
+def seed_audit(server, registry_id, entries):
+    docs = [server.AuditLog(registry_id=registry_id, user_id=user_id, action=action, meta={}, created_at=created_at).model_dump()
+            for user_id, action, created_at in entries]
+    run(server.db.audit_logs.insert_many(docs))
+
+
+def test_registry_audit_filters_and_pages(server, api, make_user):
+    owner, headers = make_user()
+    _, stranger = make_user(email="stranger@example.com")
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    base = datetime(2026, 5, 1)
+    seed_audit(server, reg["id"], [
+        (owner.id if i % 2 else "collab", "fund.update" if i % 3 else "fund.create", base + timedelta(hours=i))
+        for i in range(12)
+    ])
+
+    page = api.get(f"/api/registries/{reg['id']}/audit", params={"action": "fund.update", "limit": 3}, headers=headers).json()
+    assert len(page["items"]) == 3 and all(e["action"] == "fund.update" for e in page["items"])
+    seen = [e["id"] for e in page["items"]]
+    while page["next_cursor"]:
+        page = api.get(f"/api/registries/{reg['id']}/audit", params={"action": "fund.update", "limit": 3, "cursor": page["next_cursor"]}, headers=headers).json()
+        seen += [e["id"] for e in page["items"]]
+    assert len(seen) == len(set(seen)) == 8
+
+    res = api.get(f"/api/registries/{reg['id']}/audit", params={
+        "user_id": owner.id, "start": (base + timedelta(hours=3)).isoformat(), "end": (base + timedelta(hours=9)).isoformat(),
+    }, headers=headers).json()
+    assert [e["created_at"][:13] for e in res["items"]] == ["2026-05-01T07", "2026-05-01T05", "2026-05-01T03"]
+
+    assert api.get(f"/api/registries/{reg['id']}/audit", headers=stranger).status_code == 403
+
+
+def test_old_audit_entries_move_to_archive(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "AUDIT_RETENTION_DAYS", 30)
+    monkeypatch.setattr(server, "AUDIT_ARCHIVE_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "AUDIT_ARCHIVE_DIR", tmp_path)
+    now = datetime.utcnow()
+    seed_audit(server, "r1", [("u1", "fund.update", now - timedelta(days=40 + i)) for i in range(5)] + [("u1", "fund.update", now)])
+
+    assert run(server.archive_audit_logs()) == 5
+    assert run(server.db.audit_logs.count_documents({})) == 1
+    archived = []
+    for path in sorted(tmp_path.glob("audit-*.jsonl.gz")):
+        with gzip.open(path, "rt") as f:
+            archived += [json.loads(line) for line in f]
+    assert len(archived) == 5 and {e["registry_id"] for e in archived} == {"r1"}
+    # The lease was released, so the next run can go again
+    assert run(server.archive_audit_logs()) == 0
+    assert run(server.acquire_job_lease("audit_archive", 60)) is not None
+    assert run(server.acquire_job_lease("audit_archive", 60)) is None
@@ -0,0 +1,51 @@
+from .conftest import run
+
+
+def test_bulk_upsert_updates_creates_and_skips_unknown(server, api, make_user):
+    owner, headers = make_user()
+
+    async def seed():
+        reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+        await server.db.registries.insert_one(reg.model_dump())
+        fund = server.Fund(title="Trip", registry_id=reg.id, order=3, rank=(await server.allocate_fund_ranks(reg.id, 1))[0])
+        await server.db.funds.insert_one(fund.model_dump())
+        return reg, fund
+
+    reg, fund = run(seed())
+    url = f"/api/registries/{reg.id}/funds/bulk_upsert"
+    payload = [
+        {"title": "Home"},
+        {"id": fund.id, "title": "Honeymoon", "goal": 500},
+        {"id": "not-a-fund", "title": "Ghost"},
+        {"title": "Car", "coverUrl": "https://example.com/car.jpg"},
+    ]
+    res = api.post(url, json=payload, headers=headers)
+    assert res.status_code == 200
+    body = res.json()
+    assert [f["title"] for f in body] == ["Home", "Honeymoon", "Car"]
+    assert body[1]["goal"] == 500 and body[2]["cover_url"] == "https://example.com/car.jpg"
+    # New funds without an order go after the existing ones
+    listed = api.get(f"/api/registries/{reg.id}/funds", headers=headers).json()
+    assert [f["title"] for f in listed] == ["Honeymoon", "Home", "Car"]
+
+
+def test_bulk_upsert_rejects_whole_batch_on_invalid_item(server, api, make_user):
+    owner, headers = make_user()
+    reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+    run(server.db.registries.insert_one(reg.model_dump()))
+
+    res = api.post(f"/api/registries/{reg.id}/funds/bulk_upsert", json=[{"title": "Ok"}, {"title": "Bad", "goal": "lots"}], headers=headers)
+    assert res.status_code == 400
+    assert run(server.db.funds.count_documents({"registry_id": reg.id})) == 0
+
+
+def test_bulk_upsert_accepts_frontend_funds_envelope(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    reg, _ = registry_with_funds(owner.id, titles=())
+
+    # frontend/src/lib/api.js bulkUpsertFunds posts {funds: [...]}
+    payload = {"funds": [{"title": "Trip", "order": 0}, {"title": "Home", "order": 1}, {"title": "Car", "order": 2}]}
+    res = api.post(f"/api/registries/{reg.id}/funds/bulk_upsert", json=payload, headers=headers)
+    assert res.status_code == 200
+    assert [f["title"] for f in res.json()] == ["Trip", "Home", "Car"]
+    assert run(server.db.funds.count_documents({"registry_id": reg.id})) == 3
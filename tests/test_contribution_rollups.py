@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from .conftest import run
+
+
+def test_contributions_are_rolled_up_per_fund_and_day(server, make_user, registry_with_funds):
+    owner, _ = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        day1, day2 = datetime(2026, 5, 1, 10), datetime(2026, 5, 2, 23, 59)
+        for fund, amount, ts in [(funds[0], 100, day1), (funds[0], 50, day1), (funds[1], 25, day1), (funds[0], 10, day2)]:
+            await server.record_contribution_rollup(server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=amount, created_at=ts))
+        return funds, await server.db.contribution_rollups.find({}, {"_id": 0, "updated_at": 0}).sort([("day", 1), ("amount", -1)]).to_list(None)
+
+    funds, rows = run(scenario())
+    assert [(r["fund_id"], r["day"], r["count"], r["amount"]) for r in rows] == [
+        (funds[0].id, "2026-05-01", 2, 150),
+        (funds[1].id, "2026-05-01", 1, 25),
+        (funds[0].id, "2026-05-02", 1, 10),
+    ]
+
+
+def test_analytics_reads_rollups_for_any_range(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        for i, amount in enumerate([100, 200, 300]):
+            c = server.Contribution(fund_id=funds[0].id, registry_id=reg.id, amount=amount, created_at=datetime(2025, 1, 1) + timedelta(days=i * 100))
+            await server.record_contribution_rollup(c)
+        return reg
+
+    reg = run(scenario())
+    resp = api.get(f"/api/registries/{reg.id}/analytics", params={"start": "2025-01-01", "end": "2025-06-30"}, headers=headers)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total_contributions"] == 3
+    assert data["total_amount"] == 600
+    assert data["average_amount"] == 200
+    assert [d["_id"] for d in data["daily_stats"]] == ["2025-01-01", "2025-04-11"]
+    assert data["range"] == {"start": "2025-01-01", "end": "2025-06-30", "count": 2, "amount": 300}
+
+    assert api.get(f"/api/registries/{reg.id}/analytics", params={"start": "nope"}, headers=headers).status_code == 400
+
+
+def test_rebuild_matches_incremental_rollups(server, make_user, registry_with_funds):
+    owner, _ = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        for amount in (10, 20):
+            c = server.Contribution(fund_id=funds[0].id, registry_id=reg.id, amount=amount, created_at=datetime(2026, 5, 1, 12))
+            await server.db.contributions.insert_one(c.model_dump())
+            await server.record_contribution_rollup(c)
+        # A stale row for a day that no longer has contributions
+        await server.db.contribution_rollups.insert_one({"registry_id": reg.id, "fund_id": funds[1].id, "day": "2026-01-01", "count": 9, "amount": 9})
+        before = await server.db.contribution_rollups.find({"day": "2026-05-01"}, {"_id": 0, "count": 1, "amount": 1}).to_list(None)
+        await server.rebuild_contribution_rollups(reg.id)
+        after = await server.db.contribution_rollups.find({}, {"_id": 0, "count": 1, "amount": 1}).to_list(None)
+        return before, after
+
+    before, after = run(scenario())
+    assert before == after == [{"count": 2, "amount": 30}]
+
+
+def test_rebuild_keeps_rows_upserted_while_it_runs(server, make_user, registry_with_funds):
+    owner, _ = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        # Contributions land between the aggregation's snapshot and the cleanup: no stamp, newer updated_at
+        await server.db.contribution_rollups.insert_one({
+            "registry_id": reg.id, "fund_id": funds[0].id, "day": "2026-05-03", "count": 1, "amount": 5,
+            "updated_at": datetime.utcnow() + timedelta(minutes=1),
+        })
+        await server.db.contribution_rollups.insert_one({
+            "registry_id": reg.id, "fund_id": funds[1].id, "day": "2026-01-01", "count": 9, "amount": 9,
+            "updated_at": datetime.utcnow() - timedelta(minutes=1),
+        })
+        await server.rebuild_contribution_rollups(reg.id)
+        return await server.db.contribution_rollups.find({}, {"_id": 0, "day": 1}).to_list(None)
+
+    assert run(scenario()) == [{"day": "2026-05-03"}]
+
+
+def test_live_analytics_facet_with_timezone_and_top_contributors(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        rows = [
+            (funds[0], "Sam", "sam@example.com", 100, datetime(2026, 5, 1, 20, 30)),  # 2026-05-02 00:30 in Dubai
+            (funds[0], "Sam", "SAM@example.com", 50, datetime(2026, 5, 1, 21, 10)),
+            (funds[1], "Alex", None, 30, datetime(2026, 5, 1, 9, 0)),
+        ]
+        for fund, name, email, amount, ts in rows:
+            c = server.Contribution(fund_id=fund.id, registry_id=reg.id, name=name, guest_email=email, amount=amount, created_at=ts)
+            await server.db.contributions.insert_one(c.model_dump())
+        return reg, funds
+
+    reg, funds = run(scenario())
+    resp = api.get(
+        f"/api/registries/{reg.id}/analytics",
+        params={"start": "2026-05-01", "end": "2026-05-02", "granularity": "hour", "tz": "Asia/Dubai", "top": 5},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["source"] == "contributions"
+    assert data["total_contributions"] == 3
+    assert data["total_amount"] == 180
+    assert [(s["_id"], s["count"]) for s in data["series"]] == [("2026-05-01T13:00", 1), ("2026-05-02T00:00", 1), ("2026-05-02T01:00", 1)]
+    assert data["by_fund"][0] == {"fund_id": funds[0].id, "title": "Honeymoon", "goal": 0, "count": 2, "amount": 150}
+    assert data["top_contributors"][0] == {"name": "Sam", "count": 2, "amount": 150}
+
+    assert api.get(f"/api/registries/{reg.id}/analytics", params={"tz": "Mars/Olympus"}, headers=headers).status_code == 400
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+from .conftest import run
+
+
+def contribute(api, fund_id, amount=25, ip="198.51.100.7"):
+    return api.post("/api/contributions", json={"fund_id": fund_id, "amount": amount}, headers={"X-Forwarded-For": ip})
+
+
+def test_contribution_context_is_cached_between_contributions(server, api, make_user, db_commands):
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+
+    assert contribute(api, fund["id"]).status_code == 201
+    ctx = run(server.contribution_context(fund["id"]))
+    assert ctx["registry_id"] == reg["id"] and ctx["owner_email"] == owner.email and ctx["fund_title"] == "Trip"
+
+    db_commands.clear()
+    res = contribute(api, fund["id"], ip="198.51.100.8")
+    assert res.status_code == 201 and res.json()["registry_id"] == reg["id"]
+    # No fund/registry/owner reads once the context is cached
+    assert "find" not in db_commands.commands and "aggregate" not in db_commands.commands
+
+    # The rollup and audit entry are written by a background task once the response is sent
+    totals = run(server.fund_totals(reg["id"]))
+    assert totals[fund["id"]]["amount"] == 50
+    assert run(server.db.audit_logs.count_documents({"registry_id": reg["id"], "action": "contribution.create"})) == 2
+
+
+def test_registry_changes_invalidate_contribution_context(server, api, make_user):
+    admin, admin_headers = make_user(email="admin@example.com")
+    run(server.db.users.update_one({"id": admin.id}, {"$set": {"is_admin": True}}))
+    owner, headers = make_user(email="couple@example.com")
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+    assert contribute(api, fund["id"]).status_code == 201
+
+    api.post(f"/api/admin/registries/{reg['id']}/lock", json={"locked": True}, headers=admin_headers)
+    assert contribute(api, fund["id"], ip="198.51.100.9").status_code == 404
+
+    api.post(f"/api/admin/registries/{reg['id']}/lock", json={"locked": False}, headers=admin_headers)
+    api.put(f"/api/registries/{reg['id']}/funds/{fund['id']}", json={"title": "Honeymoon"}, headers=headers)
+    res = contribute(api, fund["id"], ip="198.51.100.10")
+    assert res.status_code == 201
+    assert run(server.contribution_context(fund["id"]))["fund_title"] == "Honeymoon"
+
+    api.delete(f"/api/registries/{reg['id']}/funds/{fund['id']}", headers=headers)
+    assert contribute(api, fund["id"], ip="198.51.100.11").status_code == 404
+
+
+def test_lock_from_another_worker_applies_once_cached_context_expires(server, api, make_user):
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+    assert contribute(api, fund["id"]).status_code == 201
+
+    # Written straight to the database, so this worker's cache is not invalidated until the entry expires
+    run(server.db.registries.update_one({"id": reg["id"]}, {"$set": {"locked": True}}))
+    assert contribute(api, fund["id"], ip="198.51.100.12").status_code == 201
+    _, ctx = server._contribution_context_cache[fund["id"]]
+    server._contribution_context_cache[fund["id"]] = (0, ctx)
+    assert contribute(api, fund["id"], ip="198.51.100.13").status_code == 404
+
+
+def test_full_context_cache_evicts_oldest_entries(server, api, make_user, monkeypatch):
+    monkeypatch.setattr(server, "CONTRIBUTION_CONTEXT_MAX_ENTRIES", 2)
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    funds = [api.post(f"/api/registries/{reg['id']}/funds", json={"title": t}, headers=headers).json()["id"] for t in ("A", "B", "C")]
+    server._contribution_context_cache.clear()
+    for fund_id in funds:
+        run(server.contribution_context(fund_id))
+    assert list(server._contribution_context_cache) == funds[1:]
+
+
+def test_idempotency_key_replays_original_contribution(server, api, make_user):
+    run(server.ensure_indexes())
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+    body = {"fund_id": fund["id"], "amount": 40, "name": "Guest"}
+
+    first = api.post("/api/contributions", json=body, headers={"Idempotency-Key": "tap-1", "X-Forwarded-For": "203.0.113.1"})
+    assert first.status_code == 201
+    # Retries (even past the per-IP rate limit) return the original without writing again
+    for _ in range(6):
+        again = api.post("/api/contributions", json=body, headers={"Idempotency-Key": "tap-1", "X-Forwarded-For": "203.0.113.1"})
+        assert again.status_code == 201 and again.json()["id"] == first.json()["id"] and again.json()["amount"] == 40
+    assert run(server.db.contributions.count_documents({"fund_id": fund["id"]})) == 1
+    assert run(server.db.audit_logs.count_documents({"action": "contribution.create"})) == 1
+
+    res = api.post("/api/contributions", json={**body, "amount": 41}, headers={"Idempotency-Key": "tap-1", "X-Forwarded-For": "203.0.113.2"})
+    assert res.status_code == 422
+
+    # A request that fails validation frees its key for the retry
+    missing = {"fund_id": "missing", "amount": 5}
+    assert api.post("/api/contributions", json=missing, headers={"Idempotency-Key": "tap-2", "X-Forwarded-For": "203.0.113.3"}).status_code == 404
+    res = api.post("/api/contributions", json={**body, "amount": 5}, headers={"Idempotency-Key": "tap-2", "X-Forwarded-For": "203.0.113.3"})
+    assert res.status_code == 201
+
+
+def test_new_idempotency_keys_are_rate_limited_before_claiming(server, api, make_user):
+    run(server.ensure_indexes())
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+    body = {"fund_id": fund["id"], "amount": 10}
+
+    codes = [api.post("/api/contributions", json=body, headers={"Idempotency-Key": f"k-{i}", "X-Forwarded-For": "203.0.113.20"}).status_code
+             for i in range(6)]
+    assert codes == [201] * 5 + [429]
+    assert run(server.db.idempotency_keys.count_documents({"key": "k-5"})) == 0
+
+
+def test_stale_in_flight_claim_is_taken_over(server, api, make_user):
+    run(server.ensure_indexes())
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+    body = server.ContributionIn(fund_id=fund["id"], amount=15)
+    now = datetime.utcnow()
+    # Claims whose requests died before inserting their contribution
+    for key, claimed_at in [("fresh", now), ("stale", now - timedelta(seconds=server.IDEMPOTENCY_CLAIM_TIMEOUT_SEC + 1))]:
+        run(server.db.idempotency_keys.insert_one({
+            "scope": "contribution", "key": key, "fingerprint": server.request_fingerprint(body),
+            "resource_id": f"lost-{key}", "created_at": claimed_at, "claimed_at": claimed_at,
+        }))
+
+    def post(key):
+        return api.post("/api/contributions", json=body.model_dump(), headers={"Idempotency-Key": key, "X-Forwarded-For": "203.0.113.21"})
+
+    assert post("fresh").status_code == 409
+    first = post("stale")
+    assert first.status_code == 201
+    assert run(server.db.idempotency_keys.find_one({"key": "stale"}))["resource_id"] == first.json()["id"]
+    assert post("stale").json()["id"] == first.json()["id"]
@@ -0,0 +1,51 @@
+import re
+
+
+def timing(res):
+    m = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) commands, (\d+) docs", app;dur=([\d.]+)', res.headers["Server-Timing"])
+    assert m, res.headers["Server-Timing"]
+    return {"db_ms": float(m.group(1)), "commands": int(m.group(2)), "docs": int(m.group(3)), "app_ms": float(m.group(4))}
+
+
+def test_server_timing_reports_the_requests_mongo_commands(server, counted_api, make_user):
+    owner, headers = make_user()
+    reg = counted_api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    counted_api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers)
+
+    res = counted_api.get(f"/api/registries/{reg['id']}/funds", headers=headers)
+    t = timing(res)
+    assert t["commands"] == len(counted_api.commands) > 0
+    assert t["docs"] > 0 and t["app_ms"] > 0
+
+    # Routes that never touch Mongo still get the header
+    assert timing(counted_api.get("/api/"))["commands"] == 0
+
+
+def test_admin_db_stats_aggregates_per_route(server, counted_api, make_user, monkeypatch):
+    monkeypatch.setattr(server, "_route_db_stats", {})
+    admin, admin_headers = make_user(email="admin@example.com")
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    owner, headers = make_user(email="couple@example.com")
+    reg = counted_api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    counts = []
+    for _ in range(2):
+        counted_api.get(f"/api/registries/{reg['id']}", headers=headers)
+        counts.append(len(counted_api.commands))
+
+    rows = {r["route"]: r for r in counted_api.get("/api/admin/db-stats", headers=admin_headers).json()}
+    row = rows["GET /api/registries/{registry_id}"]
+    assert row["requests"] == 2
+    assert row["commands_per_request"] == sum(counts) / 2 and row["max_commands"] == max(counts)
+    assert row["db_ms_per_request"] >= 0 and row["documents_per_request"] > 0
+    assert "POST /api/registries" in rows
+
+    res = counted_api.get("/api/admin/db-stats", headers=headers)
+    assert res.status_code == 403
+
+
+def test_reply_documents_reads_batches_and_write_counts(server):
+    assert server.reply_documents({"cursor": {"id": 0, "firstBatch": [{}, {}]}, "ok": 1}) == 2
+    assert server.reply_documents({"cursor": {"id": 0, "nextBatch": [{}]}, "ok": 1}) == 1
+    assert server.reply_documents({"n": 3, "nModified": 2, "ok": 1}) == 3
+    assert server.reply_documents({"lastErrorObject": {"n": 0}, "value": None, "ok": 1}) == 0
+    assert server.reply_documents({"ok": 1}) == 0
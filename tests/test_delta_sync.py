@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from .conftest import run
+
+
+def test_since_cursor_returns_only_changes_and_tombstones(server, api, make_user):
+    owner, headers = make_user()
+
+    async def seed():
+        reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+        await server.db.registries.insert_one(reg.model_dump())
+        old = datetime.utcnow() - timedelta(hours=1)
+        funds = [server.Fund(title=t, registry_id=reg.id, order=i, updated_at=old) for i, t in enumerate(("Trip", "Home"))]
+        await server.db.funds.insert_many([f.model_dump() for f in funds])
+        c = server.Contribution(fund_id=funds[0].id, registry_id=reg.id, amount=10, created_at=old)
+        await server.db.contributions.insert_one(c.model_dump())
+        await server.record_contribution_rollup(c)
+        return reg, funds
+
+    reg, funds = run(seed())
+    base = f"/api/registries/{reg.id}"
+    cursor = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+
+    quiet = api.get(f"{base}/analytics", params={"since": cursor}, headers=headers).json()
+    assert quiet == {"changed": False, "cursor": quiet["cursor"]}
+    assert api.get(f"{base}/contributions", params={"since": cursor}, headers=headers).json()["items"] == []
+
+    api.post("/api/contributions", json={"fund_id": funds[1].id, "amount": 40})
+    api.delete(f"{base}/funds/{funds[0].id}", headers=headers)
+
+    contribs = api.get(f"{base}/contributions", params={"since": cursor}, headers=headers).json()
+    assert [c["amount"] for c in contribs["items"]] == [40]
+    assert [(d["kind"], d["id"]) for d in contribs["deleted"]] == [("fund", funds[0].id)]
+    fund_changes = api.get(f"{base}/funds", params={"since": cursor}, headers=headers).json()
+    assert fund_changes["items"] == [] and fund_changes["deleted"][0]["id"] == funds[0].id
+    changed = api.get(f"{base}/analytics", params={"since": cursor}, headers=headers).json()
+    assert changed["changed"] and changed["total_amount"] == 40
+
+    # Cursors with a UTC offset are read as the same instant
+    dubai = datetime.fromisoformat(cursor).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=4))).isoformat()
+    res = api.get(f"{base}/contributions", params={"since": dubai}, headers=headers)
+    assert res.status_code == 200 and [c["amount"] for c in res.json()["items"]] == [40]
+
+    # Full (non-delta) responses keep their shape
+    assert len(api.get(f"{base}/funds", headers=headers).json()) == 1
+    stale = (datetime.utcnow() - timedelta(days=server.TOMBSTONE_TTL_DAYS + 1)).isoformat()
+    assert api.get(f"{base}/funds", params={"since": stale}, headers=headers).status_code == 410
+
+
+def test_since_cursor_past_the_change_cap_must_refetch(server, api, make_user, registry_with_funds, monkeypatch):
+    monkeypatch.setattr(server, "SYNC_MAX_CHANGES", 2)
+    owner, headers = make_user()
+    reg, funds = registry_with_funds(owner.id, titles=("Trip",))
+    base = f"/api/registries/{reg.id}"
+    cursor = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+
+    for i in range(2):
+        api.post("/api/contributions", json={"fund_id": funds[0].id, "amount": 10}, headers={"X-Forwarded-For": f"198.51.100.{i}"})
+    assert len(api.get(f"{base}/contributions", params={"since": cursor}, headers=headers).json()["items"]) == 2
+
+    api.post("/api/contributions", json={"fund_id": funds[0].id, "amount": 10}, headers={"X-Forwarded-For": "198.51.100.9"})
+    assert api.get(f"{base}/contributions", params={"since": cursor}, headers=headers).status_code == 410
+    assert api.get(f"{base}/funds", params={"since": cursor}, headers=headers).status_code == 200
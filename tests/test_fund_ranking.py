@@ -0,0 +1,67 @@
+from .conftest import run
+
+
+def titles(api, reg, headers):
+    return [f["title"] for f in api.get(f"/api/registries/{reg.id}/funds", headers=headers).json()]
+
+
+def test_rank_between_always_finds_room(server):
+    lo, hi = server.rank_for_seq(1), server.rank_for_seq(2)
+    for _ in range(100):
+        mid = server.rank_between(lo, hi)
+        assert lo < mid < hi and not mid.endswith("0")
+        hi = mid
+    assert server.rank_between(None, server.rank_for_seq(62)) < server.rank_for_seq(62)
+
+
+def test_move_touches_only_the_moved_fund(server, api, make_user):
+    owner, headers = make_user()
+    reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+    run(server.db.registries.insert_one(reg.model_dump()))
+    ids = [api.post(f"/api/registries/{reg.id}/funds", json={"title": t}, headers=headers).json()["id"] for t in "ABCD"]
+    assert titles(api, reg, headers) == list("ABCD")
+
+    before = {f["id"]: f["rank"] for f in run(server.db.funds.find({}).to_list(None))}
+    res = api.post(f"/api/registries/{reg.id}/funds/{ids[3]}/move", json={"after_id": ids[0]}, headers=headers)
+    assert res.status_code == 200
+    assert titles(api, reg, headers) == list("ADBC")
+    after = {f["id"]: f["rank"] for f in run(server.db.funds.find({}).to_list(None))}
+    assert [i for i in ids if before[i] != after[i]] == [ids[3]]
+
+    api.post(f"/api/registries/{reg.id}/funds/{ids[2]}/move", json={"before_id": ids[0]}, headers=headers)
+    api.post(f"/api/registries/{reg.id}/funds/{ids[0]}/move", json={"after_id": ids[1]}, headers=headers)
+    assert titles(api, reg, headers) == list("CDBA")
+
+
+def test_bulk_order_reranks_only_out_of_place_funds(server, api, make_user):
+    owner, headers = make_user()
+    reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+    run(server.db.registries.insert_one(reg.model_dump()))
+    funds = api.post(f"/api/registries/{reg.id}/funds/bulk_upsert", json=[{"title": t} for t in "ABCDE"], headers=headers).json()
+    ranks = {f["id"]: f["rank"] for f in funds}
+
+    # The editor sends every fund with its new position after dragging E to the front
+    dragged = [funds[4]] + funds[:4]
+    api.post(f"/api/registries/{reg.id}/funds/bulk_upsert", json=[{**f, "order": i} for i, f in enumerate(dragged)], headers=headers)
+    assert titles(api, reg, headers) == list("EABCD")
+    stored = {f["id"]: f["rank"] for f in run(server.db.funds.find({}).to_list(None))}
+    assert [f["title"] for f in funds if stored[f["id"]] != ranks[f["id"]]] == ["E"]
+
+
+def test_rebalance_and_backfill(server, api, make_user):
+    owner, headers = make_user()
+
+    async def seed():
+        reg = server.Registry(couple_names="A & B", slug="a-b", owner_id=owner.id)
+        await server.db.registries.insert_one(reg.model_dump())
+        await server.db.funds.insert_many([server.Fund(title=t, registry_id=reg.id, order=o).model_dump() for t, o in (("B", 2), ("A", 1))])
+        await server.backfill_fund_ranks()
+        return reg
+
+    reg = run(seed())
+    assert titles(api, reg, headers) == ["A", "B"]
+    run(server.db.funds.update_one({"title": "B"}, {"$set": {"rank": "000000" + "z" * 20}}))
+    run(server.db.registries.update_one({"id": reg.id}, {"$set": {"fund_ranks_dense": True}}))
+    run(server.rebalance_dense_rankings())
+    assert all(len(f["rank"]) == 7 for f in run(server.db.funds.find({}).to_list(None)))
+    assert titles(api, reg, headers) == ["B", "A"]
@@ -0,0 +1,41 @@
+from .conftest import run
+
+
+def test_index_drift_reports_missing_extra_and_divergent(server, api, make_user, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    _, admin = make_user(email="admin@example.com")
+    _, owner = make_user(email="owner2@example.com")
+
+    run(server.ensure_indexes())
+    retention = server.STATUS_CHECK_RETENTION_DAYS * 86400
+    assert run(server.index_drift()) == {"missing": [], "extra": [], "divergent": []}
+
+    run(server.db.funds.drop_index("id_1"))
+    run(server.db.funds.create_index("title"))
+    monkeypatch.setattr(server, "STATUS_CHECK_RETENTION_DAYS", 0)
+    drift = api.get("/api/admin/indexes", headers=admin).json()
+    assert [(m["collection"], m["keys"]) for m in drift["missing"]] == [("funds", [["id", 1]])]
+    assert [(e["collection"], e["name"]) for e in drift["extra"]] == [("funds", "title_1")]
+    assert [(d["collection"], d["options"], d["actual"]) for d in drift["divergent"]] == [("status_checks", {}, {"expireAfterSeconds": retention})]
+
+    # Rebuilding fixes everything but the extra index, which is left for an operator to drop
+    run(server.ensure_indexes())
+    drift = run(server.index_drift())
+    assert not drift["missing"] and not drift["divergent"] and len(drift["extra"]) == 1
+
+    assert api.get("/api/admin/indexes", headers=owner).status_code == 403
+
+
+def test_unique_indexes_build_separately(server):
+    run(server.ensure_indexes(unique=True))
+    missing = run(server.index_drift())["missing"]
+    assert missing and not any(m["options"].get("unique") for m in missing)
+    assert ("idempotency_keys", [("scope", 1), ("key", 1)]) not in [(m["collection"], m["keys"]) for m in missing]
+
+    run(server.ensure_indexes(unique=False))
+    assert run(server.index_drift())["missing"] == []
+
+
+def test_startup_index_build_covers_the_whole_spec(server):
+    run(server.build_indexes())
+    assert run(server.index_drift())["missing"] == []
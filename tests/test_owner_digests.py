@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from .conftest import run
+
+
+def test_hourly_digest_coalesces_contributions(server, make_user, registry_with_funds):
+    now = datetime(2026, 5, 1, 14, 5)
+    owner, _ = make_user()
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Honeymoon",), notification_mode="hourly")
+
+    async def scenario():
+        for i in range(3):
+            c = server.Contribution(fund_id=fund.id, amount=100, name=f"Guest {i}", message="Congrats!", registry_id=reg.id,
+                                    created_at=datetime(2026, 5, 1, 13, 10 + i))
+            await server.db.contributions.insert_one(c.model_dump())
+        first = await server.send_owner_digests(now)
+        second = await server.send_owner_digests(now + timedelta(minutes=5))
+        emails = await server.db.email_outbox.find({"kind": "owner_digest"}).to_list(None)
+        return first, second, emails
+
+    first, second, emails = run(scenario())
+    assert first == 1
+    assert second == 0  # the 13:00-14:00 window was already claimed
+    assert len(emails) == 1
+    assert emails[0]["to"] == ["owner@example.com"]
+    assert "3 contributions" in emails[0]["subject"]
+    assert "300.00" in emails[0]["subject"]
+
+
+def test_immediate_registries_are_not_digested(server, make_user, registry_with_funds):
+    owner, _ = make_user()
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Honeymoon",), notification_mode="immediate")
+
+    async def scenario():
+        c = server.Contribution(fund_id=fund.id, amount=50, registry_id=reg.id, created_at=datetime(2026, 5, 1, 13, 30))
+        await server.db.contributions.insert_one(c.model_dump())
+        return await server.send_owner_digests(datetime(2026, 5, 2, 0, 5))
+
+    assert run(scenario()) == 0
+
+
+def test_digest_window_advances_only_after_queueing(server, make_user, registry_with_funds, monkeypatch):
+    run(server.ensure_indexes())
+    now = datetime(2026, 5, 1, 14, 5)
+    owner, _ = make_user()
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Honeymoon",), notification_mode="hourly")
+    real_enqueue = server.enqueue_emails
+
+    async def failing_enqueue(emails):
+        raise RuntimeError("outbox unavailable")
+
+    async def scenario():
+        c = server.Contribution(fund_id=fund.id, amount=100, registry_id=reg.id, created_at=datetime(2026, 5, 1, 13, 30))
+        await server.db.contributions.insert_one(c.model_dump())
+
+        monkeypatch.setattr(server, "enqueue_emails", failing_enqueue)
+        try:
+            await server.send_owner_digests(now)
+        except RuntimeError:
+            pass
+        monkeypatch.setattr(server, "enqueue_emails", real_enqueue)
+        stuck = await server.db.registries.find_one({"id": reg.id})
+        # Still leased to the worker that failed, so nobody else sends it yet
+        leased = await server.send_owner_digests(now + timedelta(minutes=1))
+        retried = await server.send_owner_digests(now + timedelta(seconds=server.DIGEST_LEASE_SEC + 1))
+
+        # A worker that dies after queueing but before advancing the window re-sends nothing
+        await server.db.registries.update_one({"id": reg.id}, {"$unset": {"digest_sent_through": ""}})
+        resent = await server.send_owner_digests(now + timedelta(minutes=20))
+        done = await server.db.registries.find_one({"id": reg.id})
+        return stuck, leased, retried, resent, done, await server.db.email_outbox.count_documents({"kind": "owner_digest"})
+
+    stuck, leased, retried, resent, done, emails = run(scenario())
+    assert stuck.get("digest_sent_through") is None and stuck["digest_claim"]
+    assert (leased, retried, resent, emails) == (0, 1, 0, 1)
+    assert done["digest_sent_through"] == datetime(2026, 5, 1, 14) and "digest_claim" not in done
+
+
+def test_digest_escapes_guest_supplied_text(server):
+    email = server.render_owner_digest(
+        owner_name="Sam", couple_names="A & B", currency="AED", period_label="hourly", count=1, amount=10,
+        funds=[{"title": "<b>Trip</b>", "count": 1, "amount": 10}],
+        messages=[{"message": "<script>alert(1)</script>", "name": '<img src=x onerror="x">'}],
+    )
+    assert "<script>" not in email.html and "<img" not in email.html and "<b>Trip" not in email.html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in email.html and "A &amp; B" in email.html
@@ -0,0 +1,25 @@
+from .conftest import run
+
+
+def test_reset_tokens_are_stored_hashed_and_redeemed_once(server, api, make_user, monkeypatch):
+    run(server.ensure_indexes())
+    user, _ = make_user()
+    sent = []
+
+    async def capture(email, name, token):
+        sent.append(token)
+    monkeypatch.setattr(server, "send_password_reset_email", capture)
+
+    res = api.post("/api/auth/password-reset/request", json={"email": user.email}, headers={"X-Forwarded-For": "192.0.2.10"})
+    assert res.status_code == 200 and len(sent) == 1
+    record = run(server.db.password_resets.find_one({"user_id": user.id}))
+    assert "token" not in record and record["token_hash"] == server.password_reset_digest(sent[0])
+
+    confirm = {"token": sent[0], "new_password": "a-new-password"}
+    assert api.post("/api/auth/password-reset/confirm", json=confirm, headers={"X-Forwarded-For": "192.0.2.11"}).status_code == 200
+    # Already used
+    assert api.post("/api/auth/password-reset/confirm", json=confirm, headers={"X-Forwarded-For": "192.0.2.11"}).status_code == 400
+    assert api.post("/api/auth/password-reset/confirm", json={**confirm, "token": "bogus"}, headers={"X-Forwarded-For": "192.0.2.11"}).status_code == 400
+
+    login = api.post("/api/auth/login", json={"email": user.email, "password": "a-new-password"}, headers={"X-Forwarded-For": "192.0.2.12"})
+    assert login.status_code == 200
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from .conftest import run
+
+
+async def contribute(server, reg, fund, amount):
+    c = server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=amount)
+    await server.db.contributions.insert_one(c.model_dump())
+    await server.record_contribution_rollup(c)
+    await server.record_contribution_metrics(c, reg.currency)
+
+
+def test_metrics_are_maintained_incrementally(server, api, make_user, registry_with_funds, monkeypatch):
+    _, headers = make_user()
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"owner@example.com"})
+    reg, funds = registry_with_funds("owner")
+    usd_reg, usd_funds = registry_with_funds("owner", currency="USD", slug="c-d")
+
+    async def scenario():
+        await contribute(server, reg, funds[0], 100)
+        await contribute(server, reg, funds[0], 300)
+        await contribute(server, reg, funds[1], 20)
+        await contribute(server, usd_reg, usd_funds[0], 50)
+
+    run(scenario())
+    data = api.get("/api/admin/metrics", headers=headers).json()
+    assert data["active_events"] == 2
+    assert data["active_gifts"] == 3
+    assert data["max_amount"] == 300
+    assert data["average_amount"] == 470 / 4
+    assert data["by_currency"]["AED"] == {"sum": 420, "count": 3, "max": 300, "average": 140}
+
+
+def test_fund_deletion_retracts_its_contributions(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    reg, funds = registry_with_funds(owner.id)
+
+    async def scenario():
+        await contribute(server, reg, funds[0], 100)
+        await contribute(server, reg, funds[1], 20)
+
+    def metrics():
+        return run(server.db.platform_metrics.find_one({"_id": "global"}))
+
+    run(scenario())
+    assert api.delete(f"/api/registries/{reg.id}/funds/{funds[1].id}", headers=headers).status_code == 200
+    after_one = metrics()
+    assert (after_one["active_gifts"], after_one["active_events"], after_one["currencies"]["AED"]["sum"]) == (1, 1, 100)
+    assert api.delete(f"/api/registries/{reg.id}/funds/{funds[0].id}", headers=headers).status_code == 200
+    after_both = metrics()
+    assert (after_both["active_gifts"], after_both["active_events"], after_both["currencies"]["AED"]["count"]) == (0, 0, 0)
+
+
+def test_reconcile_recomputes_from_contributions(server, registry_with_funds):
+    reg, funds = registry_with_funds("owner")
+    deleted, deleted_funds = registry_with_funds("owner", slug="deleted")
+
+    async def scenario():
+        await contribute(server, reg, funds[0], 100)
+        await contribute(server, reg, funds[0], 40)
+        await contribute(server, deleted, deleted_funds[0], 500)
+        await server.db.registries.update_one({"id": deleted.id}, {"$set": {"deleted_at": datetime.utcnow()}})
+        await server.db.platform_metrics.update_one({"_id": "global"}, {"$set": {"active_gifts": 99}})
+        return await server.reconcile_platform_metrics()
+
+    doc = run(scenario())
+    assert doc["active_gifts"] == 1
+    assert doc["active_events"] == 1
+    assert doc["currencies"] == {"AED": {"sum": 140, "count": 2, "max": 100}}
+
+
+def test_cached_context_skips_activity_flag_writes(server, make_user, registry_with_funds, db_commands):
+    owner, _ = make_user()
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Trip",))
+    ctx = run(server.contribution_context(fund.id))
+
+    db_commands.clear()
+    run(server.record_contribution_metrics(server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=10), "AED", ctx))
+    assert db_commands.commands == ["update"] * 3
+    assert ctx["fund_has_contributions"] and ctx["registry_has_contributions"]
+
+    db_commands.clear()
+    run(server.record_contribution_metrics(server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=20), "AED", ctx))
+    assert db_commands.commands == ["update"]
+    metrics = run(server.db.platform_metrics.find_one({"_id": server.PLATFORM_METRICS_ID}))
+    assert (metrics["active_gifts"], metrics["active_events"], metrics["currencies"]["AED"]["count"]) == (1, 1, 2)
@@ -0,0 +1,169 @@
+"""Database round-trip budgets per API route.
+
+Every /api route is driven twice, against a registry with a couple of funds, contributions and campaigns and
+against one with many, and the commands each request sends before its response starts are counted (Starlette
+background tasks and start_background_task work are not). A route fails when it exceeds its budget or when
+the larger registry costs it more commands than the small one: the shape of an N+1 loop. Failures list the
+server.py line that sent each command.
+"""
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from fastapi.routing import APIRoute
+
+from .conftest import run
+
+SIZES = {"small": 2, "large": 25}
+
+
+class Budget(NamedTuple):
+    method: str
+    path: str  # route template, for coverage
+    request: Callable[[Dict[str, Any]], Tuple[str, Dict[str, Any]]]  # ctx -> (url, kwargs)
+    max_commands: int
+    status: int = 200
+
+
+def auth(ctx, who="owner", **kwargs):
+    return {"headers": {**ctx[who], **kwargs.pop("headers", {})}, **kwargs}
+
+
+def ip(ctx, n):
+    return {"X-Forwarded-For": f"198.19.{ctx['n']}.{n}"}
+
+
+def bulk_upsert_payload(fund_ids, new):
+    """Renames every fund in fund_ids and creates `new` more, as a bare list of items"""
+    return [{"id": f, "title": f"Bulk {i}"} for i, f in enumerate(fund_ids)] + [{"title": f"Bulk new {i}"} for i in range(new)]
+
+
+BUDGETS: List[Budget] = [
+    Budget("GET", "/api/", lambda c: ("/api/", {}), 0),
+    Budget("POST", "/api/auth/register", lambda c: ("/api/auth/register", {"json": {"name": "New", "email": f"new-{c['n']}@example.com", "password": "password123"}, "headers": ip(c, 1)}), 1, 201),
+    Budget("POST", "/api/auth/login", lambda c: ("/api/auth/login", {"json": {"email": "owner@example.com", "password": "password123"}, "headers": ip(c, 2)}), 1),
+    Budget("GET", "/api/auth/me", lambda c: ("/api/auth/me", auth(c)), 1),
+    Budget("POST", "/api/auth/password-reset/request", lambda c: ("/api/auth/password-reset/request", {"json": {"email": "owner@example.com"}, "headers": ip(c, 3)}), 2),
+    Budget("POST", "/api/auth/password-reset/confirm", lambda c: ("/api/auth/password-reset/confirm", {"json": {"token": c["reset_token"], "new_password": "password123"}, "headers": ip(c, 4)}), 2),
+    Budget("GET", "/api/admin/me", lambda c: ("/api/admin/me", auth(c, "admin")), 1),
+    Budget("GET", "/api/admin/indexes", lambda c: ("/api/admin/indexes", auth(c, "admin")), 15),
+    Budget("GET", "/api/admin/stats", lambda c: ("/api/admin/stats?refresh=true", auth(c, "admin")), 8),
+    Budget("GET", "/api/admin/metrics", lambda c: ("/api/admin/metrics", auth(c, "admin")), 2),
+    Budget("GET", "/api/admin/db-stats", lambda c: ("/api/admin/db-stats", auth(c, "admin")), 1),
+    Budget("GET", "/api/admin/users", lambda c: ("/api/admin/users?query=guest", auth(c, "admin")), 5),
+    Budget("GET", "/api/admin/users/lookup", lambda c: (f"/api/admin/users/lookup?ids={','.join(c['guest_ids'])}", auth(c, "admin")), 2),
+    Budget("GET", "/api/admin/users/{user_id}/detail", lambda c: (f"/api/admin/users/{c['owner_id']}/detail", auth(c, "admin")), 4),
+    Budget("GET", "/api/admin/users/{user_id}/audit", lambda c: (f"/api/admin/users/{c['owner_id']}/audit", auth(c, "admin")), 2),
+    Budget("GET", "/api/admin/registries", lambda c: ("/api/admin/registries?query=couple", auth(c, "admin")), 6),
+    Budget("POST", "/api/admin/registries/{registry_id}/lock", lambda c: (f"/api/admin/registries/{c['spare_registry']}/lock", auth(c, "admin", json={"locked": True})), 3),
+    Budget("GET", "/api/admin/registries/{registry_id}/funds", lambda c: (f"/api/admin/registries/{c['registry']}/funds", auth(c, "admin")), 2),
+    Budget("GET", "/api/admin/registries/{registry_id}/detail", lambda c: (f"/api/admin/registries/{c['registry']}/detail", auth(c, "admin")), 5),
+    Budget("GET", "/api/admin/registries/{registry_id}/contributions", lambda c: (f"/api/admin/registries/{c['registry']}/contributions", auth(c, "admin")), 2),
+    Budget("GET", "/api/admin/registries/{registry_id}/audit", lambda c: (f"/api/admin/registries/{c['registry']}/audit", auth(c, "admin")), 2),
+    Budget("POST", "/api/admin/rollups/rebuild", lambda c: (f"/api/admin/rollups/rebuild?registry_id={c['registry']}", auth(c, "admin")), 4),
+    Budget("POST", "/api/status", lambda c: ("/api/status", {"json": {"client_name": "probe"}}), 1),
+    Budget("GET", "/api/status", lambda c: ("/api/status", {}), 1),
+    Budget("POST", "/api/registries", lambda c: ("/api/registries", auth(c, json={"couple_names": "New & Couple", "slug": f"new-{c['n']}"})), 3, 201),
+    Budget("GET", "/api/registries", lambda c: ("/api/registries", auth(c)), 2),
+    Budget("GET", "/api/registries/mine", lambda c: ("/api/registries/mine", auth(c, "collab")), 2),
+    Budget("GET", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['registry']}", auth(c)), 2),
+    Budget("PUT", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['registry']}", auth(c, json={"location": "Dubai"})), 3),
+    Budget("DELETE", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['doomed_registry']}", auth(c)), 7),
+    Budget("GET", "/api/public/registries/{slug}", lambda c: (f"/api/public/registries/{c['slug']}", {}), 3),
+    Budget("GET", "/api/registries/{registry_id}/funds", lambda c: (f"/api/registries/{c['registry']}/funds", auth(c)), 3),
+    Budget("POST", "/api/registries/{registry_id}/funds", lambda c: (f"/api/registries/{c['registry']}/funds", auth(c, json={"title": "Extra"})), 5, 201),
+    Budget("PUT", "/api/registries/{registry_id}/funds/{fund_id}", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][0]}", auth(c, json={"title": "Renamed", "goal": 500})), 4),
+    Budget("POST", "/api/registries/{registry_id}/funds/{fund_id}/move", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][0]}/move", auth(c, json={"after_id": c["funds"][-2]})), 7),
+    Budget("DELETE", "/api/registries/{registry_id}/funds/{fund_id}", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][-1]}", auth(c)), 10),
+    Budget("POST", "/api/registries/{registry_id}/funds/bulk_upsert", lambda c: (f"/api/registries/{c['registry']}/funds/bulk_upsert", auth(c, json=bulk_upsert_payload(c["funds"][:-1], c["n"]))), 7),
+    Budget("POST", "/api/contributions", lambda c: ("/api/contributions", {"json": {"fund_id": c["funds"][1], "amount": 10}, "headers": {**ip(c, 5), "Idempotency-Key": f"budget-{c['n']}"}}), 4, 201),
+    Budget("GET", "/api/registries/{registry_id}/contributions", lambda c: (f"/api/registries/{c['registry']}/contributions", auth(c)), 3),
+    Budget("GET", "/api/registries/{registry_id}/analytics", lambda c: (f"/api/registries/{c['registry']}/analytics", auth(c)), 3),
+    Budget("GET", "/api/registries/{registry_id}/dashboard", lambda c: (f"/api/registries/{c['registry']}/dashboard", auth(c)), 5),
+    Budget("GET", "/api/registries/{registry_id}/audit", lambda c: (f"/api/registries/{c['registry']}/audit", auth(c)), 3),
+    Budget("GET", "/api/registries/{registry_id}/export/csv", lambda c: (f"/api/registries/{c['registry']}/export/csv", auth(c)), 4),
+    Budget("POST", "/api/registries/{registry_id}/thank-you", lambda c: (f"/api/registries/{c['registry']}/thank-you", auth(c, json={"subject": "Thanks {guest_name}", "message": "Thank you"})), 5, 202),
+    Budget("GET", "/api/registries/{registry_id}/thank-you", lambda c: (f"/api/registries/{c['registry']}/thank-you", auth(c)), 4),
+    Budget("GET", "/api/registries/{registry_id}/thank-you/{campaign_id}", lambda c: (f"/api/registries/{c['registry']}/thank-you/{c['campaign']}", auth(c)), 4),
+    Budget("POST", "/api/upload/chunk", lambda c: ("/api/upload/chunk", auth(c, files={"file": ("budget.txt", b"x")}, data={"filename": f"budget-{c['n']}.txt", "chunk_index": "0", "total_chunks": "1"})), 2),
+]
+
+
+def seed(server, api, shared, n):
+    """A registry with n funds, contributions and thank-you campaigns, plus the spare registries and tokens the write routes consume"""
+    headers = shared["owner"]
+    reg = api.post("/api/registries", json={"couple_names": f"Couple {n}", "slug": f"couple-{n}"}, headers=headers).json()
+    run(server.db.registries.update_one({"id": reg["id"]}, {"$set": {"collaborators": [shared["collab_id"]]}}))
+    funds = [api.post(f"/api/registries/{reg['id']}/funds", json={"title": f"Fund {i}"}, headers=headers).json()["id"] for i in range(n + 1)]
+    for i in range(n):
+        api.post("/api/contributions", json={"fund_id": funds[i], "amount": 10 + i, "name": f"Guest {i}", "guest_email": f"guest{i}@example.com"},
+                 headers={"X-Forwarded-For": f"198.19.{n}.{100 + i}"})
+    campaigns = [server.ThankYouCampaign(registry_id=reg["id"], created_by=shared["owner_id"], subject="Thanks", message="Thank you", status="completed")
+                 for _ in range(n)]
+    run(server.db.thank_you_campaigns.insert_many([c.model_dump() for c in campaigns]))
+    api.post("/api/auth/password-reset/request", json={"email": "owner@example.com"}, headers={"X-Forwarded-For": f"198.19.{n}.99"})
+    return {
+        **shared,
+        "n": n,
+        "registry": reg["id"],
+        "slug": reg["slug"],
+        "funds": funds,
+        "campaign": campaigns[0].id,
+        "reset_token": shared["sent_tokens"][-1],
+        "spare_registry": api.post("/api/registries", json={"couple_names": "Spare", "slug": f"spare-{n}"}, headers=headers).json()["id"],
+        "doomed_registry": api.post("/api/registries", json={"couple_names": "Doomed", "slug": f"doomed-{n}"}, headers=headers).json()["id"],
+    }
+
+
+def test_every_route_has_a_budget(server):
+    routes = {(method, route.path) for route in server.app.routes if isinstance(route, APIRoute) for method in route.methods}
+    assert sorted(routes - {(b.method, b.path) for b in BUDGETS}) == []
+
+
+def test_routes_stay_within_their_command_budgets(server, api, counted_api, make_user, monkeypatch, tmp_path):
+    run(server.ensure_indexes())
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "UPLOAD_TMP", tmp_path / "tmp")
+    (tmp_path / "tmp").mkdir()
+    owner, owner_headers = make_user()
+    collab, collab_headers = make_user(email="collab@example.com", name="Collab")
+    _, admin_headers = make_user(email="admin@example.com", name="Admin")
+    guest_ids = [make_user(email=f"guest{i}@example.com", name=f"Guest {i}")[0].id for i in range(5)]
+    sent_tokens = []
+
+    async def capture(email, name, token):
+        sent_tokens.append(token)
+    monkeypatch.setattr(server, "send_password_reset_email", capture)
+    shared = {"owner": owner_headers, "collab": collab_headers, "admin": admin_headers, "owner_id": owner.id, "collab_id": collab.id,
+              "guest_ids": guest_ids, "sent_tokens": sent_tokens}
+    contexts = {size: seed(server, api, shared, n) for size, n in SIZES.items()}
+
+    failures = []
+    for budget in BUDGETS:
+        counted = {}
+        for size, ctx in contexts.items():
+            url, kwargs = budget.request(ctx)
+            res = counted_api.request(budget.method, url, **kwargs)
+            assert res.status_code == budget.status, f"{budget.method} {url}: {res.status_code} {res.text[:200]}"
+            counted[size] = counted_api.commands
+        small, large = counted["small"], counted["large"]
+        worst = max(small, large, key=len)
+        if len(worst) > budget.max_commands:
+            failures.append(f"over budget ({budget.max_commands}): {worst.report()}")
+        elif len(large) > len(small):
+            failures.append(f"grows with the registry ({len(small)} -> {len(large)}): {large.report()}")
+    assert not failures, "\n".join(failures)
+
+
+def test_bulk_upsert_cost_does_not_depend_on_batch_size(server, counted_api, make_user, registry_with_funds):
+    run(server.ensure_indexes())
+    budget = next(b for b in BUDGETS if b.path == "/api/registries/{registry_id}/funds/bulk_upsert")
+    owner, headers = make_user()
+    reg, funds = registry_with_funds(owner.id, titles=tuple(f"Fund {i}" for i in range(SIZES["large"])))
+
+    counts = []
+    for n in SIZES.values():
+        res = counted_api.post(f"/api/registries/{reg.id}/funds/bulk_upsert", json=bulk_upsert_payload([f.id for f in funds[:n]], n),
+                               headers=headers)
+        assert res.status_code == 200 and len(res.json()) == 2 * n
+        counts.append(counted_api.commands)
+    assert len(counts[0]) == len(counts[1]) <= budget.max_commands, "\n".join(c.report() for c in counts)
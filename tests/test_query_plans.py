@@ -0,0 +1,241 @@
+"""Query-plan contracts for every API route.
+
+Each route is driven against a seeded database and every read or write command it sends is explained.
+A command fails its contract when its winning plan scans a whole collection (COLLSCAN, or a $lookup
+that is not an indexed loop join), sorts in memory without a limit, or examines more than `max_ratio`
+documents per document it returns, writes or matches. Exceptions are declared per route with a reason,
+and routes that are not driven at all must be listed in EXEMPT.
+
+Needs a mongod that can explain; the module is skipped otherwise.
+"""
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import pytest
+from fastapi.routing import APIRoute
+from pymongo import MongoClient
+
+from .conftest import run
+
+MAX_RATIO = 10
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Session and transport fields that explain rejects or ignores
+STRIP = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern", "writeConcern", "comment"}
+WRITE_COUNTERS = ("nMatched", "nWouldModify", "nWouldDelete", "nCounted")
+
+
+class Case(NamedTuple):
+    method: str
+    path: str  # route template, for coverage
+    request: Callable[[Dict[str, Any]], Tuple[str, Dict[str, Any]]]  # ctx -> (url, kwargs)
+    max_ratio: float = MAX_RATIO
+    collscan_ok: Dict[str, str] = {}  # collection -> why a full scan is expected
+    status: int = 200
+
+
+def auth(ctx, who="owner", **kwargs):
+    return {"headers": {**ctx[who], **kwargs.pop("headers", {})}, **kwargs}
+
+
+def ip(n):
+    return {"X-Forwarded-For": f"198.18.0.{n}"}
+
+
+CASES: List[Case] = [
+    Case("GET", "/api/", lambda c: ("/api/", {})),
+    Case("POST", "/api/auth/register", lambda c: ("/api/auth/register", {"json": {"name": "New", "email": "new@example.com", "password": "password123"}, "headers": ip(1)}), status=201),
+    Case("POST", "/api/auth/login", lambda c: ("/api/auth/login", {"json": {"email": "owner@example.com", "password": "password123"}, "headers": ip(2)})),
+    Case("GET", "/api/auth/me", lambda c: ("/api/auth/me", auth(c))),
+    Case("POST", "/api/auth/password-reset/request", lambda c: ("/api/auth/password-reset/request", {"json": {"email": "owner@example.com"}, "headers": ip(3)})),
+    Case("POST", "/api/auth/password-reset/confirm", lambda c: ("/api/auth/password-reset/confirm", {"json": {"token": c["reset_token"], "new_password": "password123"}, "headers": ip(4)})),
+    Case("GET", "/api/admin/me", lambda c: ("/api/admin/me", auth(c, "admin"))),
+    Case("GET", "/api/admin/indexes", lambda c: ("/api/admin/indexes", auth(c, "admin"))),
+    Case("GET", "/api/admin/stats", lambda c: ("/api/admin/stats?refresh=true", auth(c, "admin")),
+         collscan_ok={"contribution_rollups": "platform leaderboard over every fund; computed by the background refresher"}),
+    Case("GET", "/api/admin/metrics", lambda c: ("/api/admin/metrics", auth(c, "admin"))),
+    Case("GET", "/api/admin/db-stats", lambda c: ("/api/admin/db-stats", auth(c, "admin"))),
+    Case("GET", "/api/admin/users", lambda c: ("/api/admin/users", auth(c, "admin"))),
+    Case("GET", "/api/admin/users", lambda c: ("/api/admin/users?query=guest1", auth(c, "admin"))),
+    Case("GET", "/api/admin/users", lambda c: ("/api/admin/users?query=xample", auth(c, "admin")), max_ratio=100),  # substring tier: gram candidates are sorted in memory, one page at a time
+    Case("GET", "/api/admin/users/lookup", lambda c: (f"/api/admin/users/lookup?ids={c['owner_id']},{c['collab_id']}", auth(c, "admin"))),
+    Case("GET", "/api/admin/users/{user_id}/detail", lambda c: (f"/api/admin/users/{c['owner_id']}/detail", auth(c, "admin"))),
+    Case("GET", "/api/admin/users/{user_id}/audit", lambda c: (f"/api/admin/users/{c['owner_id']}/audit?limit=5&cursor={c['user_audit_cursor']}", auth(c, "admin"))),
+    Case("GET", "/api/admin/registries", lambda c: ("/api/admin/registries", auth(c, "admin"))),
+    Case("GET", "/api/admin/registries", lambda c: ("/api/admin/registries?query=guest-3", auth(c, "admin"))),
+    Case("POST", "/api/admin/registries/{registry_id}/lock", lambda c: (f"/api/admin/registries/{c['spare_registry']}/lock", auth(c, "admin", json={"locked": True}))),
+    Case("GET", "/api/admin/registries/{registry_id}/funds", lambda c: (f"/api/admin/registries/{c['registry']}/funds", auth(c, "admin"))),
+    Case("GET", "/api/admin/registries/{registry_id}/detail", lambda c: (f"/api/admin/registries/{c['registry']}/detail", auth(c, "admin"))),
+    Case("GET", "/api/admin/registries/{registry_id}/contributions", lambda c: (f"/api/admin/registries/{c['registry']}/contributions?limit=5&cursor={c['contribution_cursor']}", auth(c, "admin"))),
+    Case("GET", "/api/admin/registries/{registry_id}/audit", lambda c: (f"/api/admin/registries/{c['registry']}/audit?limit=5", auth(c, "admin"))),
+    Case("POST", "/api/status", lambda c: ("/api/status", {"json": {"client_name": "probe"}})),
+    Case("GET", "/api/status", lambda c: ("/api/status", {})),
+    Case("POST", "/api/registries", lambda c: ("/api/registries", auth(c, json={"couple_names": "Plan & Check", "slug": "plan-check"})), status=201),
+    Case("GET", "/api/registries", lambda c: ("/api/registries", auth(c))),
+    Case("GET", "/api/registries/mine", lambda c: ("/api/registries/mine", auth(c, "collab"))),
+    Case("GET", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['registry']}", auth(c))),
+    Case("PUT", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['registry']}", auth(c, json={"location": "Dubai"}))),
+    Case("DELETE", "/api/registries/{registry_id}", lambda c: (f"/api/registries/{c['doomed_registry']}", auth(c))),
+    Case("GET", "/api/public/registries/{slug}", lambda c: ("/api/public/registries/main", {})),
+    Case("GET", "/api/registries/{registry_id}/funds", lambda c: (f"/api/registries/{c['registry']}/funds", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/funds", lambda c: (f"/api/registries/{c['registry']}/funds?since={c['cursor']}", auth(c))),
+    Case("POST", "/api/registries/{registry_id}/funds", lambda c: (f"/api/registries/{c['registry']}/funds", auth(c, json={"title": "Extra"})), status=201),
+    Case("PUT", "/api/registries/{registry_id}/funds/{fund_id}", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][0]}", auth(c, json={"title": "Renamed", "goal": 500}))),
+    Case("POST", "/api/registries/{registry_id}/funds/{fund_id}/move", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][0]}/move", auth(c, json={"after_id": c["funds"][2]}))),
+    Case("DELETE", "/api/registries/{registry_id}/funds/{fund_id}", lambda c: (f"/api/registries/{c['registry']}/funds/{c['funds'][-1]}", auth(c))),
+    Case("POST", "/api/registries/{registry_id}/funds/bulk_upsert", lambda c: (f"/api/registries/{c['registry']}/funds/bulk_upsert", auth(c, json=[{"id": c["funds"][1], "title": "Bulk"}, {"title": "Bulk new"}]))),
+    Case("POST", "/api/contributions", lambda c: ("/api/contributions", {"json": {"fund_id": c["funds"][1], "amount": 10}, "headers": {**ip(5), "Idempotency-Key": "plan-1"}}), status=201),
+    Case("GET", "/api/registries/{registry_id}/contributions", lambda c: (f"/api/registries/{c['registry']}/contributions", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/contributions", lambda c: (f"/api/registries/{c['registry']}/contributions?since={c['cursor']}", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/analytics", lambda c: (f"/api/registries/{c['registry']}/analytics", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/analytics", lambda c: (f"/api/registries/{c['registry']}/analytics?granularity=hour&tz=Asia/Dubai&top=3", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/dashboard", lambda c: (f"/api/registries/{c['registry']}/dashboard", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/audit", lambda c: (f"/api/registries/{c['registry']}/audit?action=fund.create&limit=3", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/export/csv", lambda c: (f"/api/registries/{c['registry']}/export/csv", auth(c))),
+    Case("POST", "/api/registries/{registry_id}/thank-you", lambda c: (f"/api/registries/{c['registry']}/thank-you", auth(c, json={"subject": "Thanks {guest_name}", "message": "Thank you for {gift_count} gifts"})), status=202),
+    Case("GET", "/api/registries/{registry_id}/thank-you", lambda c: (f"/api/registries/{c['registry']}/thank-you", auth(c))),
+    Case("GET", "/api/registries/{registry_id}/thank-you/{campaign_id}", lambda c: (f"/api/registries/{c['registry']}/thank-you/{c['campaign']}", auth(c))),
+    Case("POST", "/api/upload/chunk", lambda c: ("/api/upload/chunk", auth(c, files={"file": ("plan.txt", b"x")}, data={"filename": "plan.txt", "chunk_index": "0", "total_chunks": "1"}))),
+]
+
+EXEMPT = {
+    ("POST", "/api/admin/rollups/rebuild"): "repair job that re-aggregates every contribution into rollups with $merge, which explain cannot run",
+}
+
+
+def _walk(node):
+    """Every dict in an explain document, skipping the plans the optimizer rejected"""
+    if isinstance(node, dict):
+        yield node
+        for key, value in node.items():
+            if key not in ("rejectedPlans", "allPlansExecution"):
+                yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def explain_targets(name: str, command: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Commands to explain for one recorded command; multi-statement writes are explained one statement at a time"""
+    command = {k: v for k, v in command.items() if k not in STRIP}
+    if name == "aggregate" and any(("$merge" in stage or "$out" in stage) for stage in command["pipeline"]):
+        return []
+    if name in ("update", "delete"):
+        statements = command.pop("updates" if name == "update" else "deletes")
+        return [{**command, ("updates" if name == "update" else "deletes"): [s]} for s in statements]
+    return [command]
+
+
+def matched_count(db, name: str, command: Dict[str, Any]) -> int:
+    """Documents the aggregate's leading $match selects (capped by a following $limit)"""
+    pipeline = command.get("pipeline", [])
+    if name != "aggregate" or not pipeline or "$match" not in pipeline[0]:
+        return 0
+    limit = pipeline[1].get("$limit") if len(pipeline) > 1 else None
+    count = db[command["aggregate"]].count_documents(pipeline[0]["$match"])
+    return min(count, limit) if limit else count
+
+
+def plan_problems(db, name: str, command: Dict[str, Any], case: Case) -> List[str]:
+    collection = command[name]
+    problems = set()
+    for target in explain_targets(name, command):
+        explain = db.command("explain", target, verbosity="executionStats")
+        nodes = list(_walk(explain))
+        for node in nodes:
+            stage = node.get("stage")
+            if stage == "COLLSCAN" and collection not in case.collscan_ok:
+                problems.add(f"COLLSCAN on {collection}")
+            if stage == "SORT" and "limitAmount" not in node:
+                problems.add(f"unbounded SORT on {collection}")
+            if stage == "EQ_LOOKUP" and node.get("strategy") != "IndexedLoopJoin":
+                foreign = str(node.get("foreignCollection", "")).split(".", 1)[-1]
+                if foreign not in case.collscan_ok:
+                    problems.add(f"$lookup into {foreign} without an index ({node.get('strategy')})")
+        stats = [n for n in nodes if "totalDocsExamined" in n]
+        examined = max((n["totalDocsExamined"] for n in stats), default=0)
+        produced = max(
+            [n.get("nReturned", 0) for n in stats]
+            + [n[k] for n in nodes for k in WRITE_COUNTERS if isinstance(n.get(k), int)]
+            + [matched_count(db, name, target)]
+        )
+        if examined > case.max_ratio * max(produced, 1) and collection not in case.collscan_ok:
+            problems.add(f"{collection}: examined {examined} documents for {produced}")
+    return [f"{name} {p}" for p in sorted(problems)]
+
+
+@pytest.fixture
+def explain_db(server):
+    db = MongoClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]]
+    try:
+        db.command("explain", {"find": "users", "filter": {}}, verbosity="executionStats")
+    except Exception as e:
+        pytest.skip(f"server cannot explain queries: {e}")
+    return db
+
+
+@pytest.fixture
+def seeded(server, api, make_user, monkeypatch, tmp_path):
+    """A main registry with funds, contributions and history, plus enough other data that a scan would show"""
+    run(server.ensure_indexes())
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(server, "UPLOAD_TMP", tmp_path / "tmp")
+    (tmp_path / "tmp").mkdir()
+    owner, owner_headers = make_user()
+    collab, collab_headers = make_user(email="collab@example.com", name="Collab")
+    _, admin_headers = make_user(email="admin@example.com", name="Admin")
+    ctx: Dict[str, Any] = {"owner": owner_headers, "collab": collab_headers, "admin": admin_headers, "owner_id": owner.id, "collab_id": collab.id}
+
+    for i in range(12):
+        _, headers = make_user(email=f"guest{i}@example.com", name=f"Guest {i}")
+        reg = api.post("/api/registries", json={"couple_names": f"Guest {i} & Co", "slug": f"guest-{i}"}, headers=headers).json()
+        for title in ("Trip", "Home"):
+            fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": title}, headers=headers).json()
+            for j in range(4):
+                api.post("/api/contributions", json={"fund_id": fund["id"], "amount": 5 + j}, headers={"X-Forwarded-For": f"10.{i}.{j}.{len(title)}"})
+
+    reg = api.post("/api/registries", json={"couple_names": "Main & Couple", "slug": "main"}, headers=owner_headers).json()
+    run(server.db.registries.update_one({"id": reg["id"]}, {"$set": {"collaborators": [collab.id]}}))
+    ctx["registry"] = reg["id"]
+    ctx["funds"] = [api.post(f"/api/registries/{reg['id']}/funds", json={"title": f"Fund {n}"}, headers=owner_headers).json()["id"] for n in range(5)]
+    for n in range(30):
+        api.post("/api/contributions", json={"fund_id": ctx["funds"][n % 4], "amount": 10 + n, "name": f"Guest {n}", "guest_email": f"g{n % 7}@example.com"},
+                 headers={"X-Forwarded-For": f"10.200.{n}.1"})
+    ctx["spare_registry"] = api.post("/api/registries", json={"couple_names": "Spare", "slug": "spare"}, headers=owner_headers).json()["id"]
+    ctx["doomed_registry"] = api.post("/api/registries", json={"couple_names": "Doomed", "slug": "doomed"}, headers=owner_headers).json()["id"]
+    ctx["cursor"] = server.new_sync_cursor()
+    ctx["contribution_cursor"] = api.get(f"/api/admin/registries/{reg['id']}/contributions?limit=5", headers=admin_headers).json()["next_cursor"]
+    ctx["user_audit_cursor"] = api.get(f"/api/admin/users/{owner.id}/audit?limit=2", headers=admin_headers).json()["next_cursor"]
+    campaign = server.ThankYouCampaign(registry_id=reg["id"], created_by=owner.id, subject="Thanks", message="Thank you", status="completed")
+    run(server.db.thank_you_campaigns.insert_one(campaign.model_dump()))
+    ctx["campaign"] = campaign.id
+
+    sent = []
+
+    async def capture(email, name, token):
+        sent.append(token)
+    monkeypatch.setattr(server, "send_password_reset_email", capture)
+    api.post("/api/auth/password-reset/request", json={"email": owner.email}, headers={"X-Forwarded-For": "10.250.0.1"})
+    ctx["reset_token"] = sent[-1]
+    run(server.reconcile_platform_metrics())
+    return ctx
+
+
+def test_every_route_has_a_plan_contract(server):
+    routes = {(method, route.path) for route in server.app.routes if isinstance(route, APIRoute) for method in route.methods}
+    covered = {(case.method, case.path) for case in CASES} | set(EXEMPT)
+    assert sorted(routes - covered) == []
+
+
+def test_routes_meet_their_query_plan_contracts(server, api, seeded, explain_db, db_commands):
+    failures = []
+    for case in CASES:
+        url, kwargs = case.request(seeded)
+        db_commands.clear()
+        res = api.request(case.method, url, **kwargs)
+        assert res.status_code == case.status, f"{case.method} {url}: {res.status_code} {res.text[:200]}"
+        recorded = list(zip(db_commands.commands, db_commands.documents))
+        for name, command in recorded:
+            if name in EXPLAINABLE:
+                failures += [f"{case.method} {url}: {p}" for p in plan_problems(explain_db, name, command, case)]
+    assert failures == []
@@ -0,0 +1,26 @@
+from .conftest import run
+
+
+def test_dashboard_assembles_registry_in_one_call(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    _, stranger = make_user(email="stranger@example.com")
+
+    reg, funds = registry_with_funds(owner.id, titles=("Trip", "Home"))
+
+    async def seed():
+        for amount in (25, 75):
+            c = server.Contribution(fund_id=funds[0].id, registry_id=reg.id, amount=amount)
+            await server.db.contributions.insert_one(c.model_dump())
+            await server.record_contribution_rollup(c)
+
+    run(seed())
+    res = api.get(f"/api/registries/{reg.id}/dashboard", headers=headers)
+    assert res.status_code == 200
+    body = res.json()
+    assert body["registry"]["slug"] == "a-b"
+    assert [(f["title"], f["raised"], f["contribution_count"]) for f in body["funds"]] == [("Trip", 100, 2), ("Home", 0, 0)]
+    assert len(body["recent_contributions"]) == 2
+    assert body["analytics"]["total_amount"] == 100 and body["analytics"]["average_amount"] == 50
+    assert sum(d["amount"] for d in body["analytics"]["daily_stats"]) == 100
+
+    assert api.get(f"/api/registries/{reg.id}/dashboard", headers=stranger).status_code == 403
@@ -0,0 +1,91 @@
+from .conftest import run
+
+
+def seed_registry(server, registry_with_funds, owner, contributions=5, slug="a-b"):
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Trip",), slug=slug)
+
+    async def seed():
+        for _ in range(contributions):
+            c = server.Contribution(fund_id=fund.id, registry_id=reg.id, amount=10)
+            await server.db.contributions.insert_one(c.model_dump())
+            await server.record_contribution_rollup(c)
+        await server.log_audit(reg.id, owner.id, "registry.create", {})
+    run(seed())
+    return reg, fund
+
+
+def test_delete_hides_registry_and_frees_slug(server, api, make_user, registry_with_funds):
+    owner, headers = make_user()
+    reg, _ = seed_registry(server, registry_with_funds, owner)
+
+    assert api.delete(f"/api/registries/{reg.id}", headers=headers).status_code == 200
+    assert api.get(f"/api/registries/{reg.id}", headers=headers).status_code == 404
+    assert api.get("/api/public/registries/a-b").status_code == 404
+    assert api.get("/api/registries/mine", headers=headers).json() == []
+    # Data is still there until the purge job runs
+    assert run(server.db.contributions.count_documents({"registry_id": reg.id})) == 5
+
+    res = api.post("/api/registries", json={"couple_names": "A & B again", "slug": "a-b"}, headers=headers)
+    assert res.status_code == 201
+
+    run(server.db.users.update_one({"id": owner.id}, {"$set": {"is_admin": True}}))
+    detail = api.get(f"/api/admin/users/{owner.id}/detail", headers=headers).json()
+    assert [r["id"] for r in detail["registries_owned"]] == [res.json()["id"]]
+
+
+def test_purge_removes_data_in_batches_and_resumes(server, api, make_user, registry_with_funds, monkeypatch):
+    owner, headers = make_user()
+    reg, _ = seed_registry(server, registry_with_funds, owner)
+    keep, _ = seed_registry(server, registry_with_funds, owner, contributions=2, slug="keep")
+    campaign = server.ThankYouCampaign(registry_id=reg.id, created_by=owner.id, subject="Hi", message="Thanks", status="completed")
+    run(server.db.thank_you_campaigns.insert_one(campaign.model_dump()))
+    run(server.enqueue_emails([
+        server.OutboxEmail(kind="thank_you", to=["a@example.com"], subject="s", html="h", text="t", campaign_id=campaign.id, registry_id=reg.id),
+        server.OutboxEmail(kind="thank_you", to=["b@example.com"], subject="s", html="h", text="t", campaign_id=campaign.id),
+        server.OutboxEmail(kind="owner_digest", to=[owner.email], subject="s", html="h", text="t", registry_id=reg.id),
+        server.OutboxEmail(kind="owner_digest", to=[owner.email], subject="s", html="h", text="t", registry_id=keep.id),
+    ]))
+    api.delete(f"/api/registries/{reg.id}", headers=headers)
+    monkeypatch.setattr(server, "REGISTRY_PURGE_BATCH_SIZE", 2)
+    monkeypatch.setattr(server, "REGISTRY_PURGE_PAUSE_SEC", 0)
+
+    # A purge that dies part-way keeps its lease until it expires, then another run finishes the job
+    calls = {"n": 0}
+    real_delete = server._delete_in_batches
+
+    async def crash_after_first(coll, query, keep_lease):
+        calls["n"] += 1
+        if calls["n"] == 3:  # after the outbox and contributions
+            raise RuntimeError("worker died")
+        return await real_delete(coll, query, keep_lease)
+
+    monkeypatch.setattr(server, "_delete_in_batches", crash_after_first)
+    try:
+        run(server.purge_deleted_registries())
+    except RuntimeError:
+        pass
+    assert run(server.db.contributions.count_documents({"registry_id": reg.id})) == 0
+    assert run(server.db.registries.count_documents({"id": reg.id})) == 1
+
+    monkeypatch.setattr(server, "_delete_in_batches", real_delete)
+    run(server.purge_deleted_registries())
+    assert run(server.db.registries.count_documents({"id": reg.id})) == 1  # lease still held by the dead run
+    run(server.db.registries.update_one({"id": reg.id}, {"$set": {"purge_lease_until": None}}))
+    run(server.purge_deleted_registries())
+
+    for coll in ("registries", "funds", "contributions", "contribution_rollups", "audit_logs"):
+        assert run(server.db[coll].count_documents({"registry_id": reg.id} if coll != "registries" else {"id": reg.id})) == 0
+    assert run(server.db.contributions.count_documents({"registry_id": keep.id})) == 2
+    assert [e["registry_id"] for e in run(server.db.email_outbox.find().to_list(None))] == [keep.id]
+
+
+def test_orphaned_contributions_are_cleaned_up(server):
+    async def scenario():
+        await server.db.contributions.insert_many([
+            server.Contribution(fund_id="gone", amount=5).model_dump(),
+            server.Contribution(fund_id="gone", amount=7).model_dump(),
+        ])
+        await server.purge_orphaned_contributions()
+        return await server.db.contributions.count_documents({})
+
+    assert run(scenario()) == 0
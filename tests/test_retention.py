@@ -0,0 +1,49 @@
+import os
+import time
+
+from .conftest import run
+
+
+def ttl_of(coll, field):
+    info = run(coll.index_information())
+    return next(i.get("expireAfterSeconds", "plain") for i in info.values() if i["key"] == [(field, 1)])
+
+
+def test_ensure_indexes_manages_ttl_indexes(server, monkeypatch):
+    run(server.ensure_indexes())
+    assert ttl_of(server.db.password_resets, "expires_at") == server.PASSWORD_RESET_RETENTION_HOURS * 3600
+    assert ttl_of(server.db.status_checks, "timestamp") == server.STATUS_CHECK_RETENTION_DAYS * 86400
+
+    # Turning retention off (or on) replaces the index rather than failing on conflicting options
+    monkeypatch.setattr(server, "STATUS_CHECK_RETENTION_DAYS", 0)
+    run(server.ensure_indexes())
+    assert ttl_of(server.db.status_checks, "timestamp") == "plain"
+    monkeypatch.setattr(server, "STATUS_CHECK_RETENTION_DAYS", 3)
+    run(server.ensure_indexes())
+    assert ttl_of(server.db.status_checks, "timestamp") == 3 * 86400
+
+
+def test_abandoned_upload_chunks_are_swept(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_TMP", tmp_path)
+    stale_dir, live_dir, new_dir = tmp_path / "u1", tmp_path / "u2", tmp_path / "u3"
+    for d in (stale_dir, live_dir, new_dir):
+        d.mkdir()
+    stale, live = stale_dir / "a.jpg.part0", live_dir / "b.jpg.part0"
+    stale.write_bytes(b"x")
+    live.write_bytes(b"y")
+    # A chunk that disappears between listing and stat, as when its upload completes mid-sweep
+    (stale_dir / "c.jpg.part0").symlink_to(tmp_path / "gone")
+    old = time.time() - 2 * 86400
+    for path in (stale, stale_dir):
+        os.utime(path, (old, old))
+
+    assert run(server.sweep_upload_tmp()) == 1
+    assert live.exists()
+    # The empty new directory belongs to an upload that has not written its first chunk yet
+    assert new_dir.exists()
+    # Kept while the dangling entry is there; once empty and idle it goes on a later sweep
+    assert stale_dir.exists() and not stale.exists()
+    (stale_dir / "c.jpg.part0").unlink()
+    os.utime(stale_dir, (old, old))
+    assert run(server.sweep_upload_tmp()) == 0
+    assert not stale_dir.exists()
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from .conftest import run
+
+
+def seed_guests(server, make_user, registry_with_funds, guests):
+    owner, _ = make_user()
+    reg, (fund,) = registry_with_funds(owner.id, titles=("Honeymoon",), currency="AED")
+    contributions = [server.Contribution(fund_id=fund.id, registry_id=reg.id, name=name, guest_email=email, amount=amount)
+                     for name, email, amount in guests]
+    run(server.db.contributions.insert_many([c.model_dump() for c in contributions]))
+    return owner, reg
+
+
+def test_template_rejects_unknown_placeholders(server):
+    with pytest.raises(ValueError):
+        server.MessageTemplate("Dear {guest_nmae}")
+    tpl = server.MessageTemplate("Dear {guest_name}, thanks for {gift_total} {currency}!")
+    assert tpl.render({"guest_name": "Sam", "gift_total": "10.00", "currency": "AED"}) == "Dear Sam, thanks for 10.00 AED!"
+
+
+def test_campaign_queues_one_personalised_email_per_distinct_guest(server, make_user, registry_with_funds, monkeypatch):
+    monkeypatch.setattr(server, "THANK_YOU_BATCH_SIZE", 2)
+    guests = [
+        ("Sam", "sam@example.com", 100),
+        ("Sam", "SAM@example.com", 50),
+        ("Alex", "alex@example.com", 20),
+        ("No Email", None, 10),
+        ("Jo", "jo@example.com", 5),
+    ]
+    owner, reg = seed_guests(server, make_user, registry_with_funds, guests)
+
+    async def scenario():
+        campaign = server.ThankYouCampaign(registry_id=reg.id, created_by=owner.id, subject="Thank you, {guest_name}!",
+                                           message="Dear {guest_name},\n\nThank you for {gift_total} {currency}.")
+        await server.db.thank_you_campaigns.insert_one(campaign.model_dump())
+        await server.run_thank_you_campaign(campaign.id)
+        emails = await server.db.email_outbox.find({"campaign_id": campaign.id}).sort("to", 1).to_list(None)
+        return await server.db.thank_you_campaigns.find_one({"id": campaign.id}), emails
+
+    campaign, emails = run(scenario())
+    assert campaign["status"] == "completed"
+    assert campaign["queued"] == 3
+    assert [e["to"] for e in emails] == [["alex@example.com"], ["jo@example.com"], ["sam@example.com"]]
+    sam = emails[2]
+    assert sam["subject"] == "Thank you, Sam!"
+    assert "150.00 AED" in sam["text"]
+    assert all(e["priority"] == 1 for e in emails)
+
+
+def test_campaign_resumes_after_saved_cursor(server, make_user, registry_with_funds):
+    guests = [("A", "a@example.com", 1), ("B", "b@example.com", 1), ("C", "c@example.com", 1)]
+    owner, reg = seed_guests(server, make_user, registry_with_funds, guests)
+
+    async def scenario():
+        # A previous run queued up to b@ and then died holding the lease
+        campaign = server.ThankYouCampaign(registry_id=reg.id, created_by=owner.id, subject="Thanks", message="Thanks {guest_name}",
+                                           status="running", cursor="b@example.com", queued=2,
+                                           lease_until=datetime.utcnow() - timedelta(seconds=1))
+        await server.db.thank_you_campaigns.insert_one(campaign.model_dump())
+        await server.resume_thank_you_campaigns()
+        emails = await server.db.email_outbox.find({"campaign_id": campaign.id}).to_list(None)
+        return await server.db.thank_you_campaigns.find_one({"id": campaign.id}), emails
+
+    campaign, emails = run(scenario())
+    assert campaign["status"] == "completed"
+    assert campaign["queued"] == 3
+    assert [e["to"] for e in emails] == [["c@example.com"]]
+
+
+def test_one_active_campaign_per_registry(server, api, make_user, monkeypatch):
+    run(server.ensure_indexes())
+    monkeypatch.setattr(server, "EMAIL_ENABLED", True)
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    # Inserted by a concurrent request, and leased so the background run started here leaves it alone
+    active = server.ThankYouCampaign(registry_id=reg["id"], created_by=owner.id, subject="Hi", message="Thanks", status="running",
+                                     lease_until=datetime.utcnow() + timedelta(minutes=5))
+    run(server.db.thank_you_campaigns.insert_one(active.model_dump()))
+
+    body = {"subject": "Thanks {guest_name}", "message": "Thank you"}
+    assert api.post(f"/api/registries/{reg['id']}/thank-you", json=body, headers=headers).status_code == 409
+    run(server.db.thank_you_campaigns.update_one({"id": active.id}, {"$set": {"status": "completed"}}))
+    assert api.post(f"/api/registries/{reg['id']}/thank-you", json=body, headers=headers).status_code == 202
@@ -0,0 +1,47 @@
+from .conftest import run
+
+
+def test_registry_writes_use_single_guarded_round_trips(server, api, make_user, db_commands):
+    run(server.ensure_indexes())
+    owner, headers = make_user()
+    _, stranger = make_user(email="stranger@example.com")
+
+    db_commands.clear()
+    res = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers)
+    assert res.status_code == 201
+    # token user lookup, insert, audit (previously a slug probe as well)
+    assert db_commands.commands == ["find", "insert", "insert"]
+    reg_id = res.json()["id"]
+
+    assert api.post("/api/registries", json={"couple_names": "C & D", "slug": "a-b"}, headers=headers).status_code == 409
+
+    db_commands.clear()
+    res = api.put(f"/api/registries/{reg_id}", json={"couple_names": "A & Bee", "slug": "a-bee", "notification_mode": "daily"}, headers=headers)
+    assert res.status_code == 200 and res.json()["slug"] == "a-bee"
+    # token user lookup, findAndModify, audit (previously find, slug probe, update, find)
+    assert db_commands.commands == ["find", "findAndModify", "insert"]
+    stored = run(server.db.registries.find_one({"id": reg_id}))
+    assert stored["digest_sent_through"] is not None and stored["couple_names_lower"] == "a & bee"
+
+    assert api.put(f"/api/registries/{reg_id}", json={"couple_names": "X"}, headers=stranger).status_code == 403
+    assert api.put("/api/registries/missing", json={"couple_names": "X"}, headers=headers).status_code == 404
+
+
+def test_fund_update_and_register_round_trips(server, api, make_user, db_commands):
+    run(server.ensure_indexes())
+    owner, headers = make_user()
+    reg = api.post("/api/registries", json={"couple_names": "A & B", "slug": "a-b"}, headers=headers).json()
+    fund = api.post(f"/api/registries/{reg['id']}/funds", json={"title": "Trip"}, headers=headers).json()
+
+    db_commands.clear()
+    res = api.put(f"/api/registries/{reg['id']}/funds/{fund['id']}", json={"title": "Honeymoon", "goal": 900}, headers=headers)
+    assert res.status_code == 200 and res.json()["goal"] == 900
+    # token user lookup, registry ACL read, findAndModify, audit (previously two more finds and an update)
+    assert db_commands.commands == ["find", "find", "findAndModify", "insert"]
+    assert api.put(f"/api/registries/{reg['id']}/funds/missing", json={"title": "X"}, headers=headers).status_code == 404
+
+    db_commands.clear()
+    res = api.post("/api/auth/register", json={"name": "New", "email": "new@example.com", "password": "password123"})
+    assert res.status_code == 201
+    assert db_commands.commands == ["insert"]
+    assert api.post("/api/auth/register", json={"name": "New", "email": "NEW@example.com", "password": "password123"}).status_code == 409